@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+
+BIN_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bin")
+
+# Packages that must only be imported by the code paths that use them, never at script load
+HEAVY_PACKAGES = ("pandas", "matplotlib", "Bio", "pyfastx")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Import every bin/ script under 'python -X importtime' and fail if one loads a heavy package or exceeds the cold-start budget.")
+    parser.add_argument("--scripts", nargs="+", default=None, help="Only check these scripts (default: every bin/*.py)")
+    parser.add_argument("--budget_ms", type=float, default=150, help="Maximum cumulative import time per script in milliseconds (default: 150)")
+    parser.add_argument("--repeats", type=int, default=3, help="Imports per script; the fastest is checked (default: 3)")
+    parser.add_argument("--output", default=None, help="Optional JSON report")
+    return parser.parse_args()
+
+def import_times(module):
+    """Import module in a fresh interpreter, returning {imported module: cumulative microseconds}."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [BIN_DIR, env.get("PYTHONPATH")]))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    times = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+def check_script(module, budget_ms, repeats):
+    runs = [import_times(module) for _ in range(repeats)]
+    times = min(runs, key=lambda run: run.get(module, 0))
+    import_ms = times.get(module, 0) / 1000
+    heavy = sorted({name.split(".", 1)[0] for name in times} & set(HEAVY_PACKAGES))
+    return {
+        "script": module,
+        "import_ms": round(import_ms, 1),
+        "heavy_imports": heavy,
+        "ok": import_ms <= budget_ms and not heavy,
+    }
+
+def main():
+    args = parse_args()
+    scripts = args.scripts or sorted(os.path.basename(path)[:-3] for path in glob.glob(os.path.join(BIN_DIR, "*.py")))
+
+    results = []
+    for script in scripts:
+        result = check_script(script, args.budget_ms, args.repeats)
+        results.append(result)
+        status = "ok" if result["ok"] else "FAILED"
+        heavy = f", loads {', '.join(result['heavy_imports'])}" if result["heavy_imports"] else ""
+        print(f"{script}: {result['import_ms']:.1f} ms{heavy}, {status}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"budget_ms": args.budget_ms, "heavy_packages": HEAVY_PACKAGES, "results": results}, f, indent=2)
+
+    failed = [result["script"] for result in results if not result["ok"]]
+    if failed:
+        print(f"{len(failed)} script(s) over the {args.budget_ms:g} ms budget or loading heavy packages at import: {', '.join(failed)}")
+        sys.exit(1)
+    print(f"All {len(results)} scripts import within {args.budget_ms:g} ms without heavy packages")
+
+if __name__ == "__main__":
+    main()
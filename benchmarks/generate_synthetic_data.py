@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import random
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+DBS = ["hamap", "ncbifam", "panther", "pfam"]
+DB_PREFIXES = {"hamap": "MF_", "ncbifam": "NF", "panther": "PTHR", "pfam": "PF"}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic dataset for every bin/ script.")
+    parser.add_argument("--outdir", required=True, help="Output folder for the dataset")
+    parser.add_argument("--families_per_db", type=int, default=50, help="Number of member-database families per database (default: 50)")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed (default: 1)")
+    return parser.parse_args()
+
+def open_gzip_text(path):
+    # Fixed header mtime keeps the compressed bytes identical across runs
+    return io.TextIOWrapper(gzip.GzipFile(path, "wb", mtime=0))
+
+def random_sequence(rng, min_len=40, max_len=300):
+    return "".join(rng.choices(AMINO_ACIDS, k=rng.randint(min_len, max_len)))
+
+def family_key(db, index):
+    if db == "hamap":
+        return f"MF_{index:05d}"
+    if db == "ncbifam":
+        return f"NF{index:06d}" if index % 2 else f"TIGR{index:05d}"
+    return f"{DB_PREFIXES[db]}{index:05d}"
+
+def accession(index):
+    return f"A{index:07d}"
+
+def write_fasta(handle, records, width=60):
+    for name, seq in records:
+        handle.write(f">{name}\n")
+        for start in range(0, len(seq), width):
+            handle.write(f"{seq[start:start + width]}\n")
+
+def write_stockholm(handle, records):
+    width = max(len(seq) for _, seq in records)
+    name_width = max(len(name) for name, _ in records) + 2
+    handle.write("# STOCKHOLM 1.0\n#=GF ID   synthetic\n")
+    for name, seq in records:
+        handle.write(f"{name:<{name_width}}{seq.ljust(width, '-')}\n")
+    handle.write("//\n")
+
+def family_records(db, members, sequences):
+    """Member-database style records: ranges for Pfam/NCBIfam, pipe headers for PANTHER/HAMAP."""
+    records = []
+    for i in members:
+        seq = sequences[i]
+        if db == "panther":
+            name = f"HUMAN|Ensembl=ENSG{i:011d}.1|UniProtKB={accession(i)}"
+        elif db == "hamap":
+            name = f"{accession(i)}_SYNTH"
+        else:
+            name = f"{accession(i)}.1/1-{len(seq)}"
+        records.append((name, seq))
+    return records
+
+def generate(outdir, families_per_db=50, seed=1):
+    """Write the dataset under outdir and return a manifest of its paths and sizes."""
+    rng = random.Random(seed)
+    os.makedirs(outdir, exist_ok=True)
+    path = lambda *parts: os.path.join(outdir, *parts)
+
+    num_families = families_per_db * len(DBS)
+    num_proteins = num_families * 30
+    sequences = [random_sequence(rng) for _ in range(num_proteins)]
+
+    # Member-database families over a shared protein pool, so families overlap
+    families = []
+    for db_index, db in enumerate(DBS):
+        os.makedirs(path("member_dbs", db), exist_ok=True)
+        for k in range(families_per_db):
+            key = family_key(db, k + 1)
+            ipr_id = f"IPR{db_index * families_per_db + k + 1:06d}"
+            members = sorted(rng.sample(range(num_proteins), rng.randint(10, 80)))
+            families.append({"db": db, "dbkey": key, "interpro_id": ipr_id, "members": members})
+            records = family_records(db, members, sequences)
+            if db == "pfam":
+                with open(path("member_dbs", db, f"{key}.sto"), "w") as f:
+                    write_stockholm(f, records)
+            elif db == "ncbifam":
+                with open(path("member_dbs", db, f"{key}.1.SEED"), "w") as f:
+                    if key.startswith("TIGR"):
+                        write_stockholm(f, records)
+                    else:
+                        write_fasta(f, records)
+            elif db == "panther":
+                with open(path("member_dbs", db, f"{key}.fasta"), "w") as f:
+                    write_fasta(f, records)
+            else:
+                with open(path("member_dbs", db, f"{key}.msa"), "w") as f:
+                    write_fasta(f, records)
+
+    # InterPro hierarchy: small clades of up to three levels
+    with open(path("interpro_hierarchy.txt"), "w") as f:
+        depth = 0
+        for i, family in enumerate(families):
+            depth = 0 if i % 5 == 0 else rng.randint(1, min(depth + 1, 2))
+            f.write(f"{'--' * depth}{family['interpro_id']}::Synthetic family {i}::\n")
+    with open(path("interpro_valid_ids.txt"), "w") as f:
+        f.writelines(f"{family['interpro_id']}\n" for family in families)
+
+    with open_gzip_text(path("interpro.xml.gz")) as f:
+        f.write("<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n<interprodb>\n")
+        for family in families:
+            f.write(
+                f"<interpro id=\"{family['interpro_id']}\" protein_count=\"{len(family['members'])}\" "
+                f"short_name=\"synth_{family['dbkey']}\" type=\"Family\">\n"
+                f"<name>Synthetic {family['dbkey']}</name>\n<member_list>\n"
+                f"<db_xref db=\"{family['db'].upper()}\" dbkey=\"{family['dbkey']}\" name=\"{family['dbkey']}\"/>\n"
+                f"</member_list>\n</interpro>\n"
+            )
+        f.write("</interprodb>\n")
+
+    header = ["interpro_id", "protein_count", "short_name", "db", "dbkey", "name"]
+    rows = [
+        [family["interpro_id"], len(family["members"]), f"synth_{family['dbkey']}", family["db"].upper(), family["dbkey"], family["dbkey"]]
+        for family in families
+    ]
+    with open(path("interpro_families.tsv"), "w", newline="") as f:
+        writer = csv.writer(f, delimiter="\t")
+        writer.writerow(header)
+        writer.writerows(rows)
+    for db in DBS:
+        with open(path(f"{db}_metadata.tsv"), "w") as f:
+            f.write("id\tnum_proteins\n")
+            for family in families:
+                if family["db"] == db:
+                    f.write(f"{family['dbkey']}\t{len(family['members'])}\n")
+
+    # Sampled families, as CONVERT_SAMPLED_TO_FASTA would leave them
+    sampled = [family for family in families if rng.random() < 0.5]
+    with open(path("sampled_metadata.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(row for row, family in zip(rows, families) if family in sampled)
+    sampled_ids = set()
+    for family in sampled:
+        os.makedirs(path("sampled_fasta", family["db"]), exist_ok=True)
+        with open(path("sampled_fasta", family["db"], f"{family['dbkey']}.fasta"), "w") as f:
+            write_fasta(f, [(accession(i), sequences[i]) for i in family["members"]])
+        sampled_ids.update(family["members"])
+    sampled_ids = sorted(sampled_ids)
+    with open(path("combined_db.fasta"), "w") as f:
+        write_fasta(f, [(accession(i), sequences[i]) for i in sampled_ids])
+
+    # SwissProt-like pool, DIAMOND hits against the families and the sampled decoys
+    swissprot = [(f"SP{i:07d}", random_sequence(rng)) for i in range(num_proteins)]
+    with open(path("swissprot.fasta"), "w") as f:
+        write_fasta(f, swissprot)
+    with open(path("diamond_hits.tsv"), "w") as f:
+        for name, _ in swissprot[::3]:
+            target = accession(rng.choice(sampled_ids))
+            f.write(f"{name}\t{target}\t{rng.uniform(30, 100):.1f}\t120\t10\t1\t1\t120\t1\t120\t1e-30\t200.0\n")
+    decoys = swissprot[1::3][:max(10, num_proteins // 10)]
+    with open(path("decoys.fasta"), "w") as f:
+        write_fasta(f, decoys)
+
+    # Use-case alignments and generated families: perturbed sampled families plus decoys and novel sequences
+    os.makedirs(path("alignments"), exist_ok=True)
+    os.makedirs(path("generated_fasta"), exist_ok=True)
+    for u in range(len(sampled)):
+        base = rng.choice(sampled)["members"]
+        keep = rng.uniform(0.3, 1.0)
+        members = [accession(i) for i in base if rng.random() < keep]
+        members += [accession(i) for i in rng.sample(range(num_proteins), rng.randint(0, 10))]
+        members += [name for name, _ in rng.sample(decoys, min(len(decoys), rng.randint(0, 5)))]
+        members += [f"NOVEL{u:05d}_{k}" for k in range(rng.randint(0, 3))]
+        rng.shuffle(members)
+        with open_gzip_text(path("alignments", f"usecase_{u:05d}.fas.gz")) as f:
+            for name in members:
+                f.write(f">{name}/1-50\n{random_sequence(rng, 50, 50)}\n")
+        with open_gzip_text(path("generated_fasta", f"usecase_{u:05d}.fasta.gz")) as f:
+            for name in members:
+                f.write(f">{name}/1-50\n{random_sequence(rng)}\n")
+    with open(path("mmseqs_clusters.tsv"), "w") as f:
+        for k, i in enumerate(sampled_ids):
+            f.write(f"{accession(sampled_ids[k // 4 * 4])}\t{accession(i)}\n")
+
+    manifest = {
+        "seed": seed,
+        "families_per_db": families_per_db,
+        "families": num_families,
+        "sampled_families": len(sampled),
+        "proteins": num_proteins,
+        "sampled_proteins": len(sampled_ids),
+        "use_cases": len(sampled),
+        "decoys": len(decoys),
+        "swissprot": len(swissprot),
+    }
+    with open(path("manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def main():
+    args = parse_args()
+    manifest = generate(args.outdir, args.families_per_db, args.seed)
+    print(json.dumps(manifest, indent=2))
+
+if __name__ == "__main__":
+    main()
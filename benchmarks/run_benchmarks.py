@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from generate_synthetic_data import generate
+
+BIN_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bin")
+
+# (script, arguments, manifest key used as the throughput unit); arguments are formatted with the
+# dataset folder {data}, the per-scale run folder {runs} and the dataset manifest values.
+# Cases run in this order, each in its own {runs}/<script> folder, so later cases can read earlier outputs.
+CASES = [
+    ("remove_duplicate_branches", ["--infile", "{data}/interpro_hierarchy.txt", "--max_depth", "3", "--outfile", "parsed_hierarchy.txt"], "families"),
+    ("extract_candidate_interpro_families", ["{data}/interpro.xml.gz", "{data}/interpro_valid_ids.txt", "intepro_families.tsv"], "families"),
+    ("extract_hamap_metadata", ["{data}/member_dbs/hamap", "hamap_metadata.tsv"], "families"),
+    ("extract_ncbifam_metadata", ["{data}/member_dbs/ncbifam", "ncbifam_metadata.tsv"], "families"),
+    ("extract_panther_metadata", ["{data}/member_dbs/panther", "panther_metadata.tsv"], "families"),
+    ("extract_pfam_metadata", ["{data}/member_dbs/pfam", "pfam_metadata.tsv"], "families"),
+    ("filter_valid_candidate_families", [
+        "{data}/interpro_families.tsv", "{data}/hamap_metadata.tsv", "{data}/ncbifam_metadata.tsv",
+        "{data}/panther_metadata.tsv", "{data}/pfam_metadata.tsv", "filtered_families.tsv"
+    ], "families"),
+    ("sample_interpro", [
+        "--interpro_file", "{data}/interpro_families.tsv", "--tree_file", "{data}/interpro_hierarchy.txt",
+        "--min_membership", "1", "--num_per_db", "{families_per_db}", "--logfile", "log.txt", "--output", "sampled_metadata.csv"
+    ], "families"),
+    ("convert_sampled_to_fasta", [
+        "--metadata_file", "{data}/sampled_metadata.csv", "--hamap", "{data}/member_dbs/hamap",
+        "--ncbifam", "{data}/member_dbs/ncbifam", "--panther", "{data}/member_dbs/panther", "--pfam", "{data}/member_dbs/pfam",
+        "--output_folder", "sampled_fasta", "--updated_metadata_file", "updated_sampled_metadata.csv"
+    ], "sampled_families"),
+    ("combine_db_fasta", ["--input_folder", "{data}/sampled_fasta", "--output_file", "combined_db.fasta"], "sampled_proteins"),
+    ("identify_uniprot_decoys", [
+        "--hits_file", "{data}/diamond_hits.tsv", "--fasta_file", "{data}/swissprot.fasta",
+        "--output_file", "decoys.fasta", "--num_decoys", "{decoys}"
+    ], "swissprot"),
+    ("combine_decoy_fasta", [
+        "--families_fasta", "{data}/combined_db.fasta", "--decoys_fasta", "{data}/decoys.fasta",
+        "--combined_fasta", "combined_db_with_decoys.fasta", "--log_file", "decoy_log.txt"
+    ], "sampled_proteins"),
+    ("calculate_sequence_stats", [
+        "--original_fasta", "{data}/combined_db.fasta", "--decoy_fasta", "{data}/decoys.fasta",
+        "--alignment_folder", "{data}/alignments", "--alignment_type", "fas.gz"
+    ], "use_cases"),
+    ("calculate_db_sequence_coverage", [
+        "--metadata", "{data}/sampled_metadata.csv", "--original_counts", "{runs}/calculate_sequence_stats/fas.gz_original_counts.txt",
+        "--msa_root", "{data}/sampled_fasta", "--output", "sequence_coverage.txt"
+    ], "sampled_families"),
+    ("analyze_recruited_decoys", [
+        "--msa_folder", "{data}/alignments", "--decoy_fasta", "{data}/decoys.fasta",
+        "--output_csv", "decoy_stats.csv", "--decoy_details", "decoy_details.tsv"
+    ], "use_cases"),
+    ("calculate_jaccard_similarity", [
+        "--use_case_dir", "{data}/alignments", "--original_base_dir", "{data}/sampled_fasta",
+        "--output_file", "jaccard_similarities.shard_1_of_1.csv", "--edges_file", "jaccard_edges.shard_1_of_1.npz"
+    ], "use_cases"),
+    ("merge_jaccard_shards", [
+        "--tsv_files", "{runs}/calculate_jaccard_similarity/jaccard_similarities.shard_1_of_1.csv",
+        "--edge_files", "{runs}/calculate_jaccard_similarity/jaccard_edges.shard_1_of_1.npz",
+        "--output_file", "jaccard_similarities.csv", "--edges_file", "jaccard_edges.npz"
+    ], "use_cases"),
+    ("produce_db_stacked_barplot", [
+        "--input_file", "{runs}/merge_jaccard_shards/jaccard_edges.npz", "--output_file", "db_stacked_barplot.png"
+    ], "use_cases"),
+    ("calculate_db_family_coverage", [
+        "--similarity_results", "{runs}/merge_jaccard_shards/jaccard_edges.npz", "--similarity_threshold", "0.5",
+        "--output_file", "family_coverage.csv", "--curve_file", "family_coverage_curve.csv"
+    ], "sampled_families"),
+    ("get_size_distributions", [
+        "--metadata_file", "{data}/sampled_metadata.csv", "--similarity_file", "{runs}/merge_jaccard_shards/jaccard_edges.npz",
+        "--similarity_threshold", "0.5", "--output_file", "size_distribution.txt"
+    ], "sampled_families"),
+    ("investigate_matched_originals", [
+        "--db_folder", "{data}/sampled_fasta", "--cluster_file", "{data}/mmseqs_clusters.tsv",
+        "--metadata", "{data}/sampled_metadata.csv", "--generated_fasta", "{data}/generated_fasta", "--output", "metadata.csv"
+    ], "sampled_families"),
+    ("post_engine", [
+        "--alignment_folder", "{data}/alignments", "--original_fasta", "{data}/combined_db.fasta",
+        "--decoy_fasta", "{data}/decoys.fasta", "--metadata", "{data}/sampled_metadata.csv",
+        "--sampled_fasta", "{data}/sampled_fasta", "--cluster_file", "{data}/mmseqs_clusters.tsv",
+        "--generated_fasta", "{data}/generated_fasta"
+    ], "use_cases"),
+]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run every bin/ script on synthetic data at several scales and record wall time, peak RSS and throughput.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10, 50, 200], help="Families per database for each scale (default: 10 50 200)")
+    parser.add_argument("--scripts", nargs="+", default=None, help="Only run these scripts (default: all)")
+    parser.add_argument("--repeats", type=int, default=1, help="Runs per script and scale; the fastest is reported (default: 1)")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the synthetic data (default: 1)")
+    parser.add_argument("--workdir", default="benchmark_work", help="Folder for datasets and script outputs (default: benchmark_work)")
+    parser.add_argument("--output", default="benchmark_results.json", help="Output JSON file (default: benchmark_results.json)")
+    return parser.parse_args()
+
+def run_case(command, cwd):
+    """Run one command, returning (return code, wall seconds, peak RSS in MB) of that child alone."""
+    os.makedirs(cwd, exist_ok=True)
+    with open(os.path.join(cwd, "benchmark.log"), "w") as log:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, cwd=cwd, stdout=log, stderr=subprocess.STDOUT)
+        _, status, rusage = os.wait4(process.pid, 0)
+        wall = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    peak_rss_mb = rusage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return process.returncode, wall, peak_rss_mb
+
+def main():
+    args = parse_args()
+    workdir = os.path.abspath(args.workdir)
+    cases = [case for case in CASES if args.scripts is None or case[0] in args.scripts]
+
+    datasets = {}
+    results = []
+    for scale in args.scales:
+        data = os.path.join(workdir, f"data_{scale}")
+        runs = os.path.join(workdir, f"runs_{scale}")
+        print(f"Generating dataset with {scale} families per database...")
+        manifest = generate(data, scale, args.seed)
+        datasets[scale] = manifest
+
+        for script, script_args, unit in cases:
+            command = [sys.executable, os.path.join(BIN_DIR, f"{script}.py")]
+            command += [arg.format(data=data, runs=runs, **manifest) for arg in script_args]
+            runs_of_case = [run_case(command, os.path.join(runs, script)) for _ in range(args.repeats)]
+            returncode, wall, peak_rss_mb = min(runs_of_case, key=lambda run: (run[0] != 0, run[1]))
+            result = {
+                "script": script,
+                "families_per_db": scale,
+                "items": manifest[unit],
+                "unit": unit,
+                "returncode": returncode,
+                "wall_seconds": round(wall, 4),
+                "peak_rss_mb": round(peak_rss_mb, 1),
+                "throughput_per_second": round(manifest[unit] / wall, 2) if wall > 0 else None,
+            }
+            results.append(result)
+            status = "ok" if returncode == 0 else f"FAILED ({returncode}), see {os.path.join(runs, script, 'benchmark.log')}"
+            print(f"[{scale}] {script}: {wall:.3f}s, {peak_rss_mb:.1f} MB peak RSS, {status}")
+
+    report = {
+        "seed": args.seed,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeats": args.repeats,
+        "datasets": datasets,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Accession index written next to the combined families + decoys FASTA.
+
+The index is a folder of .npy arrays that POST stages open memory-mapped, with
+one row per input record, sorted by base accession (the record ID before any
+'/' range): accessions.npy holds the base accessions as fixed-width bytes,
+record_ids.npy the full record IDs, origins.npy the family row in
+families.tsv (or DECOY, or ORIGINAL when the family is unknown), and
+offsets.npy and lengths.npy where each sequence starts in the uncompressed
+combined FASTA and how many residues it has. Records dropped as duplicates
+keep their row, with offset -1, so the index still lists every original and
+decoy accession. Lookups are binary searches over accessions.npy.
+"""
+
+import os
+
+ACCESSION_INDEX_DIRNAME = "accession_index"
+DECOY = -1
+ORIGINAL = -2
+
+
+def base_accession(record_id):
+    return record_id.split("/", 1)[0]
+
+
+def write_accession_index(index_dir, records, families):
+    """Write (record_id, origin, offset, length) records; origin is a row of families, DECOY or ORIGINAL."""
+    import numpy as np
+    records = sorted(records, key=lambda record: base_accession(record[0]))
+    os.makedirs(index_dir, exist_ok=True)
+    np.save(os.path.join(index_dir, "accessions.npy"), np.array([base_accession(r[0]).encode() for r in records], dtype=bytes))
+    np.save(os.path.join(index_dir, "record_ids.npy"), np.array([r[0].encode() for r in records], dtype=bytes))
+    np.save(os.path.join(index_dir, "origins.npy"), np.array([r[1] for r in records], dtype=np.int32))
+    np.save(os.path.join(index_dir, "offsets.npy"), np.array([r[2] for r in records], dtype=np.int64))
+    np.save(os.path.join(index_dir, "lengths.npy"), np.array([r[3] for r in records], dtype=np.int64))
+    with open(os.path.join(index_dir, "families.tsv"), "w") as f:
+        f.write("family\n")
+        f.writelines(f"{family}\n" for family in families)
+
+
+def open_accession_index(index_dir):
+    """Memory-map an accession index folder."""
+    import numpy as np
+    with open(os.path.join(index_dir, "families.tsv")) as f:
+        next(f)  # Skip header
+        families = [line.rstrip("\n") for line in f]
+    index = {"families": families}
+    for name in ("accessions", "record_ids", "origins", "offsets", "lengths"):
+        index[name] = np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode="r")
+    return index
+
+
+def origin_label(index, origin):
+    if origin == DECOY:
+        return "decoy"
+    if origin == ORIGINAL:
+        return "original"
+    return index["families"][origin]
+
+
+def lookup(index, accession):
+    """Every record with this base accession, as dicts of record_id, origin, offset and length."""
+    import numpy as np
+    key = base_accession(accession).encode()
+    accessions = index["accessions"]
+    start = int(np.searchsorted(accessions, key, side="left"))
+    end = int(np.searchsorted(accessions, key, side="right"))
+    return [
+        {
+            "record_id": index["record_ids"][row].decode(),
+            "origin": origin_label(index, int(index["origins"][row])),
+            "offset": int(index["offsets"][row]),
+            "length": int(index["lengths"][row]),
+        }
+        for row in range(start, end)
+    ]
+
+
+def _unique_sorted(values):
+    # values are sorted, so dropping repeats of the previous value keeps them sorted and unique
+    import numpy as np
+    if len(values) == 0:
+        return []
+    keep = np.ones(len(values), dtype=bool)
+    keep[1:] = values[1:] != values[:-1]
+    return [value.decode() for value in values[keep].tolist()]
+
+
+def origin_names(index):
+    """Sorted unique base accessions of the original records and of the decoy records."""
+    import numpy as np
+    accessions = index["accessions"]
+    is_decoy = np.asarray(index["origins"]) == DECOY
+    return _unique_sorted(accessions[~is_decoy]), _unique_sorted(accessions[is_decoy])
@@ -3,78 +3,145 @@
 import argparse
 import csv
 import gzip
+import io
+import multiprocessing
 from pathlib import Path
-from Bio import SeqIO
+from prefetch import PREFETCH_DEPTH, PREFETCH_MB, add_prefetch_args, prefetch, prefetch_options
+from stage_timing import StageTimer, add_timing_args
+
+# Recognised MSA suffixes; any other file in the folder is skipped
+MSA_SUFFIXES = (".fasta.gz", ".fas.gz", ".aln.gz", ".fasta", ".fas", ".aln")
+
+# Decoy IDs, populated once in the parent and inherited by forked workers
+_SHARED = {}
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Count decoy sequences in MSAs and output stats.")
     parser.add_argument("--msa_folder", required=True, help="Folder containing MSA files (FASTA format, optionally gzipped).")
     parser.add_argument("--decoy_fasta", required=True, help="FASTA file containing decoy sequences.")
     parser.add_argument("--output_csv", required=True, help="Output CSV filename.")
+    parser.add_argument("--decoy_details", default=None, help="Optional TSV listing the position and ID of every decoy record per family.")
+    parser.add_argument("--threads", type=int, default=1, help="Number of worker processes (default: 1).")
+    add_prefetch_args(parser)
+    add_timing_args(parser)
     return parser.parse_args()
 
+def open_bytes(path):
+    return gzip.open(path, "rb") if str(path).endswith(".gz") else open(path, "rb")
+
 def read_decoy_ids(decoy_fasta):
+    """Collect decoy record IDs from FASTA headers only."""
     decoy_ids = set()
-    for record in SeqIO.parse(decoy_fasta, "fasta"):
-        decoy_ids.add(record.id)
-    return decoy_ids
+    with open_bytes(decoy_fasta) as handle:
+        for line in handle:
+            if line.startswith(b">"):
+                decoy_ids.add((line[1:].split(None, 1) or [b""])[0])
+    return frozenset(decoy_ids)
+
+def msa_family(filename):
+    """Family name for an MSA file, or None if the suffix is not a known alignment suffix."""
+    for suffix in MSA_SUFFIXES:
+        if filename.endswith(suffix):
+            return filename[:-len(suffix)]
+    return None
 
-def process_msa_file(msa_path, decoy_ids):
+def tally_decoys(family, record_ids, decoy_ids, keep_details=False):
+    """Count decoy records among the record IDs (all str or all bytes, like decoy_ids) of one MSA."""
     total_sequences = 0
     decoy_sequences = 0
+    details = []
+    separator = None
 
-    is_gzipped = msa_path.suffix == ".gz"
-    open_func = gzip.open if is_gzipped else open
-    mode = 'rt'  # read text mode
-
-    with open_func(msa_path, mode) as handle:
-        for record in SeqIO.parse(handle, "fasta"):
-            total_sequences += 1
-            cleaned_name = record.id.split("/", 1)[0]
-            if cleaned_name in decoy_ids:
-                decoy_sequences += 1
-
-    # Remove multiple suffixes like .fas.gz or .fasta.gz
-    base_name = msa_path.name
-    if base_name.endswith(".fas.gz"):
-        family = base_name[:-7]
-    elif base_name.endswith(".fasta.gz"):
-        family = base_name[:-9]
-    elif base_name.endswith(".fas"):
-        family = base_name[:-4]
-    elif base_name.endswith(".fasta"):
-        family = base_name[:-6]
-    else:
-        family = msa_path.stem
+    for record_id in record_ids:
+        if separator is None:
+            separator = b"/" if isinstance(record_id, bytes) else "/"
+        total_sequences += 1
+        if record_id.split(separator, 1)[0] in decoy_ids:
+            decoy_sequences += 1
+            if keep_details:
+                details.append((total_sequences, record_id.decode() if isinstance(record_id, bytes) else record_id))
 
     percentage = (decoy_sequences / total_sequences * 100) if total_sequences > 0 else 0
-    return {
+    stats = {
         "family": family,
         "decoy_count": decoy_sequences,
         "total_sequences": total_sequences,
         "decoy_percentage": percentage
     }
+    return stats, details
 
-def main():
-    args = parse_args()
-    msa_folder = Path(args.msa_folder)
-    decoy_ids = read_decoy_ids(args.decoy_fasta)
+def iter_record_ids(handle):
+    for line in handle:
+        if line.startswith(b">"):
+            yield (line[1:].split(None, 1) or [b""])[0]
+
+def process_msa_file(msa_path, decoy_ids, keep_details=False, data=None):
+    """Tally one MSA, parsing its already read (and decompressed) bytes when data is given."""
+    with (open_bytes(msa_path) if data is None else io.BytesIO(data)) as handle:
+        return tally_decoys(msa_family(msa_path.name), iter_record_ids(handle), decoy_ids, keep_details)
+
+def _process_worker(msa_path):
+    return process_msa_file(msa_path, _SHARED["decoy_ids"], _SHARED["keep_details"])
 
-    results = []
-    for msa_file in msa_folder.glob("*"):
-        if msa_file.is_file():
-            stats = process_msa_file(msa_file, decoy_ids)
-            results.append(stats)
+def process_msa_files(msa_files, decoy_ids, keep_details, threads,
+                      depth=PREFETCH_DEPTH, budget_bytes=PREFETCH_MB * 1024 * 1024):
+    """Yield (stats, details) per MSA in input order, in parallel when threads > 1.
 
+    A single process reads and decompresses the next MSAs in background threads
+    while it tallies the current one.
+    """
+    if threads <= 1 or len(msa_files) <= 1:
+        for msa_file, read in prefetch(msa_files, depth, budget_bytes):
+            yield process_msa_file(msa_file, decoy_ids, keep_details, read())
+        return
+    _SHARED["decoy_ids"] = decoy_ids
+    _SHARED["keep_details"] = keep_details
+    ctx = multiprocessing.get_context("fork")
+    chunksize = max(1, len(msa_files) // (threads * 4))
+    with ctx.Pool(processes=threads) as pool:
+        yield from pool.imap(_process_worker, msa_files, chunksize=chunksize)
+    _SHARED.clear()
+
+def write_results(results, all_details, output_csv, decoy_details=None):
     # Sort by descending decoy percentage
     results.sort(key=lambda x: x["decoy_percentage"], reverse=True)
 
     # Write output CSV
-    with open(args.output_csv, "w", newline="") as csvfile:
+    with open(output_csv, "w", newline="") as csvfile:
         writer = csv.DictWriter(csvfile, fieldnames=["family", "decoy_count", "total_sequences", "decoy_percentage"])
         writer.writeheader()
         for row in results:
             writer.writerow(row)
 
+    if decoy_details is not None:
+        with open(decoy_details, "w") as f:
+            f.write("family\tposition\tdecoy_id\n")
+            for family, position, record_id in all_details:
+                f.write(f"{family}\t{position}\t{record_id}\n")
+
+def main():
+    args = parse_args()
+    with StageTimer.from_args(args) as timer:
+        msa_folder = Path(args.msa_folder)
+        with timer.stage("load"):
+            decoy_ids = read_decoy_ids(args.decoy_fasta)
+
+        with timer.stage("index"):
+            msa_files = sorted(
+                msa_file for msa_file in msa_folder.iterdir()
+                if msa_file.is_file() and msa_family(msa_file.name) is not None
+            )
+
+        with timer.stage("compute"):
+            keep_details = args.decoy_details is not None
+            results = []
+            all_details = []
+            for stats, details in process_msa_files(msa_files, decoy_ids, keep_details, args.threads, *prefetch_options(args)):
+                results.append(stats)
+                all_details.extend((stats["family"], position, record_id) for position, record_id in details)
+
+        with timer.stage("write"):
+            write_results(results, all_details, args.output_csv, args.decoy_details)
+
 if __name__ == "__main__":
     main()
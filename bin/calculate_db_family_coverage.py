@@ -1,42 +1,43 @@
 #!/usr/bin/env python3
 
 import argparse
-import os
-import glob
 import csv
+import numpy as np
+from similarity_edges import DB_LAYERS, counts_at_or_above, first_at_or_above, read_similarity_results
+from stage_timing import StageTimer, add_timing_args
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Count hits of original families per database based on similarity results.")
-    parser.add_argument("--similarity_results", required=True, help="Path to the TSV file with similarity results.")
-    parser.add_argument("--original_families_dir", required=True, help="Base directory containing original family FASTA files organized by database.")
+    parser.add_argument("--similarity_results", required=True, help="Path to the TSV file or .npz edge list with similarity results.")
+    parser.add_argument("--similarity_threshold", type=float, default=None, help="Minimum similarity score for a hit (default: keep every result in the file).")
     parser.add_argument("--output_file", required=True, help="Output CSV file for the summary report.")
+    parser.add_argument("--curve_file", default=None, help="Optional CSV with the hits per database at each of --curve_thresholds.")
+    parser.add_argument("--curve_thresholds", type=float, nargs="+", default=[0.5, 0.6, 0.7, 0.8, 0.9, 1.0], help="Similarity thresholds of the coverage curve (default: 0.5 0.6 0.7 0.8 0.9 1.0).")
+    add_timing_args(parser)
     return parser.parse_args()
 
-def extract_hit_families(similarity_results_path):
-    """Extract unique original_basename entries from the similarity results."""
-    hit_families = set()
-    with open(similarity_results_path) as f:
-        next(f)  # Skip header
-        for line in f:
-            parts = line.strip().split('\t')
-            if len(parts) >= 2:
-                hit_families.add(parts[1])
-    return hit_families
-
-def count_hits_per_database(original_base_dir, hit_families):
-    """Count how many original family FASTA files are in the hit set per database."""
-    db_layers = ["hamap", "ncbifam", "panther", "pfam"]
-    hits_summary = {}
-
-    for db in db_layers:
-        db_path = os.path.join(original_base_dir, db)
-        fasta_files = glob.glob(os.path.join(db_path, "*.fasta"))
-        base_filenames = {os.path.splitext(os.path.basename(f))[0] for f in fasta_files}
-        
-        hits = len(base_filenames & hit_families)
-        hits_summary[db.upper()] = hits  # Uppercase as in output example
-
-    return hits_summary
+def best_family_scores(edges):
+    """Database codes (rows of DB_LAYERS) and best scores of every distinct (database, original family) in the edge list."""
+    # Families of other databases were never counted
+    keep = np.isin(edges["db_layer"], DB_LAYERS)
+    db_codes = np.searchsorted(DB_LAYERS, edges["db_layer"][keep])
+    _, family_codes = np.unique(edges["original"][keep], return_inverse=True)
+    pair_codes = family_codes.astype(np.int64) * len(DB_LAYERS) + db_codes
+    # Edges are sorted by ascending score, so the last edge of each pair holds its best score
+    _, first_from_end = np.unique(pair_codes[::-1], return_index=True)
+    last = len(pair_codes) - 1 - first_from_end
+    return db_codes[last], edges["score"][keep][last]
+
+def hits_per_database(edges, thresholds):
+    """Families per database with a best score at or above each threshold, from one sort of the best scores."""
+    db_codes, scores = best_family_scores(edges)
+    order = np.lexsort((scores, db_codes))
+    db_codes, scores = db_codes[order], scores[order]
+    bounds = np.searchsorted(db_codes, np.arange(len(DB_LAYERS) + 1))
+    return {
+        db.upper(): counts_at_or_above(scores[bounds[i]:bounds[i + 1]], thresholds)  # Uppercase as in output example
+        for i, db in enumerate(DB_LAYERS)
+    }
 
 def write_summary(output_file, hits_summary):
     """Write the summary to a CSV file."""
@@ -46,12 +47,31 @@ def write_summary(output_file, hits_summary):
         for db, count in hits_summary.items():
             writer.writerow([db, count])
 
+def write_curve(curve_file, thresholds, hits):
+    """Write one row per threshold with the hits of every database."""
+    with open(curve_file, "w", newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["threshold", *hits])
+        for i, threshold in enumerate(thresholds):
+            writer.writerow([threshold, *(int(counts[i]) for counts in hits.values())])
+
 def main():
     args = parse_args()
 
-    hit_families = extract_hit_families(args.similarity_results)
-    hits_summary = count_hits_per_database(args.original_families_dir, hit_families)
-    write_summary(args.output_file, hits_summary)
+    with StageTimer.from_args(args) as timer:
+        with timer.stage("load"):
+            edges = read_similarity_results(args.similarity_results)
+        with timer.stage("compute"):
+            # The summary threshold and the curve come out of the same pass; no threshold keeps every edge
+            curve_thresholds = args.curve_thresholds if args.curve_file else []
+            for threshold in [args.similarity_threshold, *curve_thresholds]:
+                first_at_or_above(edges, threshold)  # Rejects thresholds below the edge list floor
+            threshold = -np.inf if args.similarity_threshold is None else args.similarity_threshold
+            hits = hits_per_database(edges, [threshold, *curve_thresholds])
+        with timer.stage("write"):
+            write_summary(args.output_file, {db: int(counts[0]) for db, counts in hits.items()})
+            if args.curve_file:
+                write_curve(args.curve_file, curve_thresholds, {db: counts[1:] for db, counts in hits.items()})
 
 if __name__ == "__main__":
     main()
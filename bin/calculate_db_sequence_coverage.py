@@ -3,7 +3,12 @@
 import os
 import csv
 import argparse
-from Bio import SeqIO
+import multiprocessing
+from indexed_fasta import open_fasta
+from membership_store import family_member_sets, open_store
+from parse_cache import ParseCache, add_cache_args, base_ids
+from prefetch import PREFETCH_DEPTH, PREFETCH_MB, add_prefetch_args, open_data, prefetch, prefetch_options
+from stage_timing import StageTimer, add_timing_args
 
 def load_metadata(metadata_file):
     db_to_ids = {"pfam": set(), "hamap": set(), "panther": set(), "ncbifam": set()}
@@ -26,29 +31,83 @@ def load_original_hits(original_counts_file):
                     found_proteins.add(parts[0])
     return found_proteins
 
-def extract_protein_ids_from_alignment(file_path):
+def extract_protein_ids_from_alignment(file_path, read=None):
+    """Protein IDs of one family file, or of its prefetched bytes when read is given, keeping what was read before an error."""
+    from Bio import SeqIO
     protein_ids = set()
     try:
-        for record in SeqIO.parse(file_path, "fasta"):
-            cleaned_name = record.id.split("/", 1)[0]
-            protein_ids.add(cleaned_name)
+        # Prefetched bytes are still compressed, so a truncated file keeps its readable records
+        with (open_fasta(file_path) if read is None else open_data(read(), compressed=file_path.endswith(".gz"))) as handle:
+            for record in SeqIO.parse(handle, "fasta"):
+                cleaned_name = record.id.split("/", 1)[0]
+                protein_ids.add(cleaned_name)
     except Exception as e:
         print(f"Warning: Couldn't parse {file_path}: {e}")
     return protein_ids
 
-def compute_match_stats(db_to_ids, msa_paths, found_proteins, output_file):
+def index_family_files(msa_folder):
+    """Scan a database folder once, mapping each exact file stem to its path."""
+    stem_to_path = {}
+    if not os.path.isdir(msa_folder):
+        return stem_to_path
+    for filename in sorted(os.listdir(msa_folder)):
+        if filename.endswith((".fai", ".gzi")):
+            continue  # samtools indexes of BGZF family files
+        stem = filename.split(".", 1)[0]
+        stem_to_path.setdefault(stem, os.path.join(msa_folder, filename))
+    return stem_to_path
+
+def load_family_ids(task):
+    file_path, cache = task
+    if cache is not None and cache.cache_dir is not None:
+        try:
+            return set(base_ids(cache.summary(file_path)[0]))
+        except Exception:
+            pass  # Parsed again below, which warns and keeps what can be read
+    return extract_protein_ids_from_alignment(file_path)
+
+def collect_db_protein_ids(family_paths, threads=1, cache=None, depth=PREFETCH_DEPTH, budget_bytes=PREFETCH_MB * 1024 * 1024):
+    tasks = [(path, cache) for path in family_paths]
+    total_unique = set()
+    if threads <= 1 or len(tasks) <= 1:
+        if cache is not None and cache.cache_dir is not None:
+            for task in tasks:
+                total_unique.update(load_family_ids(task))
+        else:
+            for path, read in prefetch(family_paths, depth, budget_bytes, decompress=False):
+                total_unique.update(extract_protein_ids_from_alignment(path, read))
+    else:
+        ctx = multiprocessing.get_context("fork")
+        chunksize = max(1, len(tasks) // (threads * 4))
+        with ctx.Pool(processes=threads) as pool:
+            for protein_ids in pool.imap_unordered(load_family_ids, tasks, chunksize=chunksize):
+                total_unique.update(protein_ids)
+    return total_unique
+
+def select_family_paths(ids, msa_folder):
+    stem_to_path = index_family_files(msa_folder)
+    return [stem_to_path[family_id] for family_id in sorted(ids) if family_id in stem_to_path]
+
+def compute_match_stats(db_to_ids, msa_paths, found_proteins, output_file, threads=1, cache=None, family_ids=None, store=None,
+                        depth=PREFETCH_DEPTH, budget_bytes=PREFETCH_MB * 1024 * 1024):
+    """Write per-database coverage.
+
+    family_ids optionally maps family paths to already parsed protein IDs; otherwise
+    families come from the membership store when it covers them, or are parsed.
+    """
     with open(output_file, "w") as out:
         out.write("db\tmatch_percentage\tmatched\ttotal\n")
         for db, ids in db_to_ids.items():
-            msa_folder = msa_paths[db]
-            total_unique = set()
-            for family_id in ids:
-                for filename in os.listdir(msa_folder):
-                    if filename.startswith(family_id):
-                        full_path = os.path.join(msa_folder, filename)
-                        protein_ids = extract_protein_ids_from_alignment(full_path)
-                        total_unique.update(protein_ids)
-                        break  # only take the first match
+            family_paths = select_family_paths(ids, msa_paths[db])
+            member_sets = None
+            if family_ids is not None:
+                member_sets = [family_ids[path] for path in family_paths]
+            elif store is not None:
+                member_sets = family_member_sets(store, family_paths)
+            if member_sets is not None:
+                total_unique = set().union(*member_sets)
+            else:
+                total_unique = collect_db_protein_ids(family_paths, threads, cache, depth, budget_bytes)
             if not total_unique:
                 print(f"{db.upper()}: No alignments found.")
                 continue
@@ -65,6 +124,10 @@ def parse_args():
     parser.add_argument("--original_counts", required=True, help="Path to the original counts file")
     parser.add_argument("--msa_root", required=True, help="Root directory containing pfam, panther, hamap, ncbifam subfolders")
     parser.add_argument("--output", required=True, help="Output file path to write results")
+    parser.add_argument("--threads", type=int, default=1, help="Number of worker processes for alignment parsing (default: 1)")
+    add_cache_args(parser)
+    add_prefetch_args(parser)
+    add_timing_args(parser)
     return parser.parse_args()
 
 def main():
@@ -77,14 +140,22 @@ def main():
         "hamap": os.path.join(args.msa_root, "hamap")
     }
 
-    print("Loading metadata...")
-    db_to_ids = load_metadata(args.metadata)
+    with StageTimer.from_args(args) as timer, ParseCache.from_args(args) as cache:
+        with timer.stage("load"):
+            print("Loading metadata...")
+            db_to_ids = load_metadata(args.metadata)
 
-    print("Loading original hits...")
-    found_proteins = load_original_hits(args.original_counts)
+            print("Loading original hits...")
+            found_proteins = load_original_hits(args.original_counts)
 
-    print("Computing match statistics...")
-    compute_match_stats(db_to_ids, msa_paths, found_proteins, args.output)
+        # Family files are parsed per database as the coverage lines are written
+        with timer.stage("compute_and_write"):
+            print("Computing match statistics...")
+            depth, budget_bytes = prefetch_options(args)
+            compute_match_stats(
+                db_to_ids, msa_paths, found_proteins, args.output, args.threads, cache, store=open_store(args.msa_root),
+                depth=depth, budget_bytes=budget_bytes
+            )
     print(f"Results written to: {args.output}")
 
 if __name__ == "__main__":
@@ -3,9 +3,25 @@
 import os
 import glob
 import gzip
+import hashlib
 import argparse
-from Bio import SeqIO
+import multiprocessing
+from collections import Counter, defaultdict
+import numpy as np
 import itertools
+from similarity_edges import write_edges
+from membership_store import family_member_sets, open_store
+from checkpoint import Checkpoint, add_checkpoint_args, input_fingerprint
+from parse_cache import ParseCache, add_cache_args, base_ids
+from prefetch import PREFETCH_DEPTH, PREFETCH_MB, add_prefetch_args, open_data, prefetch, prefetch_options
+from shards import parse_shard, select_shard
+from stage_timing import StageTimer, add_timing_args
+
+# Mersenne prime for the universal hash family used by the MinHash permutations
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+# Least chance that the default banding makes a pair scoring exactly at the threshold an LSH candidate
+_LSH_RECALL = 0.99
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Calculate Jaccard similarity between use-case MSAs and original family FASTAs.")
@@ -13,20 +29,53 @@ def parse_args():
     parser.add_argument("--original_base_dir", required=True, help="Base folder containing original family FASTA files (.fasta or .fasta.gz).")
     parser.add_argument("--output_file", required=True, help="Output TSV file for the similarity results.")
     parser.add_argument("--similarity_threshold", type=float, default=0.5, help="Similarity threshold to filter matches (default: 0.5).")
+    parser.add_argument("--mode", choices=["exact", "minhash"], default="exact", help="'exact' scores every family sharing a protein; 'minhash' only scores LSH candidate pairs (default: exact).")
+    parser.add_argument("--num_perm", type=int, default=128, help="Number of MinHash permutations (minhash mode, default: 128).")
+    parser.add_argument("--bands", type=int, default=None, help="Number of LSH bands; must divide --num_perm (minhash mode, default: picked from the threshold).")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the MinHash permutations (minhash mode, default: 1).")
+    parser.add_argument("--recall_report", default=None, help="Optional file to write the recall of minhash mode against exact mode.")
+    parser.add_argument("--edges_file", default=None, help="Optional .npz edge list keeping every pair at or above --edge_floor, for downstream threshold sweeps.")
+    parser.add_argument("--edge_floor", type=float, default=0.1, help="Lowest similarity kept in --edges_file (default: 0.1).")
+    parser.add_argument("--shard", type=parse_shard, default=(1, 1), help="Only score shard i of N (1-based 'i/N') of the sorted use-case files (default: 1/1).")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes (default: 1).")
+    add_checkpoint_args(parser)
+    add_cache_args(parser)
+    add_prefetch_args(parser)
+    add_timing_args(parser)
     return parser.parse_args()
 
-def extract_protein_ids(fasta_path):
-    """Extracts set of protein IDs (splitting on '/') from a FASTA file (supports gzip)."""
+def extract_protein_ids(fasta_path, data=None):
+    """Extracts set of protein IDs (splitting on '/') from a FASTA file (supports gzip), or from its prefetched bytes."""
+    from Bio import SeqIO
     ids = set()
     is_gz = fasta_path.endswith(".gz")
     open_func = gzip.open if is_gz else open
 
-    with open_func(fasta_path, 'rt') as handle:
+    with (open_func(fasta_path, 'rt') if data is None else open_data(data)) as handle:
         for record in SeqIO.parse(handle, "fasta"):
             base_id = record.id.split('/')[0]
             ids.add(base_id)
     return ids
 
+def load_protein_ids(fasta_path, cache=None):
+    """Protein IDs of one family file, read from the parse cache when one is set."""
+    if cache is not None and cache.cache_dir is not None:
+        return set(base_ids(cache.summary(fasta_path)[0]))
+    return extract_protein_ids(fasta_path)
+
+def iter_protein_ids(paths, cache=None, depth=PREFETCH_DEPTH, budget_bytes=PREFETCH_MB * 1024 * 1024):
+    """Yield (path, protein IDs) per file in order.
+
+    Without a parse cache every file is parsed in full, so the next files are read
+    and decompressed in background threads while the current one is parsed.
+    """
+    if cache is not None and cache.cache_dir is not None:
+        for path in paths:
+            yield path, load_protein_ids(path, cache)
+        return
+    for path, read in prefetch(paths, depth, budget_bytes):
+        yield path, extract_protein_ids(path, read())
+
 def jaccard_similarity(set1, set2):
     """Computes the Jaccard similarity index."""
     intersection = set1 & set2
@@ -39,50 +88,294 @@ def strip_extensions(filename):
             return filename[:-len(ext)]
     return os.path.splitext(filename)[0]
 
-def main():
-    args = parse_args()
-
-    use_case_dir = args.use_case_dir
-    original_base_dir = args.original_base_dir
-    output_file = args.output_file
-    similarity_threshold = args.similarity_threshold
-
-    db_layers = ["pfam", "panther", "ncbifam", "hamap"]
-    
-    # Build a list of all original family FASTA files
+def list_original_files(original_base_dir, db_layers):
+    """(path, db_layer) of every original family FASTA, in scoring order."""
     original_files = []
     for db_layer in db_layers:
         folder = os.path.join(original_base_dir, db_layer)
-        fasta_files = glob.glob(os.path.join(folder, "*.fasta")) + glob.glob(os.path.join(folder, "*.fasta.gz"))
-        for f in fasta_files:
-            original_files.append((f, db_layer))  # Tuple of path + db_layer name
+        fasta_files = sorted(glob.glob(os.path.join(folder, "*.fasta")) + glob.glob(os.path.join(folder, "*.fasta.gz")))
+        original_files.extend((f, db_layer) for f in fasta_files)
+    return original_files
+
+def load_original_families(original_base_dir, db_layers, cache=None, depth=PREFETCH_DEPTH, budget_bytes=PREFETCH_MB * 1024 * 1024):
+    """Parse every original family once, returning (basename, db_layer, ids) in file order.
+
+    Families are read from the folder's membership store when it covers every file.
+    """
+    original_files = list_original_files(original_base_dir, db_layers)
+    store = open_store(original_base_dir)
+    member_sets = family_member_sets(store, [f for f, _ in original_files]) if store is not None else None
+    if member_sets is not None:
+        print(f"Loaded {len(member_sets)} original families from the membership store")
+    else:
+        member_sets = [ids for _, ids in iter_protein_ids([f for f, _ in original_files], cache, depth, budget_bytes)]
+    return [
+        (strip_extensions(os.path.basename(f)), db_layer, ids)
+        for (f, db_layer), ids in zip(original_files, member_sets)
+    ]
+
+def build_inverted_index(originals):
+    """Map each protein ID to the indices of the original families containing it."""
+    index = defaultdict(list)
+    for i, (_, _, ids) in enumerate(originals):
+        for protein_id in ids:
+            index[protein_id].append(i)
+    return index
+
+def exact_matches(use_case_ids, originals, inverted_index, similarity_threshold):
+    """Yield (original index, similarity) for every original family scoring above the threshold."""
+    if similarity_threshold <= 0:
+        # Families sharing nothing still pass a non-positive threshold, so score them all
+        for i, (_, _, original_ids) in enumerate(originals):
+            yield i, jaccard_similarity(use_case_ids, original_ids)
+        return
+
+    shared = Counter()
+    for protein_id in use_case_ids:
+        shared.update(inverted_index.get(protein_id, ()))
+    for i in sorted(shared):
+        intersection = shared[i]
+        union = len(use_case_ids) + len(originals[i][2]) - intersection
+        similarity = intersection / union if union else 0.0
+        if similarity >= similarity_threshold:
+            yield i, similarity
+
+class MinHashLSH:
+    """MinHash sketches of protein-ID sets, bucketed by banded LSH over the original families."""
+
+    def __init__(self, num_perm, bands, seed):
+        if num_perm % bands:
+            raise ValueError(f"--bands ({bands}) must divide --num_perm ({num_perm})")
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(seed)
+        # a and b below 2**32 keep a * x + b within uint64 for the 32-bit ID hashes
+        self.a = rng.integers(1, int(_MAX_HASH) + 1, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, int(_MAX_HASH) + 1, size=num_perm, dtype=np.uint64)
+        self.buckets = [defaultdict(list) for _ in range(bands)]
+        self._id_hashes = {}
+
+    @staticmethod
+    def choose_bands(num_perm, threshold, recall=_LSH_RECALL):
+        """Pick the fewest bands, so the fewest candidates, that make a pair at the threshold a candidate with the given chance.
+
+        A pair with Jaccard similarity s shares at least one of b bands of r rows with chance 1 - (1 - s^r)^b.
+        """
+        for bands in range(1, num_perm + 1):
+            if num_perm % bands:
+                continue
+            rows = num_perm // bands
+            if 1 - (1 - threshold ** rows) ** bands >= recall:
+                return bands
+        return num_perm
+
+    def _hash_ids(self, ids):
+        hashes = np.empty(len(ids), dtype=np.uint64)
+        for i, protein_id in enumerate(ids):
+            h = self._id_hashes.get(protein_id)
+            if h is None:
+                h = int.from_bytes(hashlib.blake2b(protein_id.encode(), digest_size=4).digest(), "little")
+                self._id_hashes[protein_id] = h
+            hashes[i] = h
+        return hashes
+
+    def signature(self, ids):
+        if not ids:
+            return np.full(len(self.a), _MAX_HASH, dtype=np.uint64)
+        # a, b and the ID hashes are all below 2**32, so a * x + b < 2**64 and the modulo is exact
+        hashes = self._hash_ids(ids)
+        sig = np.full(len(self.a), _MAX_HASH, dtype=np.uint64)
+        for start in range(0, len(hashes), 4096):
+            block = hashes[start:start + 4096]
+            permuted = (np.outer(block, self.a) + self.b) % _MERSENNE_PRIME & _MAX_HASH
+            np.minimum(sig, permuted.min(axis=0), out=sig)
+        return sig
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def insert(self, key, ids):
+        for band, band_key in self._band_keys(self.signature(ids)):
+            self.buckets[band][band_key].append(key)
+
+    def query(self, ids):
+        candidates = set()
+        for band, band_key in self._band_keys(self.signature(ids)):
+            candidates.update(self.buckets[band].get(band_key, ()))
+        return candidates
+
+def minhash_matches(use_case_ids, originals, lsh, similarity_threshold):
+    """Yield (original index, similarity) for LSH candidates that pass the exact Jaccard check."""
+    for i in sorted(lsh.query(use_case_ids)):
+        similarity = jaccard_similarity(use_case_ids, originals[i][2])
+        if similarity >= similarity_threshold:
+            yield i, similarity
+
+def list_use_case_files(use_case_dir):
+    return list(itertools.chain(
+        sorted(glob.glob(os.path.join(use_case_dir, "*.aln"))),
+        sorted(glob.glob(os.path.join(use_case_dir, "*.fasta"))),
+        sorted(glob.glob(os.path.join(use_case_dir, "*.aln.gz"))),
+        sorted(glob.glob(os.path.join(use_case_dir, "*.fas.gz"))),
+        sorted(glob.glob(os.path.join(use_case_dir, "*.fasta.gz")))
+    ))
+
+# Original families and their indexes, populated once in the parent and inherited by forked workers
+_SHARED = {}
+
+def score_use_case(use_case_fasta):
+    """Score one use-case family file against the originals."""
+    use_case_basename = strip_extensions(os.path.basename(use_case_fasta))
+    return score_use_case_ids(use_case_basename, load_protein_ids(use_case_fasta, _SHARED.get("cache")))
+
+def score_use_case_ids(use_case_basename, use_case_ids):
+    """Score one use-case ID set against the originals, returning its TSV lines, edges and recall counts."""
+    originals = _SHARED["originals"]
+    inverted_index = _SHARED["inverted_index"]
+    lsh = _SHARED["lsh"]
+    similarity_threshold = _SHARED["similarity_threshold"]
+    score_floor = _SHARED["score_floor"]
+
+    if lsh is not None:
+        matches = list(minhash_matches(use_case_ids, originals, lsh, score_floor))
+    else:
+        matches = list(exact_matches(use_case_ids, originals, inverted_index, score_floor))
+
+    exact_pairs = found_pairs = 0
+    if _SHARED["recall_report"] and lsh is not None:
+        exact = {i for i, _ in exact_matches(use_case_ids, originals, inverted_index, similarity_threshold)
+                 if originals[i][0] != use_case_basename}
+        exact_pairs = len(exact)
+        found_pairs = len(exact & {i for i, sim in matches if sim >= similarity_threshold})
+
+    lines = []
+    edges = []
+    for i, similarity in matches:
+        original_basename, db_layer, _ = originals[i]
+        if original_basename == use_case_basename:
+            continue
+        edges.append((i, db_layer, similarity))
+        if similarity >= similarity_threshold:
+            lines.append(f"{use_case_basename}\t{original_basename}\t{similarity:.3f}\tuse_case\t{db_layer}\n")
+    return use_case_basename, lines, edges, exact_pairs, found_pairs
+
+def score_use_cases(use_case_files, workers, depth=PREFETCH_DEPTH, budget_bytes=PREFETCH_MB * 1024 * 1024):
+    """Yield score_use_case results in file order, in parallel when workers > 1."""
+    if workers <= 1 or len(use_case_files) <= 1:
+        for path, ids in iter_protein_ids(use_case_files, _SHARED.get("cache"), depth, budget_bytes):
+            yield score_use_case_ids(strip_extensions(os.path.basename(path)), ids)
+        return
+    ctx = multiprocessing.get_context("fork")
+    chunksize = max(1, len(use_case_files) // (workers * 4))
+    with ctx.Pool(processes=workers) as pool:
+        yield from pool.imap(score_use_case, use_case_files, chunksize=chunksize)
+
+def prepare_scoring(originals, similarity_threshold, score_floor, mode="exact", num_perm=128, bands=None, seed=1, recall_report=None):
+    """Build the indexes score_use_case_ids reads, so forked workers inherit them."""
+    inverted_index = None
+    if mode == "exact" or recall_report:
+        inverted_index = build_inverted_index(originals)
+
+    lsh = None
+    if mode == "minhash":
+        bands = bands or MinHashLSH.choose_bands(num_perm, score_floor)
+        lsh = MinHashLSH(num_perm, bands, seed)
+        for i, (_, _, ids) in enumerate(originals):
+            lsh.insert(i, ids)
+        print(f"MinHash mode: {num_perm} permutations in {bands} bands of {lsh.rows} rows")
+
+    _SHARED.update(
+        originals=originals, inverted_index=inverted_index, lsh=lsh,
+        similarity_threshold=similarity_threshold, score_floor=score_floor,
+        recall_report=recall_report
+    )
+
+def write_similarity_results(results, originals, output_file, score_floor, edges_file=None, recall_report=None,
+                             mode="exact", shard_index=1, shard_count=1):
+    """Write the TSV, edge list and recall report from (label, score_use_case result) pairs in file order."""
+    exact_pairs = 0
+    found_pairs = 0
+    use_case_names = []
+    edges = []
 
     with open(output_file, "w") as out_f:
         out_f.write("use_case_basename\toriginal_basename\tsimilarity_score\tuse_case_layer\tdb_layer\n")
 
-        use_case_files = itertools.chain(
-            glob.glob(os.path.join(use_case_dir, "*.aln")),
-            glob.glob(os.path.join(use_case_dir, "*.fasta")),
-            glob.glob(os.path.join(use_case_dir, "*.aln.gz")),
-            glob.glob(os.path.join(use_case_dir, "*.fas.gz")),
-            glob.glob(os.path.join(use_case_dir, "*.fasta.gz"))
-        )
-
         counter = 0
         # Iterate over use-case FASTA files
-        for use_case_fasta in use_case_files:
+        for use_case_fasta, result in results:
             counter += 1
-            print(f"[{counter}] Processing {use_case_fasta}")
-            use_case_basename = strip_extensions(os.path.basename(use_case_fasta))
-            use_case_ids = extract_protein_ids(use_case_fasta)
+            print(f"[{counter}] Processed {use_case_fasta}")
+            use_case_basename, lines, use_case_edges, uc_exact_pairs, uc_found_pairs = result
+            out_f.writelines(lines)
+
+            use_case_idx = len(use_case_names)
+            use_case_names.append(use_case_basename)
+            if edges_file:
+                edges.extend((use_case_idx, i, db_layer, similarity) for i, db_layer, similarity in use_case_edges)
+            exact_pairs += uc_exact_pairs
+            found_pairs += uc_found_pairs
+
+    if edges_file:
+        original_names = [basename for basename, _, _ in originals]
+        write_edges(edges_file, score_floor, use_case_names, original_names, edges,
+                    shard_index=shard_index, shard_count=shard_count)
+        print(f"Wrote {len(edges)} edges at or above {score_floor} to {edges_file}")
+
+    if recall_report:
+        recall = found_pairs / exact_pairs if exact_pairs else 1.0
+        with open(recall_report, "w") as report:
+            report.write(f"mode\t{mode}\n")
+            report.write(f"exact_pairs\t{exact_pairs}\n")
+            report.write(f"found_pairs\t{found_pairs}\n")
+            report.write(f"recall\t{recall:.4f}\n")
+        print(f"Recall against exact mode: {recall:.4f} ({found_pairs}/{exact_pairs})")
+
+def main():
+    args = parse_args()
+
+    use_case_dir = args.use_case_dir
+    original_base_dir = args.original_base_dir
+    output_file = args.output_file
+    similarity_threshold = args.similarity_threshold
+    # Pairs are scored down to the edge floor when an edge list is requested
+    score_floor = min(similarity_threshold, args.edge_floor) if args.edges_file else similarity_threshold
+
+    db_layers = ["pfam", "panther", "ncbifam", "hamap"]
+
+    with StageTimer.from_args(args) as timer, ParseCache.from_args(args) as cache:
+        # Parse every original family FASTA once
+        with timer.stage("load"):
+            originals = load_original_families(original_base_dir, db_layers, cache, *prefetch_options(args))
+        with timer.stage("index"):
+            prepare_scoring(
+                originals, similarity_threshold, score_floor, mode=args.mode, num_perm=args.num_perm,
+                bands=args.bands, seed=args.seed, recall_report=args.recall_report
+            )
+            _SHARED["cache"] = cache
 
-            for original_fasta, db_layer in original_files:
-                original_basename = strip_extensions(os.path.basename(original_fasta))
-                original_ids = extract_protein_ids(original_fasta)
+        shard_index, shard_count = args.shard
+        use_case_files = select_shard(list_use_case_files(use_case_dir), shard_index, shard_count)
+        print(f"Shard {shard_index}/{shard_count}: {len(use_case_files)} use-case files")
+        fingerprint = input_fingerprint([use_case_dir, original_base_dir], {
+            "similarity_threshold": similarity_threshold, "score_floor": score_floor, "mode": args.mode,
+            "num_perm": args.num_perm, "bands": args.bands, "seed": args.seed,
+            "recall_report": bool(args.recall_report), "shard": [shard_index, shard_count]
+        })
 
-                similarity = jaccard_similarity(use_case_ids, original_ids)
-                if similarity >= similarity_threshold and original_basename != use_case_basename:
-                    out_f.write(f"{use_case_basename}\t{original_basename}\t{similarity:.3f}\tuse_case\t{db_layer}\n")
+        # Use-case families are scored as their results are written, so both share one stage
+        with timer.stage("compute_and_write"), Checkpoint(args.checkpoint, fingerprint, args.resume) as checkpoint:
+            # Files scored by an interrupted run are read back instead of scored again
+            keys = [os.path.basename(path) for path in use_case_files]
+            scored = checkpoint.resume(keys, lambda pending: score_use_cases(
+                [os.path.join(use_case_dir, key) for key in pending], args.workers, *prefetch_options(args)
+            ))
+            results = zip(use_case_files, scored)
+            write_similarity_results(
+                results, originals, output_file, score_floor, args.edges_file, args.recall_report,
+                args.mode, shard_index, shard_count
+            )
 
 if __name__ == "__main__":
     main()
@@ -3,131 +3,256 @@
 import os
 import gzip
 import argparse
-from collections import defaultdict
-from Bio import SeqIO
-from Bio import AlignIO
+import itertools
+import multiprocessing
+import zlib
+from array import array
+import numpy as np
+from accession_index import open_accession_index, origin_names
+from parse_cache import ParseCache, add_cache_args, base_ids
+from prefetch import PREFETCH_DEPTH, PREFETCH_MB, add_prefetch_args, open_data, prefetch, prefetch_options
+from stage_timing import StageTimer, add_timing_args
 
-def load_fasta_names(fasta_path):
+ALIGNMENT_TYPES = ("sto", "aln", "fas.gz")
+# Errors of a truncated, corrupt or undecodable file, which is skipped with a warning
+READ_ERRORS = (OSError, EOFError, UnicodeDecodeError, zlib.error)
+
+# Name indexes, populated once in the parent and inherited by forked workers
+_SHARED = {}
+
+def load_fasta_names(fasta_path, cache=None):
+    if cache is not None and cache.cache_dir is not None:
+        return set(base_ids(cache.summary(fasta_path)[0]))
+    from Bio import SeqIO
     names = set()
     with (gzip.open(fasta_path, "rt") if fasta_path.endswith(".gz") else open(fasta_path)) as handle:
         for record in SeqIO.parse(handle, "fasta"):
             names.add(record.id.split("/", 1)[0])
     return names
 
-def parse_alignment_folder(folder_path, original_set, decoy_set, file_type):
-    original_count = defaultdict(int)
-    decoy_count = defaultdict(int)
-    unknown_proteins = set()
+def detect_alignment_type(filename, file_types):
+    for file_type in file_types:
+        if filename.endswith(f".{file_type}"):
+            return file_type
+    return None
+
+def open_alignment(filepath, file_type, read=None):
+    """Text handle on one alignment file, or on its prefetched bytes when read is given."""
+    if read is not None:
+        # Prefetched .fas.gz bytes are decompressed here, so a truncated file still yields its readable records
+        return open_data(read(), compressed=file_type == "fas.gz")
+    return gzip.open(filepath, "rt") if file_type == "fas.gz" else open(filepath)
+
+def iter_alignment_names(filepath, file_type, read=None):
+    """Yield the cleaned name of every record, reading headers only."""
+    if file_type == "sto":
+        # Interleaved Stockholm repeats record ids across blocks, so count each id once
+        seen = set()
+        with open_alignment(filepath, file_type, read) as handle:
+            for line in handle:
+                if not line.strip() or line.startswith("#") or line.startswith("//"):
+                    continue
+                record_id = line.split(None, 1)[0]
+                if record_id not in seen:
+                    seen.add(record_id)
+                    yield record_id.split("/", 1)[0]
+    else:
+        with open_alignment(filepath, file_type, read) as handle:
+            for line in handle:
+                if line.startswith(">"):
+                    yield (line[1:].split(None, 1) or [""])[0].split("/", 1)[0]
 
-    for name in original_set:
-        original_count[name] = 0
-    for name in decoy_set:
-        decoy_count[name] = 0
+def build_name_index(names):
+    """Map each name to a fixed position so counts can live in a flat uint32 array."""
+    ordered = sorted(names)
+    return ordered, {name: i for i, name in enumerate(ordered)}
 
-    for file in os.listdir(folder_path):
-        if not file.endswith(f".{file_type}"):
+def count_names(names, original_index, decoy_index):
+    """Split cleaned names into original hit indices, decoy hit indices and unknown names."""
+    original_hits = array("I")
+    decoy_hits = array("I")
+    unknown_proteins = set()
+    for cleaned_name in names:
+        idx = original_index.get(cleaned_name)
+        if idx is not None:
+            original_hits.append(idx)
             continue
+        idx = decoy_index.get(cleaned_name)
+        if idx is not None:
+            decoy_hits.append(idx)
+        else:
+            unknown_proteins.add(cleaned_name)
+    return original_hits, decoy_hits, unknown_proteins
+
+def iter_alignment_names_safely(filepath, file_type, read=None):
+    """Like iter_alignment_names, but stop with a warning on unreadable files, keeping what was read."""
+    try:
+        yield from iter_alignment_names(filepath, file_type, read)
+    except READ_ERRORS as e:
+        print(f"Warning: Failed to parse {filepath}. Error: {e}")
+
+def alignment_names(filepath, file_type, cache=None, read=None):
+    """Cleaned record names of one alignment file, read from the parse cache when one is set."""
+    if cache is not None and cache.cache_dir is not None:
+        try:
+            return base_ids(cache.summary(filepath)[0])
+        except READ_ERRORS:
+            pass  # Read again below, warning and keeping what can be read
+    return iter_alignment_names_safely(filepath, file_type, read)
+
+def count_alignment_file(filepath, file_type, original_index, decoy_index, cache=None, read=None):
+    names = alignment_names(filepath, file_type, cache, read)
+    return (file_type, *count_names(names, original_index, decoy_index))
 
-        filepath = os.path.join(folder_path, file)
-
-        if file_type == "sto":
-            try:
-                alignment = AlignIO.read(filepath, "stockholm")
-                for record in alignment:
-                    cleaned_name = record.id.split("/", 1)[0]
-                    if cleaned_name in original_count:
-                        original_count[cleaned_name] += 1
-                    elif cleaned_name in decoy_count:
-                        decoy_count[cleaned_name] += 1
-                    else:
-                        unknown_proteins.add(cleaned_name)
-            except Exception as e:
-                print(f"Warning: Failed to parse {filepath} as Stockholm. Error: {e}")
-
-        elif file_type in ("aln", "fas.gz"):
-            open_func = gzip.open if file_type == "fas.gz" else open
-            mode = "rt" if file_type == "fas.gz" else "r"
-            try:
-                with open_func(filepath, mode) as handle:
-                    for record in SeqIO.parse(handle, "fasta"):
-                        cleaned_name = record.id.split("/", 1)[0]
-                        if cleaned_name in original_count:
-                            original_count[cleaned_name] += 1
-                        elif cleaned_name in decoy_count:
-                            decoy_count[cleaned_name] += 1
-                        else:
-                            unknown_proteins.add(cleaned_name)
-            except Exception as e:
-                print(f"Warning: Failed to parse {filepath}. Error: {e}")
-
-    return original_count, decoy_count, unknown_proteins
-
-def write_counts_file(counts_dict, output_path, label):
-    sorted_counts = sorted(counts_dict.items(), key=lambda x: -x[1])
+def _count_worker(task):
+    filepath, file_type = task
+    return count_alignment_file(filepath, file_type, _SHARED["original_index"], _SHARED["decoy_index"], _SHARED["cache"])
+
+def merge_partials(results, partials):
+    for file_type, original_hits, decoy_hits, unknown_proteins in partials:
+        original_count, decoy_count, unknown_total = results[file_type]
+        np.add.at(original_count, np.asarray(original_hits, dtype=np.intp), 1)
+        np.add.at(decoy_count, np.asarray(decoy_hits, dtype=np.intp), 1)
+        unknown_total.update(unknown_proteins)
+
+def empty_results(file_types, original_index, decoy_index):
+    """Zeroed (original counts, decoy counts, unknown names) per alignment type."""
+    results = {}
+    for file_type in file_types:
+        original_count = np.zeros(len(original_index), dtype=np.uint32)
+        decoy_count = np.zeros(len(decoy_index), dtype=np.uint32)
+        results[file_type] = (original_count, decoy_count, set())
+    return results
+
+def parse_alignment_folder(folder_path, original_index, decoy_index, file_types, threads=1, cache=None,
+                           depth=PREFETCH_DEPTH, budget_bytes=PREFETCH_MB * 1024 * 1024):
+    """Scan every file of the requested types in one pass, returning per-type count arrays."""
+    tasks = []
+    for file in sorted(os.listdir(folder_path)):
+        file_type = detect_alignment_type(file, file_types)
+        if file_type is not None:
+            tasks.append((os.path.join(folder_path, file), file_type))
+
+    results = empty_results(file_types, original_index, decoy_index)
+
+    if threads <= 1 or len(tasks) <= 1:
+        if cache is not None and cache.cache_dir is not None:
+            # Cache hits never read the file, so nothing is read ahead
+            reads = itertools.repeat(None)
+        else:
+            reads = (read for _, read in prefetch((filepath for filepath, _ in tasks), depth, budget_bytes, decompress=False))
+        partials = (
+            count_alignment_file(filepath, file_type, original_index, decoy_index, cache, read)
+            for (filepath, file_type), read in zip(tasks, reads)
+        )
+        merge_partials(results, partials)
+    else:
+        _SHARED["original_index"] = original_index
+        _SHARED["decoy_index"] = decoy_index
+        _SHARED["cache"] = cache
+        ctx = multiprocessing.get_context("fork")
+        chunksize = max(1, len(tasks) // (threads * 4))
+        with ctx.Pool(processes=threads) as pool:
+            merge_partials(results, pool.imap_unordered(_count_worker, tasks, chunksize=chunksize))
+        _SHARED.clear()
+
+    return results
+
+def write_counts_file(names, counts, output_path, label):
+    # Stable sort on descending count; ties keep the alphabetical name order
+    order = np.argsort(-counts.astype(np.int64), kind="stable")
     with open(output_path, "w") as f:
         f.write(f"{label} Proteins (sorted by count):\n")
-        for name, count in sorted_counts:
-            f.write(f"{name}\t{count}\n")
+        f.writelines(f"{names[i]}\t{count}\n" for i, count in zip(order.tolist(), counts[order].tolist()))
 
 def write_summary(original_count, decoy_count, unknown_proteins, summary_file):
-    unique_original_found = sum(1 for count in original_count.values() if count > 0)
-    unique_decoy_found = sum(1 for count in decoy_count.values() if count > 0)
-    total_original_matches = sum(original_count.values())
-    total_decoy_matches = sum(decoy_count.values())
+    unique_original_found = np.count_nonzero(original_count)
+    unique_decoy_found = np.count_nonzero(decoy_count)
+    total_original_matches = int(original_count.sum(dtype=np.uint64))
+    total_decoy_matches = int(decoy_count.sum(dtype=np.uint64))
     total_unknowns = len(unknown_proteins)
 
     summary = (
         f"Total original matches in alignment files: {total_original_matches}\n"
         f"Total decoy matches in alignment files: {total_decoy_matches}\n"
         f"Total unknown sequences in alignment files: {total_unknowns}\n\n"
-        f"Unique original proteins found: {unique_original_found} / {len(original_count)}\n"
-        f"Unique decoy proteins found: {unique_decoy_found} / {len(decoy_count)}\n"
+        f"Unique original proteins found: {unique_original_found} / {original_count.size}\n"
+        f"Unique decoy proteins found: {unique_decoy_found} / {decoy_count.size}\n"
     )
 
     print(summary)
     with open(summary_file, "w") as f:
         f.write(summary)
 
+def write_type_outputs(file_type, original_names, decoy_names, result, output_dir="."):
+    """Write the counts, summary and unknown-sequence files for one alignment type."""
+    original_count, decoy_count, unknown_proteins = result
+    prefix = os.path.join(output_dir, f"{file_type}_")
+
+    print(f"Writing .{file_type} output files...")
+    write_counts_file(original_names, original_count, f"{prefix}original_counts.txt", "Original")
+    write_counts_file(decoy_names, decoy_count, f"{prefix}decoy_counts.txt", "Decoy")
+    write_summary(original_count, decoy_count, unknown_proteins, f"{prefix}summary.txt")
+
+    unknown_file = f"{prefix}unknown_sequences.txt"
+    with open(unknown_file, "w") as f:
+        for name in sorted(unknown_proteins):
+            f.write(f"{name}\n")
+
+    print(f"Found {len(unknown_proteins)} unknown sequences. Written to {unknown_file}")
+
 def main():
     parser = argparse.ArgumentParser(
         description="Parse alignment files and count matches for original and decoy proteins."
     )
     parser.add_argument("--original_fasta", help="Path to the original FASTA file")
     parser.add_argument("--decoy_fasta", help="Path to the decoy FASTA file")
+    parser.add_argument("--accession_index", help="Accession index written by combine_decoy_fasta.py, read instead of --original_fasta and --decoy_fasta")
     parser.add_argument("--alignment_folder", help="Folder containing alignment files")
     parser.add_argument(
-        "--alignment_type", choices=["sto", "aln", "fas.gz"],
-        help="Type of alignment files: 'sto', 'aln', or 'fas.gz'"
+        "--alignment_type", nargs="+", choices=ALIGNMENT_TYPES,
+        help="Type(s) of alignment files: 'sto', 'aln' and/or 'fas.gz'; all given types are scanned in a single pass"
     )
+    parser.add_argument("--threads", type=int, default=1, help="Number of worker processes (default: 1)")
+    add_cache_args(parser)
+    add_prefetch_args(parser)
+    add_timing_args(parser)
 
     args = parser.parse_args()
+    if not args.accession_index and not (args.original_fasta and args.decoy_fasta):
+        parser.error("Give either --accession_index or both --original_fasta and --decoy_fasta")
+    file_types = list(dict.fromkeys(args.alignment_type))
 
-    prefix = f"{args.alignment_type}_"
+    with StageTimer.from_args(args) as timer, ParseCache.from_args(args) as cache:
+        with timer.stage("load"):
+            if args.accession_index:
+                print("Opening accession index...")
+                original_set, decoy_set = origin_names(open_accession_index(args.accession_index))
+                print(f"Loaded {len(original_set)} unique original proteins and {len(decoy_set)} unique decoy proteins.")
+            else:
+                print("Loading original FASTA...")
+                original_set = load_fasta_names(args.original_fasta, cache)
+                print(f"Loaded {len(original_set)} unique original proteins.")
 
-    print("Loading original FASTA...")
-    original_set = load_fasta_names(args.original_fasta)
-    print(f"Loaded {len(original_set)} unique original proteins.")
+                print("Loading decoy FASTA...")
+                decoy_set = load_fasta_names(args.decoy_fasta, cache)
+                print(f"Loaded {len(decoy_set)} unique decoy proteins.")
 
-    print("Loading decoy FASTA...")
-    decoy_set = load_fasta_names(args.decoy_fasta)
-    print(f"Loaded {len(decoy_set)} unique decoy proteins.")
+        with timer.stage("index"):
+            original_names, original_index = build_name_index(original_set)
+            decoy_names, decoy_index = build_name_index(decoy_set)
+            del original_set, decoy_set
 
-    print(f"Parsing .{args.alignment_type} files...")
-    original_count, decoy_count, unknown_proteins = parse_alignment_folder(
-        args.alignment_folder, original_set, decoy_set, args.alignment_type
-    )
+        with timer.stage("compute"):
+            print(f"Parsing {', '.join('.' + t for t in file_types)} files...")
+            results = parse_alignment_folder(
+                args.alignment_folder, original_index, decoy_index, file_types, args.threads, cache,
+                *prefetch_options(args)
+            )
 
-    print("Writing output files...")
-    write_counts_file(original_count, f"{prefix}original_counts.txt", "Original")
-    write_counts_file(decoy_count, f"{prefix}decoy_counts.txt", "Decoy")
-    write_summary(original_count, decoy_count, unknown_proteins, f"{prefix}summary.txt")
-
-    unknown_file = f"{prefix}unknown_sequences.txt"
-    with open(unknown_file, "w") as f:
-        for name in sorted(unknown_proteins):
-            f.write(f"{name}\n")
-
-    print(f"Found {len(unknown_proteins)} unknown sequences. Written to {unknown_file}")
+        with timer.stage("write"):
+            for file_type in file_types:
+                write_type_outputs(file_type, original_names, decoy_names, results[file_type])
     print("Done.")
 
 if __name__ == "__main__":
@@ -0,0 +1,118 @@
+"""Append-only checkpoints for the long per-family loops.
+
+A checkpoint is a JSON-lines file. Its first line holds a fingerprint of the
+run's inputs and settings, and every following line one finished item as
+{"key": ..., "result": ...}. Each line is flushed as soon as it is written
+and fsynced every few seconds, so a task killed by a time limit or
+preemption loses at most the line it was writing. With --resume, items
+already in a checkpoint with the same fingerprint are skipped; the file is
+removed once the run finishes cleanly.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+
+def add_checkpoint_args(parser):
+    parser.add_argument("--checkpoint", default=None, help="Optional JSON-lines file recording each finished family as it completes")
+    parser.add_argument("--resume", action="store_true", help="Skip families already recorded in --checkpoint by an earlier, interrupted run")
+
+
+def input_fingerprint(paths, settings):
+    """Hash the resolved input paths with their size and mtime, plus the settings that change results."""
+    entries = []
+    for path in paths:
+        real_path = os.path.realpath(path)
+        stat = os.stat(real_path)
+        entries.append([real_path, stat.st_size, stat.st_mtime_ns])
+    return hashlib.sha1(json.dumps([entries, settings], sort_keys=True).encode()).hexdigest()
+
+
+class Checkpoint:
+    """Record finished items to a JSON-lines file; a no-op when path is None."""
+
+    def __init__(self, path, fingerprint, resume=False, sync_seconds=30):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.sync_seconds = sync_seconds
+        self.done = {}
+        self._valid_size = 0
+        self._handle = None
+        if path and resume:
+            self._load()
+
+    def _load(self):
+        """Read finished items, keeping the byte size of the complete lines so a torn last line is cut off."""
+        if not os.path.isfile(self.path):
+            return
+        with open(self.path, "rb") as f:
+            header = f.readline()
+            try:
+                if not header.endswith(b"\n") or json.loads(header)["fingerprint"] != self.fingerprint:
+                    print(f"Ignoring checkpoint {self.path}: written for other inputs or settings")
+                    return
+            except (ValueError, KeyError):
+                print(f"Ignoring unreadable checkpoint {self.path}")
+                return
+            valid_size = len(header)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                self.done[entry["key"]] = entry["result"]
+                valid_size += len(line)
+        self._valid_size = valid_size
+        print(f"Resuming from {self.path}: {len(self.done)} finished items")
+
+    def __enter__(self):
+        if self.path:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            if self._valid_size:
+                self._handle = open(self.path, "r+b")
+                self._handle.truncate(self._valid_size)
+                self._handle.seek(self._valid_size)
+            else:
+                self._handle = open(self.path, "wb")
+                self._write({"fingerprint": self.fingerprint})
+            self._last_sync = time.monotonic()
+        return self
+
+    def _write(self, entry):
+        self._handle.write(json.dumps(entry, separators=(",", ":")).encode() + b"\n")
+        self._handle.flush()
+
+    def record(self, key, result):
+        """Append one finished item; result must be JSON-serialisable."""
+        if self._handle is None:
+            return
+        self._write({"key": key, "result": result})
+        if time.monotonic() - self._last_sync >= self.sync_seconds:
+            os.fsync(self._handle.fileno())
+            self._last_sync = time.monotonic()
+
+    def resume(self, keys, compute):
+        """Yield one result per key in order, reading finished keys from the checkpoint and
+        recording the rest; compute(pending_keys) must yield their results in the same order."""
+        pending = [key for key in keys if key not in self.done]
+        computed = iter(compute(pending))
+        for key in keys:
+            if key in self.done:
+                yield self.done[key]
+            else:
+                result = next(computed)
+                self.record(key, result)
+                yield result
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+            # Keep the checkpoint for a retry unless every output was written
+            if exc_type is None:
+                os.remove(self.path)
+        return False
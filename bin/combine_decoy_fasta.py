@@ -1,45 +1,88 @@
 #!/usr/bin/env python3
 
 import argparse
-from Bio import SeqIO
+import os
+
+from accession_index import DECOY, ORIGINAL, base_accession, write_accession_index
+from indexed_fasta import fasta_stem, open_fasta, open_fasta_output
+from membership_store import STORE_DIRNAME, family_member_sets, open_store
+from stage_timing import StageTimer, add_timing_args
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Combine two FASTA files, removing duplicates.")
-    parser.add_argument('--families_fasta', type=str, help="Path to the families FASTA file.")
-    parser.add_argument('--decoys_fasta', type=str, help="Path to the decoys FASTA file.")
-    parser.add_argument('--combined_fasta', type=str, help="Path to the output combined FASTA file.")
+    parser.add_argument('--families_fasta', type=str, help="Path to the families FASTA file (plain or gzipped).")
+    parser.add_argument('--decoys_fasta', type=str, help="Path to the decoys FASTA file (plain or gzipped).")
+    parser.add_argument('--combined_fasta', type=str, help="Path to the output combined FASTA file; a .gz name writes BGZF with .fai/.gzi indexes.")
     parser.add_argument('--log_file', type=str, default='decoy_log.txt', help="Path to the log file (default: log.txt).")
+    parser.add_argument('--accession_index', type=str, default=None, help="Optional output folder for the accession index of every original and decoy record.")
+    parser.add_argument('--families_folder', type=str, default=None, help="Optional sampled FASTA folder whose membership store names each original accession's family in the accession index.")
+    add_timing_args(parser)
     return parser.parse_args()
 
-def combine_fastas(families_fasta, decoys_fasta, combined_fasta, log_file):
+def family_origins(families_folder):
+    """Family names ('db/dbkey') in path order, and the row of the first family listing each base accession."""
+    store = open_store(families_folder)
+    if store is None:
+        raise FileNotFoundError(f"No {STORE_DIRNAME} under {families_folder}")
+    relative_paths = sorted(store["families"])
+    member_sets = family_member_sets(store, [os.path.join(families_folder, path) for path in relative_paths])
+    origins = {}
+    for row, member_set in enumerate(member_sets):
+        for accession in member_set:
+            origins.setdefault(accession, row)
+    return [fasta_stem(path) for path in relative_paths], origins
+
+def combine_fastas(families_fasta, decoys_fasta, combined_fasta, log_file, index_dir=None, families_folder=None):
+    from Bio import SeqIO
     # Initialize a set to track unique sequences and a dictionary for sequence names
     unique_sequences = {}
+    seen_sequences = set()
     duplicate_names = set()
     duplicate_sequences = set()
+    # (name, is_decoy, sequence length, kept) of every input record, for the accession index
+    index_records = []
 
     # Function to process a FASTA file and add unique sequences
-    def process_fasta(file_path):
-        for record in SeqIO.parse(file_path, "fasta"):
-            seq = str(record.seq)
-            name = record.id
-
-            # Check for duplicate by name
-            if name in unique_sequences:
-                duplicate_names.add(name)
-            # Check for duplicates by sequence, since some 100% identical sequences might not be identified by diamond/blastp (because results are capped at 25 entries per query sequence)
-            elif seq in unique_sequences.values():
-                duplicate_sequences.add(seq)
-            else:
-                unique_sequences[name] = seq
+    def process_fasta(file_path, is_decoy):
+        with open_fasta(file_path) as handle:
+            for record in SeqIO.parse(handle, "fasta"):
+                seq = str(record.seq)
+                name = record.id
+                kept = False
+
+                # Check for duplicate by name
+                if name in unique_sequences:
+                    duplicate_names.add(name)
+                # Check for duplicates by sequence, since some 100% identical sequences might not be identified by diamond/blastp (because results are capped at 25 entries per query sequence)
+                elif seq in seen_sequences:
+                    duplicate_sequences.add(seq)
+                else:
+                    unique_sequences[name] = seq
+                    seen_sequences.add(seq)
+                    kept = True
+                if index_dir is not None:
+                    index_records.append((name, is_decoy, len(seq), kept))
 
     # Process both FASTA files
-    process_fasta(families_fasta)
-    process_fasta(decoys_fasta)
+    process_fasta(families_fasta, False)
+    process_fasta(decoys_fasta, True)
 
-    # Write the combined unique sequences to the output file
-    with open(combined_fasta, 'w') as out_fasta:
+    # Write the combined unique sequences to the output file, noting where each sequence starts
+    offsets = {}
+    offset = 0
+    with open_fasta_output(combined_fasta) as out_fasta:
         for name, seq in unique_sequences.items():
-            out_fasta.write(f">{name}\n{seq}\n")
+            header = f">{name}\n"
+            out_fasta.write(f"{header}{seq}\n")
+            offsets[name] = offset + len(header.encode())
+            offset += len(header.encode()) + len(seq.encode()) + 1
+
+    if index_dir is not None:
+        families, origins = family_origins(families_folder) if families_folder else ([], {})
+        write_accession_index(index_dir, (
+            (name, DECOY if is_decoy else origins.get(base_accession(name), ORIGINAL), offsets[name] if kept else -1, length)
+            for name, is_decoy, length, kept in index_records
+        ), families)
 
     # Log the duplicates to the log file
     with open(log_file, 'w') as log:
@@ -55,6 +98,13 @@ def combine_fastas(families_fasta, decoys_fasta, combined_fasta, log_file):
 
 if __name__ == "__main__":
     args = parse_args()
-    combine_fastas(args.families_fasta, args.decoys_fasta, args.combined_fasta, args.log_file)
+    with StageTimer.from_args(args) as timer:
+        with timer.stage("combine_and_write"):
+            combine_fastas(
+                args.families_fasta, args.decoys_fasta, args.combined_fasta, args.log_file,
+                args.accession_index, args.families_folder
+            )
     print(f"Combined FASTA written to: {args.combined_fasta}")
     print(f"Log written to: {args.log_file}")
+    if args.accession_index:
+        print(f"Accession index written to: {args.accession_index}")
@@ -4,8 +4,11 @@ import argparse
 import csv
 import os
 from pathlib import Path
-from Bio import SeqIO, AlignIO
-from Bio.SeqRecord import SeqRecord
+from membership_store import STORE_DIRNAME, write_store
+from checkpoint import Checkpoint, add_checkpoint_args, input_fingerprint
+from indexed_fasta import open_fasta_output
+from shards import parse_shard, select_shard
+from stage_timing import StageTimer, add_timing_args
 
 
 def parse_args():
@@ -17,6 +20,10 @@ def parse_args():
     parser.add_argument("--pfam", required=True, help="Path to Pfam alignment folder")
     parser.add_argument("--output_folder", required=True, help="Path to store converted FASTA files")
     parser.add_argument("--updated_metadata_file", required=True, help="Path to output updated metadata file")
+    parser.add_argument("--bgzip", action="store_true", help="Write each family as BGZF-compressed .fasta.gz with samtools .fai/.gzi indexes")
+    parser.add_argument("--shard", type=parse_shard, default=(1, 1), help="Only convert shard i of N (1-based 'i/N') of the metadata rows (default: 1/1)")
+    add_checkpoint_args(parser)
+    add_timing_args(parser)
     return parser.parse_args()
 
 
@@ -51,6 +58,8 @@ def clean_id(seq_id: str) -> str:
 
 
 def convert_to_fasta(input_file: Path, fmt: str, output_file: Path):
+    from Bio import SeqIO
+    from Bio.SeqRecord import SeqRecord
     seen_ids = set()
     seen_seqs = set()
     records = []
@@ -58,9 +67,10 @@ def convert_to_fasta(input_file: Path, fmt: str, output_file: Path):
     if fmt == 'fasta':
         parsed = SeqIO.parse(input_file, "fasta")
     elif fmt == 'stockholm':
+        from Bio import AlignIO
         parsed = AlignIO.read(input_file, "stockholm")
     else:
-        return 0
+        return []
 
     for record in parsed:
         clean_seq = clean_sequence(str(record.seq))
@@ -77,12 +87,24 @@ def convert_to_fasta(input_file: Path, fmt: str, output_file: Path):
         seen_seqs.add(clean_seq)
         records.append(SeqRecord(seq=clean_seq, id=cleaned_id, description=""))
 
+    write_records(records, output_file)
+    return records  # Unique sequences, as written
+
+
+def write_records(records, output_file: Path):
+    from Bio import SeqIO
     if records:
         output_file.parent.mkdir(parents=True, exist_ok=True)
-        with open(output_file, 'w') as out_f:
+        with open_fasta_output(output_file) as out_f:
             SeqIO.write(records, out_f, "fasta")
 
-    return len(records)  # Return number of unique sequences
+
+def restore_records(checkpointed, output_file: Path):
+    """Rewrite a family converted by an interrupted run from its checkpointed (ID, sequence) pairs."""
+    from Bio.SeqRecord import SeqRecord
+    records = [SeqRecord(seq=seq, id=seq_id, description="") for seq_id, seq in checkpointed]
+    write_records(records, output_file)
+    return records
 
 
 def main():
@@ -97,46 +119,70 @@ def main():
 
     output_base = Path(args.output_folder)
     updated_metadata = []
-
-    with open(args.metadata_file, newline='') as tsvfile:
-        reader = csv.DictReader(tsvfile, delimiter=",")
-        for row in reader:
-            db = row["db"].lower()
-            dbkey = row["dbkey"]
-            ipr_id = row["interpro_id"]
-            base_path = get_db_path(db, db_paths)
-
-            if base_path is None:
-                print(f"[SKIPPED] Unknown DB type '{db}' for IPR {ipr_id}")
-                continue
-
-            matching_file = find_matching_file(base_path, dbkey)
-            if not matching_file:
-                print(f"[NOT FOUND] {dbkey} in {base_path}")
-                continue
-
-            fmt = detect_format(matching_file)
-            if fmt == 'unknown':
-                print(f"[SKIPPED] Unknown format for file {matching_file}")
-                continue
-
-            output_file = output_base / db / f"{dbkey}.fasta"
-            try:
-                count = convert_to_fasta(matching_file, fmt, output_file)
-                print(f"[OK] Converted {dbkey} from {fmt.upper()} to {output_file} ({count} unique)")
-                row["protein_count"] = count  # Update the count
-                updated_metadata.append(row)
-            except Exception as e:
-                print(f"[ERROR] Failed to convert {matching_file}: {e}")
-
-    # Write updated metadata
-    updated_path = Path(args.updated_metadata_file)
-    with open(updated_path, 'w', newline='') as out_meta:
-        writer = csv.DictWriter(out_meta, fieldnames=reader.fieldnames)
-        writer.writeheader()
-        for row in updated_metadata:
-            writer.writerow(row)
-    print(f"[DONE] Updated metadata saved to {updated_path}")
+    store_families = {}
+
+    fingerprint = input_fingerprint([args.metadata_file, args.hamap, args.ncbifam, args.panther, args.pfam], {"shard": list(args.shard)})
+
+    # The checkpoint is only removed once the metadata and store are written too
+    with StageTimer.from_args(args) as timer, Checkpoint(args.checkpoint, fingerprint, args.resume) as checkpoint:
+        with timer.stage("convert"):
+            with open(args.metadata_file, newline='') as tsvfile:
+                reader = csv.DictReader(tsvfile, delimiter=",")
+                for row in select_shard(list(reader), *args.shard):
+                    db = row["db"].lower()
+                    dbkey = row["dbkey"]
+                    ipr_id = row["interpro_id"]
+                    base_path = get_db_path(db, db_paths)
+
+                    if base_path is None:
+                        print(f"[SKIPPED] Unknown DB type '{db}' for IPR {ipr_id}")
+                        continue
+
+                    matching_file = find_matching_file(base_path, dbkey)
+                    if not matching_file:
+                        print(f"[NOT FOUND] {dbkey} in {base_path}")
+                        continue
+
+                    fmt = detect_format(matching_file)
+                    if fmt == 'unknown':
+                        print(f"[SKIPPED] Unknown format for file {matching_file}")
+                        continue
+
+                    output_file = output_base / db / (f"{dbkey}.fasta.gz" if args.bgzip else f"{dbkey}.fasta")
+                    key = f"{db}/{dbkey}"
+                    try:
+                        if key in checkpoint.done:
+                            # Converted by an interrupted run; rewrite it without parsing the alignment again
+                            records = restore_records(checkpoint.done[key], output_file)
+                        else:
+                            records = convert_to_fasta(matching_file, fmt, output_file)
+                            checkpoint.record(key, [[record.id, str(record.seq)] for record in records])
+                        count = len(records)
+                        if records:
+                            store_families[output_file.relative_to(output_base).as_posix()] = ([record.id for record in records], sum(len(record.seq) for record in records))
+                        print(f"[OK] Converted {dbkey} from {fmt.upper()} to {output_file} ({count} unique)")
+                        row["protein_count"] = count  # Update the count
+                        updated_metadata.append(row)
+                    except Exception as e:
+                        print(f"[ERROR] Failed to convert {matching_file}: {e}")
+
+        with timer.stage("write_metadata"):
+            # Write updated metadata
+            updated_path = Path(args.updated_metadata_file)
+            with open(updated_path, 'w', newline='') as out_meta:
+                writer = csv.DictWriter(out_meta, fieldnames=reader.fieldnames)
+                writer.writeheader()
+                for row in updated_metadata:
+                    writer.writerow(row)
+            print(f"[DONE] Updated metadata saved to {updated_path}")
+
+        with timer.stage("write_store"):
+            # Family membership store, so POST stages can skip re-parsing the FASTAs
+            write_store(
+                output_base / STORE_DIRNAME,
+                [(relative_path, ids, total_length) for relative_path, (ids, total_length) in store_families.items()]
+            )
+            print(f"[DONE] Family membership store saved to {output_base / STORE_DIRNAME}")
 
 
 if __name__ == "__main__":
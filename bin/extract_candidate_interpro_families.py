@@ -4,6 +4,8 @@ import argparse
 import gzip
 import xml.etree.ElementTree as ET
 
+from stage_timing import StageTimer, add_timing_args
+
 def parse_interpro(interpro_xml_gz, valid_ids_file, output_tsv):
     valid_ids = set()
     with open(valid_ids_file) as f:
@@ -45,6 +47,9 @@ if __name__ == "__main__":
     parser.add_argument("interpro_xml_gz", help="Path to interpro XML .gz file")
     parser.add_argument("valid_ids_file", help="Text file with valid interpro IDs (one per line)")
     parser.add_argument("output_tsv", help="Path to output TSV file")
+    add_timing_args(parser)
 
     args = parser.parse_args()
-    parse_interpro(args.interpro_xml_gz, args.valid_ids_file, args.output_tsv)
+    with StageTimer.from_args(args) as timer:
+        with timer.stage("parse_and_write"):
+            parse_interpro(args.interpro_xml_gz, args.valid_ids_file, args.output_tsv)
@@ -3,34 +3,41 @@
 import os
 import argparse
 
-def count_proteins_in_msa(file_path):
+from prefetch import add_prefetch_args, open_data, prefetch, prefetch_options
+from stage_timing import StageTimer, add_timing_args
+
+def count_proteins_in_msa(handle):
     count = 0
-    with open(file_path) as f:
+    with handle as f:
         for line in f:
             if line.startswith(">"):
                 count += 1
     return count
 
-def generate_metadata(folder_path, output_tsv):
+def generate_metadata(folder_path, output_tsv, depth, budget_bytes):
+    filenames = [filename for filename in sorted(os.listdir(folder_path)) if filename.endswith(".msa")]
+    files = prefetch((os.path.join(folder_path, filename) for filename in filenames), depth, budget_bytes)
     with open(output_tsv, "w") as out:
         out.write("id\tnum_proteins\n")
-        for filename in sorted(os.listdir(folder_path)):
-            if filename.endswith(".msa"):
-                file_id = os.path.splitext(filename)[0]
-                file_path = os.path.join(folder_path, filename)
-                try:
-                    num_proteins = count_proteins_in_msa(file_path)
-                    out.write(f"{file_id}\t{num_proteins}\n")
-                except Exception as e:
-                    print(f"Error processing {filename}: {e}")
+        for filename, (_, read) in zip(filenames, files):
+            file_id = os.path.splitext(filename)[0]
+            try:
+                num_proteins = count_proteins_in_msa(open_data(read()))
+                out.write(f"{file_id}\t{num_proteins}\n")
+            except Exception as e:
+                print(f"Error processing {filename}: {e}")
 
 def main():
     parser = argparse.ArgumentParser(description="Generate metadata TSV from HAMAP .msa files.")
     parser.add_argument("input_folder", help="Path to folder containing .msa files")
     parser.add_argument("output_file", help="Path to output metadata TSV file")
+    add_prefetch_args(parser)
+    add_timing_args(parser)
     args = parser.parse_args()
 
-    generate_metadata(args.input_folder, args.output_file)
+    with StageTimer.from_args(args) as timer:
+        with timer.stage("count_and_write"):
+            generate_metadata(args.input_folder, args.output_file, *prefetch_options(args))
 
 if __name__ == "__main__":
     main()
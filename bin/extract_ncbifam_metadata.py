@@ -2,31 +2,34 @@
 
 import argparse
 import os
-from Bio import AlignIO, SeqIO
 
-def count_sequences(path):
-    with open(path) as f:
+from prefetch import add_prefetch_args, open_data, prefetch, prefetch_options
+from stage_timing import StageTimer, add_timing_args
+
+def count_sequences(path, handle):
+    with handle as f:
         first_line = f.readline()
         f.seek(0)
         if first_line.startswith("# STOCKHOLM"):
+            from Bio import AlignIO
             alignment = AlignIO.read(f, "stockholm")
             return len(alignment)
         elif first_line.startswith(">"):
+            from Bio import SeqIO
             records = list(SeqIO.parse(f, "fasta"))
             return len(records)
         else:
             raise ValueError(f"Unrecognized format in file: {path}")
 
-def write_metadata(folder, output):
+def write_metadata(folder, output, depth, budget_bytes):
+    fnames = [fname for fname in sorted(os.listdir(folder)) if fname.endswith(".SEED")]
+    files = prefetch((os.path.join(folder, fname) for fname in fnames), depth, budget_bytes)
     with open(output, 'w') as out:
         out.write("id\tnum_proteins\n")
-        for fname in sorted(os.listdir(folder)):
-            if not fname.endswith(".SEED"):
-                continue
-            file_path = os.path.join(folder, fname)
+        for fname, (file_path, read) in zip(fnames, files):
             try:
                 fam_id = fname.split('.')[0]
-                num = count_sequences(file_path)
+                num = count_sequences(file_path, open_data(read()))
                 out.write(f"{fam_id}\t{num}\n")
             except Exception as e:
                 print(f"Skipping {fname}: {e}")
@@ -35,6 +38,10 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Extract metadata from SEED alignment files")
     parser.add_argument("folder", help="Folder containing SEED files")
     parser.add_argument("output", help="Path to output TSV file")
+    add_prefetch_args(parser)
+    add_timing_args(parser)
     args = parser.parse_args()
 
-    write_metadata(args.folder, args.output)
+    with StageTimer.from_args(args) as timer:
+        with timer.stage("count_and_write"):
+            write_metadata(args.folder, args.output, *prefetch_options(args))
@@ -2,33 +2,40 @@
 
 import os
 import argparse
-from Bio import AlignIO
 
-def count_sequences_in_stockholm(file_path):
-    alignment = AlignIO.read(file_path, "stockholm")
+from prefetch import add_prefetch_args, open_data, prefetch, prefetch_options
+from stage_timing import StageTimer, add_timing_args
+
+def count_sequences_in_stockholm(handle):
+    from Bio import AlignIO
+    alignment = AlignIO.read(handle, "stockholm")
     return len(alignment)
 
-def generate_metadata(folder_path, output_tsv):
+def generate_metadata(folder_path, output_tsv, depth, budget_bytes):
+    filenames = [filename for filename in sorted(os.listdir(folder_path)) if filename.endswith(".sto")]
+    files = prefetch((os.path.join(folder_path, filename) for filename in filenames), depth, budget_bytes)
     with open(output_tsv, "w") as out:
         out.write("id\tnum_proteins\n")
-        for filename in sorted(os.listdir(folder_path)):
-            if filename.endswith(".sto"):
-                pfam_id = os.path.splitext(filename)[0]
-                file_path = os.path.join(folder_path, filename)
-                try:
-                    num_proteins = count_sequences_in_stockholm(file_path)
-                    out.write(f"{pfam_id}\t{num_proteins}\n")
-                except Exception as e:
-                    print(f"Error parsing {filename}: {e}")
+        for filename, (_, read) in zip(filenames, files):
+            pfam_id = os.path.splitext(filename)[0]
+            try:
+                num_proteins = count_sequences_in_stockholm(open_data(read()))
+                out.write(f"{pfam_id}\t{num_proteins}\n")
+            except Exception as e:
+                print(f"Error parsing {filename}: {e}")
 
 def main():
     parser = argparse.ArgumentParser(description="Generate metadata TSV from Stockholm files.")
     parser.add_argument("input_folder", help="Path to folder containing .sto files")
     parser.add_argument("output_file", help="Path to output metadata TSV file")
+    add_prefetch_args(parser)
+    add_timing_args(parser)
 
     args = parser.parse_args()
 
-    generate_metadata(args.input_folder, args.output_file)
+    with StageTimer.from_args(args) as timer:
+        with timer.stage("count_and_write"):
+            generate_metadata(args.input_folder, args.output_file, *prefetch_options(args))
 
 if __name__ == "__main__":
     main()
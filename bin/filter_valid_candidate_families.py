@@ -1,37 +1,37 @@
 #!/usr/bin/env python3
 
 import argparse
-import pandas as pd
-
-def load_metadata(path):
-    df = pd.read_csv(path, sep="\t", dtype=str)
-    df.set_index("id", inplace=True)
-    return df["num_proteins"].to_dict()
-
-def main(interpro_path, hamap_path, ncbifam_path, panther_path, pfam_path, output_path):
-    # Load metadata into lookup dicts
-    metadata = {
-        "HAMAP": load_metadata(hamap_path),
-        "NCBIFAM": load_metadata(ncbifam_path),
-        "PANTHER": load_metadata(panther_path),
-        "PFAM": load_metadata(pfam_path),
-    }
-
-    # Load InterPro TSV
-    interpro = pd.read_csv(interpro_path, sep="\t", dtype=str)
-
-    # Filter and update
-    valid_rows = []
-    for _, row in interpro.iterrows():
-        db = row["db"]
-        dbkey = row["dbkey"]
-        if db in metadata and dbkey in metadata[db]:
-            row["protein_count"] = metadata[db][dbkey]
-            valid_rows.append(row)
-
-    # Create and write filtered dataframe
-    filtered_df = pd.DataFrame(valid_rows)
-    filtered_df.to_csv(output_path, sep="\t", index=False)
+
+from stage_timing import StageTimer, add_timing_args
+from tables import add_table_args, read_table, write_table
+
+def load_metadata(path, db, engine="c"):
+    """Member database families as db, dbkey and num_proteins columns; later rows win for repeated IDs."""
+    df = read_table(path, "member_metadata", engine=engine).drop_duplicates("id", keep="last")
+    return df.rename(columns={"id": "dbkey"}).assign(db=db)
+
+def main(interpro_path, hamap_path, ncbifam_path, panther_path, pfam_path, output_path, timer, engine="c", parquet=False):
+    with timer.stage("load"):
+        # Load metadata into one lookup table
+        import pandas as pd
+        metadata = pd.concat([
+            load_metadata(hamap_path, "HAMAP", engine),
+            load_metadata(ncbifam_path, "NCBIFAM", engine),
+            load_metadata(panther_path, "PANTHER", engine),
+            load_metadata(pfam_path, "PFAM", engine),
+        ])
+
+        # Load InterPro TSV as written, since every column but protein_count is passed through
+        interpro = read_table(interpro_path, "candidate_families", engine=engine, text=True)
+
+    with timer.stage("compute"):
+        # Keep the entries found in their member database, in InterPro order, with its protein_count
+        filtered_df = interpro.merge(metadata, on=["db", "dbkey"], how="inner")
+        filtered_df["protein_count"] = filtered_df["num_proteins"]
+        filtered_df = filtered_df[list(interpro.columns)]
+
+    with timer.stage("write"):
+        write_table(filtered_df, output_path, "candidate_families", parquet)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Filter InterPro entries based on metadata and update protein_count")
@@ -41,6 +41,9 @@ if __name__ == "__main__":
     parser.add_argument("panther", help="PANTHER metadata TSV")
     parser.add_argument("pfam", help="PFAM metadata TSV")
     parser.add_argument("output", help="Output filtered InterPro TSV")
+    add_table_args(parser)
+    add_timing_args(parser)
     args = parser.parse_args()
 
-    main(args.interpro, args.hamap, args.ncbifam, args.panther, args.pfam, args.output)
+    with StageTimer.from_args(args) as timer:
+        main(args.interpro, args.hamap, args.ncbifam, args.panther, args.pfam, args.output, timer, args.csv_engine, args.parquet)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+import os
+import shutil
+import argparse
+from membership_store import STORE_DIRNAME, merge_stores
+from shards import order_shards
+from stage_timing import StageTimer, add_timing_args
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Merge the per-chunk outputs of CONVERT_SAMPLED_TO_FASTA or INVESTIGATE_MATCHED_ORIGINALS in shard order.")
+    parser.add_argument("--csv_files", nargs="+", default=None, help="Chunk CSV files, named *shard_<i>_of_<N>*; concatenated keeping a single header")
+    parser.add_argument("--output_csv", default=None, help="Merged CSV output file")
+    parser.add_argument("--log_files", nargs="+", action="append", default=[], help="Chunk text logs, named *shard_<i>_of_<N>*; concatenated as they are. Repeat once per --output_log")
+    parser.add_argument("--output_log", action="append", default=[], help="Merged text log, one per --log_files group")
+    parser.add_argument("--fasta_folders", nargs="+", default=None, help="Chunk sampled FASTA folders, named *shard_<i>_of_<N>*, each with its membership store")
+    parser.add_argument("--output_folder", default=None, help="Merged sampled FASTA folder, with one membership store")
+    add_timing_args(parser)
+    args = parser.parse_args()
+    if len(args.log_files) != len(args.output_log):
+        parser.error("Give one --output_log per --log_files group")
+    if (args.csv_files is None) != (args.output_csv is None) or (args.fasta_folders is None) != (args.output_folder is None):
+        parser.error("--csv_files/--output_csv and --fasta_folders/--output_folder must be given together")
+    return args
+
+def merge_csv_files(paths, output_file):
+    """Concatenate chunk CSVs in shard order, keeping a single header."""
+    rows = 0
+    # Binary mode keeps the CSV writer's \r\n line endings as they are
+    with open(output_file, "wb") as out_f:
+        for i, path in enumerate(order_shards(paths)):
+            with open(path, "rb") as in_f:
+                header = in_f.readline()
+                if i == 0:
+                    out_f.write(header)
+                for line in in_f:
+                    out_f.write(line)
+                    rows += 1
+    return rows
+
+def merge_text_files(paths, output_file):
+    with open(output_file, "wb") as out_f:
+        for path in order_shards(paths):
+            with open(path, "rb") as in_f:
+                shutil.copyfileobj(in_f, out_f)
+
+def link_or_copy(src, dst):
+    # Hard links avoid copying the FASTAs when the chunks sit on the same filesystem
+    try:
+        os.link(os.path.realpath(src), dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+def merge_fasta_folders(folders, output_folder):
+    """Gather every chunk's family FASTAs into one folder and merge their membership stores."""
+    folders = order_shards(folders)
+    families = 0
+    for folder in folders:
+        for root, dirs, files in os.walk(folder):
+            dirs[:] = [d for d in dirs if d != STORE_DIRNAME]
+            target_dir = os.path.join(output_folder, os.path.relpath(root, folder))
+            for filename in sorted(files):
+                target = os.path.join(target_dir, filename)
+                # A family sampled twice is converted identically by both chunks; keep the first
+                if os.path.exists(target):
+                    continue
+                os.makedirs(target_dir, exist_ok=True)
+                link_or_copy(os.path.join(root, filename), target)
+                families += 1
+    merge_stores(folders, os.path.join(output_folder, STORE_DIRNAME))
+    return families
+
+def main():
+    args = parse_args()
+
+    with StageTimer.from_args(args) as timer:
+        if args.csv_files:
+            with timer.stage("merge_csv"):
+                rows = merge_csv_files(args.csv_files, args.output_csv)
+            print(f"Merged {len(args.csv_files)} chunks ({rows} rows) into {args.output_csv}")
+
+        with timer.stage("merge_logs"):
+            for log_files, output_log in zip(args.log_files, args.output_log):
+                merge_text_files(log_files, output_log)
+                print(f"Merged {len(log_files)} chunks into {output_log}")
+
+        if args.fasta_folders:
+            with timer.stage("merge_fasta"):
+                families = merge_fasta_folders(args.fasta_folders, args.output_folder)
+            print(f"Merged {len(args.fasta_folders)} chunks ({families} family files) into {args.output_folder}")
+
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,102 @@
 #!/usr/bin/env python3
 
-import pandas as pd
 import argparse
+from contextlib import ExitStack
+from similarity_edges import read_similarity_results, first_at_or_above
+from stage_timing import StageTimer, add_timing_args
+from tables import iter_table, read_table
+
+SPLIT_FILES = ("matched_metadata.tsv", "unmatched_metadata.tsv")
+# Only these columns are read when the splits are not written; protein_count as float,
+# so a missing count reads as NaN as it does when pandas infers the column type
+REPORT_COLUMNS = ["dbkey", "protein_count"]
+REPORT_DTYPES = {"protein_count": "float64"}
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Analyze matched and unmatched family size distributions based on similarity results.")
     parser.add_argument("--metadata_file", required=True, help="Path to metadata TSV file (with protein_count, dbkey, etc.).")
-    parser.add_argument("--similarity_file", required=True, help="Path to similarity results TSV file.")
+    parser.add_argument("--similarity_file", required=True, help="Path to similarity results TSV file or .npz edge list.")
+    parser.add_argument("--similarity_threshold", type=float, default=None, help="Minimum similarity score for a match (default: keep every result in the file).")
     parser.add_argument("--output_file", required=True, help="Path to output report file (text format).")
+    parser.add_argument("--mode", choices=["memory", "streaming"], default="memory", help="'memory' loads the whole metadata file; 'streaming' reads it in chunks, keeping only the protein counts (default: memory).")
+    parser.add_argument("--chunk_size", type=int, default=100000, help="Metadata rows per chunk in streaming mode (default: 100000).")
+    parser.add_argument("--skip_splits", action="store_true", help=f"Do not write the {' and '.join(SPLIT_FILES)} side outputs.")
+    add_timing_args(parser)
     return parser.parse_args()
 
-def main():
-    args = parse_args()
+def load_matched_ids(similarity_file, similarity_threshold):
+    """Unique original family IDs matched at or above the threshold."""
+    edges = read_similarity_results(similarity_file)
+    start = first_at_or_above(edges, similarity_threshold)
+    return set(edges["original"][start:].tolist())
+
+def describe_counts(protein_counts):
+    import pandas as pd
+    return str(pd.Series(protein_counts, name="protein_count").describe())
 
-    # Load input files
-    metadata_df = pd.read_csv(args.metadata_file)
-    similarity_df = pd.read_csv(args.similarity_file, sep="\t")
+def split_in_memory(metadata_file, matched_ids, write_splits):
+    """Load the whole metadata file, returning its protein counts and matched mask in file order."""
+    import pandas as pd
+    if write_splits:
+        metadata_df = pd.read_csv(metadata_file)
+    else:
+        metadata_df = read_table(metadata_file, "sampled_metadata", REPORT_COLUMNS, dtypes=REPORT_DTYPES)
+    matched = metadata_df["dbkey"].isin(matched_ids).to_numpy()
+    if write_splits:
+        metadata_df[matched].to_csv(SPLIT_FILES[0], sep="\t", index=False)
+        metadata_df[~matched].to_csv(SPLIT_FILES[1], sep="\t", index=False)
+    return metadata_df["protein_count"].to_numpy(), matched
 
-    # Get unique matched IDs
-    matched_ids = set(similarity_df["original_basename"].unique())
+def split_streaming(metadata_file, matched_ids, chunk_size, write_splits):
+    """Read the metadata file in chunks, routing each row to its split file as it goes.
+
+    Only the protein counts and the matched mask are kept, which is all the report needs.
+    protein_count is written back as read, since a chunk with a missing count would
+    otherwise print its counts as floats and the others as integers.
+    """
+    import numpy as np
+    import pandas as pd
+    protein_counts = []
+    masks = []
+    with ExitStack() as stack:
+        writers = [stack.enter_context(open(path, "w", newline="")) for path in SPLIT_FILES] if write_splits else None
+        if writers:
+            chunks = pd.read_csv(metadata_file, chunksize=chunk_size, dtype={"protein_count": str})
+        else:
+            chunks = iter_table(metadata_file, "sampled_metadata", REPORT_COLUMNS, chunk_size, dtypes=REPORT_DTYPES)
+        for i, chunk in enumerate(chunks):
+            matched = chunk["dbkey"].isin(matched_ids).to_numpy()
+            protein_counts.append(pd.to_numeric(chunk["protein_count"]).to_numpy())
+            masks.append(matched)
+            if writers:
+                chunk[matched].to_csv(writers[0], sep="\t", index=False, header=i == 0)
+                chunk[~matched].to_csv(writers[1], sep="\t", index=False, header=i == 0)
+    return np.concatenate(protein_counts), np.concatenate(masks)
+
+def main():
+    args = parse_args()
 
-    # Split metadata into matched and unmatched
-    matched_df = metadata_df[metadata_df["dbkey"].isin(matched_ids)].copy()
-    unmatched_df = metadata_df[~metadata_df["dbkey"].isin(matched_ids)].copy()
+    with StageTimer.from_args(args) as timer:
+        with timer.stage("load"):
+            matched_ids = load_matched_ids(args.similarity_file, args.similarity_threshold)
 
-    # Open output file
-    with open(args.output_file, "w") as out_f:
-        # Original distribution
-        out_f.write("Original size distribution (protein_count column):\n")
-        out_f.write(str(metadata_df["protein_count"].describe()) + "\n\n")
+        # Metadata rows are split as they are read, so both share one stage
+        with timer.stage("compute"):
+            if args.mode == "streaming":
+                protein_counts, matched = split_streaming(args.metadata_file, matched_ids, args.chunk_size, not args.skip_splits)
+            else:
+                protein_counts, matched = split_in_memory(args.metadata_file, matched_ids, not args.skip_splits)
 
-        # Matched distribution
-        out_f.write("Matched size distribution (protein_count column):\n")
-        out_f.write(str(matched_df["protein_count"].describe()) + "\n\n")
+        with timer.stage("write"):
+            with open(args.output_file, "w") as out_f:
+                out_f.write("Original size distribution (protein_count column):\n")
+                out_f.write(describe_counts(protein_counts) + "\n\n")
 
-        # Unmatched distribution
-        out_f.write("Unmatched size distribution (protein_count column):\n")
-        out_f.write(str(unmatched_df["protein_count"].describe()) + "\n\n")
+                out_f.write("Matched size distribution (protein_count column):\n")
+                out_f.write(describe_counts(protein_counts[matched]) + "\n\n")
 
-    # Optionally save splits too if you want
-    matched_df.to_csv("matched_metadata.tsv", sep="\t", index=False)
-    unmatched_df.to_csv("unmatched_metadata.tsv", sep="\t", index=False)
+                out_f.write("Unmatched size distribution (protein_count column):\n")
+                out_f.write(describe_counts(protein_counts[~matched]) + "\n\n")
 
 if __name__ == "__main__":
     main()
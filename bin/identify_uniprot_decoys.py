@@ -1,20 +1,24 @@
 #!/usr/bin/env python3
 
 import argparse
-import pyfastx
 import random
 
+from indexed_fasta import open_fasta_output
+from stage_timing import StageTimer, add_timing_args
+
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Sample non-hit decoy sequences from a FASTA file.")
     parser.add_argument("--hits_file", required=True, help="Path to diamond/blastp hits file (first column will be used)")
     parser.add_argument("--fasta_file", required=True, help="Path to full UniProt SwissProt FASTA file")
-    parser.add_argument("--output_file", required=True, help="Path to output sampled decoy FASTA file")
+    parser.add_argument("--output_file", required=True, help="Path to output sampled decoy FASTA file; a .gz name writes BGZF with .fai/.gzi indexes")
     parser.add_argument("--num_decoys", type=int, default=10000, help="Number of decoys to sample (default: 10000)")
+    add_timing_args(parser)
     return parser.parse_args()
 
 
 def get_non_hit_sequences(hits_file, fasta_file):
+    import pyfastx
     # Read first column (hit IDs)
     hit_ids = set()
     with open(hits_file) as f:
@@ -41,7 +45,7 @@ def get_non_hit_sequences(hits_file, fasta_file):
 
 def sample_decoys(decoy_pool, sample_size, output_file):
     sampled = random.sample(decoy_pool, min(sample_size, len(decoy_pool)))
-    with open(output_file, 'w') as out_f:
+    with open_fasta_output(output_file) as out_f:
         for name, seq in sampled:
             out_f.write(f">{name}\n{seq}\n")
 
@@ -49,11 +53,14 @@ def sample_decoys(decoy_pool, sample_size, output_file):
 def main():
     args = parse_args()
 
-    decoys = get_non_hit_sequences(args.hits_file, args.fasta_file)
-    print(f"[INFO] Found {len(decoys)} non-hit sequences.")
-    
-    sample_decoys(decoys, args.num_decoys, args.output_file)
-    print(f"[DONE] Wrote {min(args.num_decoys, len(decoys))} decoys to {args.output_file}")
+    with StageTimer.from_args(args) as timer:
+        with timer.stage("load"):
+            decoys = get_non_hit_sequences(args.hits_file, args.fasta_file)
+            print(f"[INFO] Found {len(decoys)} non-hit sequences.")
+
+        with timer.stage("sample_and_write"):
+            sample_decoys(decoys, args.num_decoys, args.output_file)
+            print(f"[DONE] Wrote {min(args.num_decoys, len(decoys))} decoys to {args.output_file}")
 
 
 if __name__ == "__main__":
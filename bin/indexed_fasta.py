@@ -0,0 +1,195 @@
+"""BGZF-compressed FASTA output with samtools-compatible .fai and .gzi indexes.
+
+BGZF splits the data into gzip members of at most 64 KiB, so every gzip reader
+still sees an ordinary .fasta.gz file. The .gzi index lists where each member
+starts, and the .fai index where each sequence starts in the uncompressed
+text, so samtools faidx and other indexed readers can seek straight to one
+sequence instead of decompressing the whole file.
+"""
+
+import bisect
+import gzip
+import struct
+import zlib
+
+# Uncompressed bytes per block; htslib's limit, which keeps every compressed block under 64 KiB
+BGZF_BLOCK_SIZE = 0xff00
+BGZF_EOF = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+
+def open_fasta(path):
+    """Open a plain or gzipped (including BGZF) FASTA file for reading as text."""
+    path = str(path)
+    return gzip.open(path, "rt") if path.endswith(".gz") else open(path)
+
+
+def fasta_stem(filename):
+    """File name without its .fasta or .fasta.gz suffix."""
+    for suffix in (".fasta.gz", ".fasta"):
+        if filename.endswith(suffix):
+            return filename[:-len(suffix)]
+    return filename
+
+
+def is_fasta(filename):
+    return filename.endswith((".fasta", ".fasta.gz"))
+
+
+def read_gzi(path):
+    """(compressed, uncompressed) start offsets of every BGZF block, from <path>.gzi plus the implicit first block."""
+    with open(f"{path}.gzi", "rb") as f:
+        count = struct.unpack("<Q", f.read(8))[0]
+        return [(0, 0)] + list(struct.iter_unpack("<2Q", f.read(16 * count)))
+
+
+def read_range(path, offset, length, blocks=None):
+    """Read length bytes from uncompressed offset of a plain file, or of a BGZF file by seeking through its .gzi.
+
+    blocks is the read_gzi() list, which callers doing many lookups can load once.
+    """
+    path = str(path)
+    if not path.endswith(".gz"):
+        with open(path, "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+    blocks = blocks if blocks is not None else read_gzi(path)
+    compressed_start, uncompressed_start = blocks[bisect.bisect_right([u for _, u in blocks], offset) - 1]
+    skip = offset - uncompressed_start
+    data = bytearray()
+    with open(path, "rb") as f:
+        f.seek(compressed_start)
+        while len(data) < skip + length:
+            header = f.read(18)
+            if len(header) < 18:
+                break
+            # BSIZE of the BC extra field, as written by BgzfFastaWriter and bgzip
+            block = f.read(struct.unpack("<H", header[16:18])[0] + 1 - 18)
+            data += zlib.decompress(block[:-8], -15)
+    return bytes(data[skip:skip + length])
+
+
+def open_fasta_output(path):
+    """Open a FASTA output for writing as text: BGZF with .fai/.gzi indexes if path ends in .gz, plain otherwise."""
+    path = str(path)
+    return BgzfFastaWriter(path) if path.endswith(".gz") else open(path, "w")
+
+
+class BgzfFastaWriter:
+    """Text handle writing BGZF blocks, indexing the FASTA records as they pass through.
+
+    On close, writes <path>.gzi (offsets of every block after the first) and <path>.fai
+    (name, length, offset of the first base, bases per line, bytes per line). As with
+    samtools faidx, every sequence line but the last must have the same length.
+    """
+
+    def __init__(self, path, level=6):
+        self.path = path
+        self.level = level
+        self._handle = open(path, "wb")
+        self._block = bytearray()
+        self._block_starts = []
+        self._compressed_offset = 0
+        self._uncompressed_offset = 0
+        self._line = bytearray()
+        self._line_offset = 0
+        self._record = None
+        self._fai_entries = []
+
+    def write(self, text):
+        data = text.encode()
+        self._index(data)
+        self._block += data
+        while len(self._block) >= BGZF_BLOCK_SIZE:
+            self._write_block(bytes(self._block[:BGZF_BLOCK_SIZE]))
+            del self._block[:BGZF_BLOCK_SIZE]
+        return len(text)
+
+    def _write_block(self, data):
+        # The .gzi skips the first block, which always starts at offset 0 of both streams
+        if self._compressed_offset:
+            self._block_starts.append((self._compressed_offset, self._uncompressed_offset))
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15)
+        payload = compressor.compress(data) + compressor.flush()
+        # gzip header with the BC extra field holding the block size minus one
+        header = struct.pack("<4BI2BH2BHH", 31, 139, 8, 4, 0, 0, 255, 6, 66, 67, 2, len(payload) + 25)
+        self._handle.write(header + payload + struct.pack("<2I", zlib.crc32(data), len(data)))
+        self._compressed_offset += len(header) + len(payload) + 8
+        self._uncompressed_offset += len(data)
+
+    def _index(self, data):
+        start = 0
+        while True:
+            end = data.find(b"\n", start)
+            if end < 0:
+                self._line += data[start:]
+                return
+            self._line += data[start:end + 1]
+            self._index_line(bytes(self._line))
+            self._line.clear()
+            start = end + 1
+
+    def _index_line(self, line):
+        line_start = self._line_offset
+        self._line_offset += len(line)
+        if line.startswith(b">"):
+            self._finish_record()
+            name = (line[1:].split(None, 1) or [b""])[0].decode()
+            self._record = {"name": name, "length": 0, "offset": self._line_offset, "line_bases": 0, "line_width": 0, "short_line": False}
+            return
+
+        record = self._record
+        bases = len(line.rstrip(b"\r\n"))
+        if record is None:
+            if bases:
+                raise ValueError(f"{self.path}: sequence found before the first FASTA header at byte {line_start}")
+            return
+        if not bases:
+            record["short_line"] = True
+            return
+        if record["short_line"] or (record["line_bases"] and (
+            bases > record["line_bases"] or len(line) - bases != record["line_width"] - record["line_bases"]
+        )):
+            raise ValueError(f"{self.path}: sequence '{record['name']}' has lines of different lengths, so it cannot be indexed")
+        if not record["line_bases"]:
+            record["line_bases"] = bases
+            record["line_width"] = len(line)
+        elif bases < record["line_bases"]:
+            record["short_line"] = True
+        record["length"] += bases
+
+    def _finish_record(self):
+        record = self._record
+        if record is not None:
+            self._fai_entries.append(
+                f"{record['name']}\t{record['length']}\t{record['offset']}\t{record['line_bases']}\t{record['line_width']}\n"
+            )
+        self._record = None
+
+    def close(self):
+        if self._handle is None:
+            return
+        if self._line:
+            self._index_line(bytes(self._line))
+            self._line.clear()
+        self._finish_record()
+        if self._block:
+            self._write_block(bytes(self._block))
+            self._block.clear()
+        self._handle.write(BGZF_EOF)
+        self._handle.close()
+        self._handle = None
+
+        with open(f"{self.path}.gzi", "wb") as f:
+            f.write(struct.pack("<Q", len(self._block_starts)))
+            for compressed_offset, uncompressed_offset in self._block_starts:
+                f.write(struct.pack("<2Q", compressed_offset, uncompressed_offset))
+        with open(f"{self.path}.fai", "w") as f:
+            f.writelines(self._fai_entries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -2,35 +2,45 @@
 
 import argparse
 import os
-import gzip
 import csv
-from collections import defaultdict, Counter
-from Bio import SeqIO
+import multiprocessing
+from collections import defaultdict
+from checkpoint import Checkpoint, add_checkpoint_args, input_fingerprint
+from indexed_fasta import fasta_stem, is_fasta
+from parse_cache import ParseCache, add_cache_args, base_ids
+from prefetch import PREFETCH_DEPTH, PREFETCH_MB, add_prefetch_args, prefetch_options
+from shards import parse_shard, select_shard
+from stage_timing import StageTimer, add_timing_args
+
+# Shared indexes, populated once in the parent and inherited by forked workers
+_SHARED = {}
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Extract metadata from clustering and sequence data")
-    parser.add_argument("--db_folder", required=True, help="Path to database folder with 4 subfolders of .fasta files")
+    parser.add_argument("--db_folder", required=True, help="Path to database folder with 4 subfolders of .fasta or .fasta.gz files")
     parser.add_argument("--cluster_file", required=True, help="Path to clustering 2-column TSV file")
     parser.add_argument("--metadata", required=True, help="CSV mapping file with interpro metadata")
     parser.add_argument("--generated_fasta", required=True, help="Path to folder with .fasta.gz files")
     parser.add_argument("--output", default="metadata_summary.csv", help="Output metadata CSV")
     parser.add_argument("--cluster_log", default="all_clusters.txt", help="Output clusters description TXT")
     parser.add_argument("--match_log", default="all_matches.txt", help="Output matched families description TXT")
+    parser.add_argument("--threads", type=int, default=1, help="Number of worker processes for loading and per-family analysis (default: 1)")
+    parser.add_argument("--shard", type=parse_shard, default=(1, 1), help="Only analyse shard i of N (1-based 'i/N') of the sorted family FASTAs (default: 1/1)")
+    add_checkpoint_args(parser)
+    add_cache_args(parser)
+    add_prefetch_args(parser)
+    add_timing_args(parser)
     return parser.parse_args()
 
 def load_cluster_file(cluster_file):
     member_to_cluster = {}
-    cluster_sizes = defaultdict(list)
 
     with open(cluster_file) as f:
         for line in f:
             rep, member = line.strip().split()
             member_to_cluster[member] = rep
 
-    for member, rep in member_to_cluster.items():
-        cluster_sizes[rep].append(member)
-
-    return member_to_cluster, cluster_sizes
+    return member_to_cluster
 
 def load_interpro_csv(path):
     interpro_map = {}
@@ -40,35 +50,37 @@ def load_interpro_csv(path):
             interpro_map[row['dbkey']] = row
     return interpro_map
 
-def load_use_case_data(folder):
-    use_case_sets = {}
-    use_case_lengths = {}
-    for filename in os.listdir(folder):
-        if not filename.endswith(".fasta.gz"):
-            continue
-        path = os.path.join(folder, filename)
-        seq_ids = set()
-        lengths = []
-        with gzip.open(path, "rt") as handle:
-            for record in SeqIO.parse(handle, "fasta"):
-                seq_id = record.id.split("/")[0]
-                seq_ids.add(seq_id)
-                lengths.append(len(record.seq))
-        avg_len = sum(lengths) / len(lengths) if lengths else 0
-        use_case_sets[filename] = (seq_ids, avg_len)
-    return use_case_sets
-
-def analyze_fasta_file(fasta_path, member_to_cluster, cluster_sizes, use_case_sets, cluster_log, match_log):
-    family_name = os.path.basename(fasta_path).replace(".fasta", "")
-    with open(fasta_path) as handle:
-        records = list(SeqIO.parse(handle, "fasta"))
-    
-    avg_length = sum(len(rec.seq) for rec in records) / len(records) if records else 0
-
-    seq_ids = [rec.id for rec in records]
-    seq_set = set(seq_ids)
-
-    split_seq_ids = [rec.id.split("/")[0] for rec in records]
+def use_case_entry(seq_ids, total_len):
+    """Base IDs and average sequence length of one generated FASTA from its parse summary."""
+    return set(base_ids(seq_ids)), total_len / len(seq_ids) if seq_ids else 0
+
+def load_use_case_file(path, cache=None):
+    return use_case_entry(*(cache or ParseCache()).summary(path))
+
+def load_use_case_data(folder, threads=1, cache=None, depth=PREFETCH_DEPTH, budget_bytes=PREFETCH_MB * 1024 * 1024):
+    filenames = sorted(f for f in os.listdir(folder) if f.endswith(".fasta.gz"))
+    paths = [os.path.join(folder, f) for f in filenames]
+
+    if threads <= 1 or len(paths) <= 1:
+        loaded = [use_case_entry(*summary) for summary in (cache or ParseCache()).summaries(paths, depth, budget_bytes)]
+    else:
+        ctx = multiprocessing.get_context("fork")
+        chunksize = max(1, len(paths) // (threads * 4))
+        with ctx.Pool(processes=threads) as pool:
+            loaded = pool.starmap(load_use_case_file, [(path, cache) for path in paths], chunksize=chunksize)
+
+    return dict(zip(filenames, loaded))
+
+def analyze_fasta_file(fasta_path, member_to_cluster, use_case_sets, cache=None):
+    family_name = fasta_stem(os.path.basename(fasta_path))
+    seq_ids, total_len = (cache or ParseCache()).summary(fasta_path)
+    return analyze_family_records(family_name, seq_ids, total_len, member_to_cluster, use_case_sets)
+
+def analyze_family_records(family_name, seq_ids, total_len, member_to_cluster, use_case_sets):
+    """Cluster and use-case match analysis of one family from its record IDs and summed sequence length."""
+    avg_length = total_len / len(seq_ids) if seq_ids else 0
+
+    split_seq_ids = [seq_id.split("/")[0] for seq_id in seq_ids]
     split_seq_set = set(split_seq_ids)
 
     # Cluster analysis
@@ -78,24 +90,20 @@ def analyze_fasta_file(fasta_path, member_to_cluster, cluster_sizes, use_case_se
             cluster = member_to_cluster[seq_id]
             fam_clusters[cluster].append(seq_id)
 
-    cluster_distribution = Counter(len(v) for v in fam_clusters.values())
     cluster_count = len(fam_clusters)
 
-    with open(cluster_log, "a") as f:
-        f.write(f"{family_name}:\n")
-        
-        # Group clusters by their size
-        size_to_members = defaultdict(list)
-        for members in fam_clusters.values():
-            size = len(members)
-            size_to_members[size].extend(members)
-        
-        for size in sorted(size_to_members):
-            members = size_to_members[size]
-            count = len(members) // size  # number of clusters of this size
-            f.write(f"{count} clusters with {size} members [{', '.join(members)}]\n")
-        
-        f.write("\n")
+    cluster_lines = [f"{family_name}:\n"]
+    # Group clusters by their size
+    size_to_members = defaultdict(list)
+    for members in fam_clusters.values():
+        size = len(members)
+        size_to_members[size].extend(members)
+
+    for size in sorted(size_to_members):
+        members = size_to_members[size]
+        count = len(members) // size  # number of clusters of this size
+        cluster_lines.append(f"{count} clusters with {size} members [{', '.join(members)}]\n")
+    cluster_lines.append("\n")
 
     # Use-case match analysis
     common_count_by_file = {}
@@ -111,11 +119,10 @@ def analyze_fasta_file(fasta_path, member_to_cluster, cluster_sizes, use_case_se
     unmatched_seqs = split_seq_set - matched_seqs
     unmatched = len(unmatched_seqs)
 
-    with open(match_log, "a") as f:
-        f.write(f"{family_name}:\n")
-        for uc_file, (count, avg_len) in sorted(common_count_by_file.items()):
-            f.write(f"  {count} common sequences with {uc_file} (average length: {int(avg_len)})\n")
-        f.write(f"  {unmatched} unmatched sequences [{', '.join(unmatched_seqs)}]\n\n")
+    match_lines = [f"{family_name}:\n"]
+    for uc_file, (count, avg_len) in sorted(common_count_by_file.items()):
+        match_lines.append(f"  {count} common sequences with {uc_file} (average length: {int(avg_len)})\n")
+    match_lines.append(f"  {unmatched} unmatched sequences [{', '.join(sorted(unmatched_seqs))}]\n\n")
 
     # Match tag
     tag = "vanished"
@@ -130,42 +137,60 @@ def analyze_fasta_file(fasta_path, member_to_cluster, cluster_sizes, use_case_se
         else:
             tag = "partial"
 
-    return family_name, cluster_count, avg_length, tag, split_seq_set
-
-def main():
-    args = parse_args()
-    member_to_cluster, cluster_sizes = load_cluster_file(args.cluster_file)
-    interpro_map = load_interpro_csv(args.metadata)
-    use_case_sets = load_use_case_data(args.generated_fasta)
-
-    cluster_log = args.cluster_log
-    match_log = args.match_log
-
-    # Clear log files if they exist
-    open(cluster_log, "w").close()
-    open(match_log, "w").close()
-
-    results = []
-    for root, _, files in os.walk(args.db_folder):
+    row = {
+        "family": family_name,
+        "total_sequences": len(split_seq_set),
+        "cluster_count": cluster_count,
+        "avg_length": round(avg_length, 2),
+        "tag": tag
+    }
+    return row, "".join(cluster_lines), "".join(match_lines)
+
+def _analyze_worker(fasta_path):
+    return analyze_fasta_file(fasta_path, _SHARED["member_to_cluster"], _SHARED["use_case_sets"], _SHARED["cache"])
+
+def collect_fasta_paths(db_folder):
+    fasta_paths = []
+    for root, _, files in os.walk(db_folder):
         for filename in files:
-            if not filename.endswith(".fasta"):
-                continue
-            fasta_path = os.path.join(root, filename)
+            if is_fasta(filename):
+                fasta_paths.append(os.path.join(root, filename))
+    return sorted(fasta_paths)
+
+def analyze_families(fasta_paths, member_to_cluster, use_case_sets, threads, cache=None,
+                     depth=PREFETCH_DEPTH, budget_bytes=PREFETCH_MB * 1024 * 1024):
+    """Yield per-family results in the order of fasta_paths, in parallel when threads > 1."""
+    if threads <= 1 or len(fasta_paths) <= 1:
+        summaries = (cache or ParseCache()).summaries(fasta_paths, depth, budget_bytes)
+        for fasta_path, (seq_ids, total_len) in zip(fasta_paths, summaries):
             print(f"Processing {fasta_path}...")
-            family_name, cluster_count, avg_length, tag, seq_set = analyze_fasta_file(
-                fasta_path, member_to_cluster, cluster_sizes, use_case_sets,
-                cluster_log, match_log
-            )
-            interpro = interpro_map.get(family_name, {})
-            row = {
-                "family": family_name,
-                "interpro_id": interpro.get("interpro_id", ""),
-                "db": interpro.get("db", ""),
-                "total_sequences": len(seq_set),
-                "cluster_count": cluster_count,
-                "avg_length": round(avg_length, 2),
-                "tag": tag
-            }
+            family_name = fasta_stem(os.path.basename(fasta_path))
+            yield analyze_family_records(family_name, seq_ids, total_len, member_to_cluster, use_case_sets)
+        return
+
+    # Workers inherit the indexes copy-on-write through fork instead of pickling them per task
+    _SHARED["member_to_cluster"] = member_to_cluster
+    _SHARED["use_case_sets"] = use_case_sets
+    _SHARED["cache"] = cache
+    ctx = multiprocessing.get_context("fork")
+    chunksize = max(1, len(fasta_paths) // (threads * 4))
+    with ctx.Pool(processes=threads) as pool:
+        for fasta_path, result in zip(fasta_paths, pool.imap(_analyze_worker, fasta_paths, chunksize=chunksize)):
+            print(f"Processed {fasta_path}")
+            yield result
+    _SHARED.clear()
+
+def write_investigation(family_results, interpro_map, output, cluster_log, match_log):
+    """Write the metadata CSV and both logs from per-family results in family order."""
+    results = []
+    # Single buffered handle per log; fragments are written in family order
+    with open(cluster_log, "w") as cluster_f, open(match_log, "w") as match_f:
+        for row, cluster_text, match_text in family_results:
+            cluster_f.write(cluster_text)
+            match_f.write(match_text)
+            interpro = interpro_map.get(row["family"], {})
+            row["interpro_id"] = interpro.get("interpro_id", "")
+            row["db"] = interpro.get("db", "")
             results.append(row)
 
     # Write final metadata CSV
@@ -173,14 +198,43 @@ def main():
         "family", "interpro_id", "db", "total_sequences",
         "cluster_count", "avg_length", "tag"
     ]
-    with open(args.output, "w", newline="") as out_csv:
+    with open(output, "w", newline="") as out_csv:
         writer = csv.DictWriter(out_csv, fieldnames=fieldnames)
         writer.writeheader()
         writer.writerows(results)
 
-    print(f"\nMetadata written to {args.output}")
+    print(f"\nMetadata written to {output}")
     print(f"Cluster log written to {cluster_log}")
     print(f"Match log written to {match_log}")
 
+def main():
+    args = parse_args()
+    with StageTimer.from_args(args) as timer, ParseCache.from_args(args) as cache:
+        with timer.stage("load_cluster_file"):
+            member_to_cluster = load_cluster_file(args.cluster_file)
+        with timer.stage("load_interpro_csv"):
+            interpro_map = load_interpro_csv(args.metadata)
+        with timer.stage("load_use_case_data"):
+            use_case_sets = load_use_case_data(args.generated_fasta, args.threads, cache, *prefetch_options(args))
+
+        cluster_log = args.cluster_log
+        match_log = args.match_log
+
+        with timer.stage("index"):
+            fasta_paths = select_shard(collect_fasta_paths(args.db_folder), *args.shard)
+            fingerprint = input_fingerprint(
+                [args.db_folder, args.cluster_file, args.metadata, args.generated_fasta], {"shard": list(args.shard)}
+            )
+
+        # Families are analysed as the results are written, so both share one stage
+        with timer.stage("compute_and_write"), Checkpoint(args.checkpoint, fingerprint, args.resume) as checkpoint:
+            # Families finished by an interrupted run are read back instead of analysed again
+            keys = [os.path.relpath(path, args.db_folder) for path in fasta_paths]
+            family_results = checkpoint.resume(keys, lambda pending: analyze_families(
+                [os.path.join(args.db_folder, key) for key in pending], member_to_cluster, use_case_sets, args.threads, cache,
+                *prefetch_options(args)
+            ))
+            write_investigation(family_results, interpro_map, args.output, cluster_log, match_log)
+
 if __name__ == "__main__":
     main()
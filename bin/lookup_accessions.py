@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+import argparse
+import sys
+
+from accession_index import lookup, open_accession_index
+from indexed_fasta import read_gzi, read_range
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Look up accessions in an accession index written by combine_decoy_fasta.py.")
+    parser.add_argument("--index", required=True, help="Accession index folder")
+    parser.add_argument("accessions", nargs="*", help="Accessions to look up; a '/' range is ignored")
+    parser.add_argument("--accession_file", default=None, help="Optional file with one accession per line, '-' for stdin")
+    parser.add_argument("--fasta", default=None, help="Optional combined FASTA the index was written for (plain, or BGZF with its .gzi); adds each sequence")
+    parser.add_argument("--output", default="-", help="Output TSV (default: stdout)")
+    return parser.parse_args()
+
+def read_accessions(args):
+    accessions = list(args.accessions)
+    if args.accession_file:
+        with (sys.stdin if args.accession_file == "-" else open(args.accession_file)) as f:
+            accessions.extend(line.strip() for line in f if line.strip())
+    return accessions
+
+def main():
+    args = parse_args()
+    index = open_accession_index(args.index)
+    blocks = read_gzi(args.fasta) if args.fasta and args.fasta.endswith(".gz") else None
+
+    columns = ["accession", "record_id", "origin", "offset", "length"] + (["sequence"] if args.fasta else [])
+    with (sys.stdout if args.output == "-" else open(args.output, "w")) as out:
+        out.write("\t".join(columns) + "\n")
+        for accession in read_accessions(args):
+            matches = lookup(index, accession)
+            if not matches:
+                out.write("\t".join([accession, "", "unknown", "", ""] + ([""] if args.fasta else [])) + "\n")
+                continue
+            for match in matches:
+                row = [accession, match["record_id"], match["origin"], str(match["offset"]), str(match["length"])]
+                if args.fasta:
+                    # Records dropped as duplicates are not in the combined FASTA
+                    row.append(read_range(args.fasta, match["offset"], match["length"], blocks).decode() if match["offset"] >= 0 else "")
+                out.write("\t".join(row) + "\n")
+
+if __name__ == "__main__":
+    main()
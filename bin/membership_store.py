@@ -0,0 +1,107 @@
+"""On-disk family membership store written next to the sampled family FASTAs.
+
+The store is a folder of .npy arrays that POST stages open memory-mapped:
+accessions.npy holds the sorted base protein IDs (before any '/' range) as
+fixed-width bytes, offsets.npy and members.npy hold each family's member
+indices in CSR layout, and families.tsv lists each family's FASTA path
+relative to the sampled folder, its record count and summed sequence length,
+in the same row order as offsets.npy.
+"""
+
+import os
+
+STORE_DIRNAME = "family_store"
+
+
+def write_store(store_dir, families):
+    """Write (relative_path, record_ids, total_length) families to store_dir."""
+    write_member_sets(store_dir, [
+        (relative_path, {record_id.split("/", 1)[0] for record_id in record_ids}, len(record_ids), total_length)
+        for relative_path, record_ids, total_length in families
+    ])
+
+
+def write_member_sets(store_dir, families):
+    """Write (relative_path, base ID set, record count, total_length) families to store_dir."""
+    import numpy as np
+    families = sorted(families, key=lambda family: family[0])
+    member_sets = [member_set for _, member_set, _, _ in families]
+    accessions = sorted(set().union(*member_sets))
+    accession_index = {accession: i for i, accession in enumerate(accessions)}
+
+    offsets = np.zeros(len(families) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(members) for members in member_sets])
+    members = np.fromiter(
+        (accession_index[accession] for member_set in member_sets for accession in sorted(member_set)),
+        dtype=np.uint32, count=int(offsets[-1])
+    )
+
+    os.makedirs(store_dir, exist_ok=True)
+    np.save(os.path.join(store_dir, "accessions.npy"), np.array([a.encode() for a in accessions], dtype=bytes))
+    np.save(os.path.join(store_dir, "offsets.npy"), offsets)
+    np.save(os.path.join(store_dir, "members.npy"), members)
+    with open(os.path.join(store_dir, "families.tsv"), "w") as f:
+        f.write("path\trecords\ttotal_length\n")
+        for relative_path, _, records, total_length in families:
+            f.write(f"{relative_path}\t{records}\t{total_length}\n")
+
+
+def open_store(folder):
+    """Memory-map the store under a sampled FASTA folder, or return None if it has none."""
+    store_dir = os.path.join(folder, STORE_DIRNAME)
+    if not os.path.isfile(os.path.join(store_dir, "families.tsv")):
+        return None
+    import numpy as np
+    families = {}
+    with open(os.path.join(store_dir, "families.tsv")) as f:
+        next(f)  # Skip header
+        for row, line in enumerate(f):
+            relative_path, records, total_length = line.rstrip("\n").split("\t")
+            families[relative_path] = (row, int(records), int(total_length))
+    return {
+        "folder": folder,
+        "families": families,
+        "accessions": np.load(os.path.join(store_dir, "accessions.npy"), mmap_mode="r"),
+        "offsets": np.load(os.path.join(store_dir, "offsets.npy"), mmap_mode="r"),
+        "members": np.load(os.path.join(store_dir, "members.npy"), mmap_mode="r"),
+    }
+
+
+def family_member_sets(store, paths):
+    """Base protein ID sets for the given family FASTA paths, or None if any path is not in the store."""
+    rows = []
+    for path in paths:
+        family = store["families"].get(os.path.relpath(path, store["folder"]).replace(os.sep, "/"))
+        if family is None:
+            return None
+        rows.append(family[0])
+
+    accessions = store["accessions"]
+    offsets = store["offsets"]
+    members = store["members"]
+    decoded = {}
+    member_sets = []
+    for row in rows:
+        member_set = set()
+        for i in members[offsets[row]:offsets[row + 1]].tolist():
+            accession = decoded.get(i)
+            if accession is None:
+                accession = decoded[i] = accessions[i].decode()
+            member_set.add(accession)
+        member_sets.append(member_set)
+    return member_sets
+
+
+def merge_stores(folders, store_dir):
+    """Write one store covering the stores under several sampled FASTA folders; the first folder listing a family wins."""
+    families = {}
+    for folder in folders:
+        store = open_store(folder)
+        if store is None:
+            raise FileNotFoundError(f"No {STORE_DIRNAME} under {folder}")
+        relative_paths = list(store["families"])
+        member_sets = family_member_sets(store, [os.path.join(folder, path) for path in relative_paths])
+        for relative_path, member_set in zip(relative_paths, member_sets):
+            _, records, total_length = store["families"][relative_path]
+            families.setdefault(relative_path, (relative_path, member_set, records, total_length))
+    write_member_sets(store_dir, list(families.values()))
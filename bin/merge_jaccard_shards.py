@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+import argparse
+from similarity_edges import merge_edge_files
+from shards import order_shards
+from stage_timing import StageTimer, add_timing_args
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Merge sharded Jaccard similarity outputs into the single-run TSV and edge list.")
+    parser.add_argument("--tsv_files", nargs="+", required=True, help="Shard TSV files, named *shard_<i>_of_<N>*.")
+    parser.add_argument("--edge_files", nargs="*", default=[], help="Shard .npz edge lists to merge.")
+    parser.add_argument("--output_file", required=True, help="Merged TSV output file.")
+    parser.add_argument("--edges_file", default=None, help="Merged .npz edge list output file.")
+    add_timing_args(parser)
+    return parser.parse_args()
+
+def merge_tsv_files(paths, output_file):
+    """Concatenate shard TSVs in shard order, keeping a single header."""
+    rows = 0
+    with open(output_file, "w") as out_f:
+        for i, path in enumerate(order_shards(paths)):
+            with open(path) as in_f:
+                header = in_f.readline()
+                if i == 0:
+                    out_f.write(header)
+                for line in in_f:
+                    out_f.write(line)
+                    rows += 1
+    return rows
+
+def main():
+    args = parse_args()
+
+    with StageTimer.from_args(args) as timer:
+        with timer.stage("merge_tsv"):
+            rows = merge_tsv_files(args.tsv_files, args.output_file)
+        print(f"Merged {len(args.tsv_files)} shards ({rows} rows) into {args.output_file}")
+
+        if args.edges_file:
+            with timer.stage("merge_edges"):
+                edges = merge_edge_files(args.edge_files, args.edges_file)
+            print(f"Merged {len(args.edge_files)} edge lists ({edges} edges) into {args.edges_file}")
+
+if __name__ == "__main__":
+    main()
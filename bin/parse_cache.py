@@ -0,0 +1,198 @@
+"""Content-addressed cache of per-file parse summaries, shared by the POST scripts.
+
+A summary holds what the POST stages read from an alignment or FASTA file:
+its record IDs in file order (each ID once for interleaved Stockholm) and the
+summed sequence length, from which the sequence count and average length
+follow. Entries are keyed by the file's device, inode, size and mtime, or with
+--cache_key content by a hash of its bytes, so a file staged again under
+another work folder or name still hits. Each entry is one gzipped JSON file
+written atomically, so concurrent tasks can share a cache folder. Hits
+refresh the entry's mtime, and once a run finishes the least recently used
+entries are removed until the folder fits in --cache_max_mb. summaries()
+reads the files it has to scan ahead in background threads.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+
+from prefetch import PREFETCH_DEPTH, PREFETCH_MB, open_data, prefetch
+
+# Bump whenever scan_file's output changes, so entries written by older scripts are ignored
+SUMMARY_VERSION = 1
+HASH_BLOCK_SIZE = 1 << 20
+ENTRY_SUFFIX = ".json.gz"
+
+
+def add_cache_args(parser):
+    parser.add_argument("--cache_dir", default=None, help="Optional folder caching the record IDs and sequence lengths of every parsed input file, shared across runs and stages")
+    parser.add_argument("--cache_max_mb", type=float, default=4096, help="Remove the least recently used cache entries past this many MiB, 0 for no limit (default: 4096)")
+    parser.add_argument("--cache_key", choices=("stat", "content"), default="stat", help="Key cache entries by file inode, size and mtime, or by a hash of the file bytes (default: stat)")
+
+
+def open_scanned(path, data=None):
+    """Text handle on a plain or gzipped file, or on its prefetched, decompressed bytes when data is given."""
+    if data is not None:
+        return open_data(data)
+    return gzip.open(path, "rt") if path.endswith(".gz") else open(path)
+
+
+def scan_file(path, data=None, errors=()):
+    """Read one FASTA or Stockholm file, keeping the record IDs in file order and the summed sequence length.
+
+    An error listed in errors ends the scan early, keeping the records read before it.
+    """
+    stockholm = path.endswith(".sto")
+    # Interleaved Stockholm repeats record ids across blocks, so keep each id once
+    record_ids = {} if stockholm else []
+    total_len = 0
+    try:
+        with open_scanned(path, data) as handle:
+            if stockholm:
+                for line in handle:
+                    if not line.strip() or line.startswith("#") or line.startswith("//"):
+                        continue
+                    record_ids.setdefault(line.split(None, 1)[0])
+            else:
+                # Line by line rather than per record, so a file cut short keeps the header it was reading
+                for line in handle:
+                    if line[0] == ">":
+                        record_ids.append((line[1:].split(None, 1) or [""])[0])
+                    elif record_ids:
+                        total_len += len(line.rstrip().replace(" ", ""))
+    except errors:
+        pass
+    return list(record_ids), total_len
+
+
+def base_ids(record_ids):
+    return [record_id.split("/", 1)[0] for record_id in record_ids]
+
+
+def file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """Return scan_file summaries, reading them from cache_dir when present; scans every time when cache_dir is None."""
+
+    def __init__(self, cache_dir=None, max_bytes=0, key="stat"):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.key = key
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @classmethod
+    def from_args(cls, args):
+        return cls(args.cache_dir, int(args.cache_max_mb * 1024 * 1024), args.cache_key)
+
+    def _entry_path(self, path):
+        if self.key == "content":
+            file_key = file_digest(path)
+        else:
+            # os.stat follows the symlinks Nextflow stages inputs through, so every task sees the same file
+            stat = os.stat(path)
+            file_key = f"{stat.st_dev}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}"
+        # Stockholm and FASTA files are scanned differently, so the format is part of the key
+        entry_key = hashlib.sha1(f"{SUMMARY_VERSION}:{path.endswith('.sto')}:{file_key}".encode()).hexdigest()
+        return os.path.join(self.cache_dir, entry_key[:2], entry_key + ENTRY_SUFFIX)
+
+    def _read(self, entry_path):
+        try:
+            with gzip.open(entry_path, "rt") as f:
+                entry = json.load(f)
+            os.utime(entry_path)
+            return entry["record_ids"], entry["total_length"]
+        except (OSError, EOFError, ValueError, KeyError):
+            # Missing, evicted by another task while reading, or torn
+            return None
+
+    def _write(self, entry_path, record_ids, total_len):
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+        with gzip.open(tmp_path, "wt", compresslevel=1) as f:
+            json.dump({"record_ids": record_ids, "count": len(record_ids), "total_length": total_len}, f)
+        os.replace(tmp_path, entry_path)
+
+    def summary(self, path, data=None, errors=()):
+        """(record IDs, summed sequence length) of one file, scanning its prefetched bytes when data is given.
+
+        A file failing with an error listed in errors is skipped with a warning, keeping the records read before the error.
+        """
+        path = str(path)
+        try:
+            return self._summary(path, None if self.cache_dir is None else self._entry_path(path), data)
+        except errors as e:
+            return self._partial(path, e, errors)
+
+    @staticmethod
+    def _partial(path, error, errors):
+        print(f"Warning: Failed to parse {path}. Error: {error}")
+        # Scanned again uncached, so a partial summary never reaches the cache
+        return scan_file(path, errors=errors)
+
+    def _summary(self, path, entry_path, data=None):
+        if entry_path is None:
+            return scan_file(path, data)
+        cached = self._read(entry_path)
+        if cached is not None:
+            return cached
+        record_ids, total_len = scan_file(path, data)
+        self._write(entry_path, record_ids, total_len)
+        return record_ids, total_len
+
+    def summaries(self, paths, depth=PREFETCH_DEPTH, budget_bytes=PREFETCH_MB * 1024 * 1024, errors=()):
+        """Yield summary() of each path in order, reading the files without a cache entry ahead while one is scanned."""
+        paths = [str(path) for path in paths]
+        entry_paths = [None if self.cache_dir is None else self._entry_path(path) for path in paths]
+        # Decided once up front, so the files read ahead line up with the ones scanned
+        misses = [entry_path is None or not os.path.isfile(entry_path) for entry_path in entry_paths]
+        files = prefetch([path for path, miss in zip(paths, misses) if miss], depth, budget_bytes)
+        for path, entry_path, miss in zip(paths, entry_paths, misses):
+            read = next(files)[1] if miss else None
+            try:
+                result = self._summary(path, entry_path, None if read is None else read())
+            except errors as e:
+                result = self._partial(path, e, errors)
+            yield result
+
+    def prune(self):
+        """Remove the least recently used entries until the cache fits in max_bytes."""
+        if self.cache_dir is None or not self.max_bytes:
+            return
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for filename in files:
+                if filename.endswith(ENTRY_SUFFIX):
+                    entry_path = os.path.join(root, filename)
+                    try:
+                        stat = os.stat(entry_path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry_path))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, entry_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(entry_path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        if removed:
+            print(f"Removed {removed} least recently used entries from {self.cache_dir}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.prune()
+        return False
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+
+import os
+import argparse
+import multiprocessing
+from functools import partial
+
+from calculate_sequence_stats import (
+    ALIGNMENT_TYPES, READ_ERRORS, build_name_index, count_names, detect_alignment_type,
+    empty_results, merge_partials, write_type_outputs
+)
+from analyze_recruited_decoys import msa_family, tally_decoys, write_results
+from calculate_jaccard_similarity import (
+    list_original_files, list_use_case_files, prepare_scoring, score_use_case_ids,
+    strip_extensions, write_similarity_results
+)
+from calculate_db_sequence_coverage import compute_match_stats, load_metadata, select_family_paths
+from investigate_matched_originals import (
+    analyze_family_records, collect_fasta_paths, load_cluster_file, load_interpro_csv, write_investigation
+)
+from indexed_fasta import fasta_stem
+from parse_cache import ParseCache, add_cache_args, base_ids
+from prefetch import add_prefetch_args, prefetch_options
+from stage_timing import StageTimer, add_timing_args
+
+DB_LAYERS = ["pfam", "panther", "ncbifam", "hamap"]
+
+# Membership store and worker inputs, populated once in the parent and inherited by forked workers
+_SHARED = {}
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Read every POST input file once and write the outputs of the sequence stats, decoy, "
+                    "Jaccard, sequence coverage and matched originals stages."
+    )
+    parser.add_argument("--alignment_folder", required=True, help="Folder containing the use-case alignment files")
+    parser.add_argument("--alignment_type", nargs="+", choices=ALIGNMENT_TYPES, default=["fas.gz"], help="Alignment type(s) for the sequence stats; the first one feeds the sequence coverage (default: fas.gz)")
+    parser.add_argument("--original_fasta", required=True, help="Path to the combined original families FASTA file")
+    parser.add_argument("--decoy_fasta", required=True, help="Path to the decoy FASTA file")
+    parser.add_argument("--metadata", required=True, help="Sampled families metadata CSV")
+    parser.add_argument("--sampled_fasta", required=True, help="Folder with pfam, panther, ncbifam and hamap subfolders of sampled family FASTAs")
+    parser.add_argument("--cluster_file", required=True, help="Path to clustering 2-column TSV file")
+    parser.add_argument("--generated_fasta", required=True, help="Path to folder with generated .fasta.gz files")
+    parser.add_argument("--similarity_threshold", type=float, default=0.5, help="Jaccard similarity threshold (default: 0.5)")
+    parser.add_argument("--edge_floor", type=float, default=0.1, help="Lowest similarity kept in the Jaccard edge list (default: 0.1)")
+    parser.add_argument("--threads", type=int, default=1, help="Number of worker processes (default: 1)")
+    parser.add_argument("--outdir", default=".", help="Output folder (default: current folder)")
+    add_cache_args(parser)
+    add_prefetch_args(parser)
+    add_timing_args(parser)
+    return parser.parse_args()
+
+def parallel_map(func, items, threads):
+    """Map func over items in order, in forked worker processes when threads > 1."""
+    if threads <= 1 or len(items) <= 1:
+        return list(map(func, items))
+    ctx = multiprocessing.get_context("fork")
+    chunksize = max(1, len(items) // (threads * 4))
+    with ctx.Pool(processes=threads) as pool:
+        return pool.map(func, items, chunksize=chunksize)
+
+def build_store(paths, threads, cache, depth, budget_bytes):
+    """Scan every distinct file once, or read it from the parse cache, mapping its normalised path to (record IDs, summed length).
+
+    A single process reads the next files ahead in background threads while it scans the current one.
+    Unreadable files are skipped with a warning, keeping the records read before the error, as the stage scripts do.
+    """
+    paths = list(dict.fromkeys(os.path.normpath(path) for path in paths))
+    print(f"Scanning {len(paths)} files...")
+    if threads <= 1:
+        return dict(zip(paths, cache.summaries(paths, depth, budget_bytes, errors=READ_ERRORS)))
+    return dict(zip(paths, parallel_map(partial(cache.summary, errors=READ_ERRORS), paths, threads)))
+
+def lookup(store, path):
+    return store[os.path.normpath(path)]
+
+def _score_worker(use_case_file):
+    use_case_basename = strip_extensions(os.path.basename(use_case_file))
+    return score_use_case_ids(use_case_basename, set(base_ids(lookup(_SHARED["store"], use_case_file)[0])))
+
+def _analyze_worker(fasta_path):
+    seq_ids, total_len = lookup(_SHARED["store"], fasta_path)
+    family_name = fasta_stem(os.path.basename(fasta_path))
+    return analyze_family_records(family_name, seq_ids, total_len, _SHARED["member_to_cluster"], _SHARED["use_case_sets"])
+
+def main():
+    args = parse_args()
+    os.makedirs(args.outdir, exist_ok=True)
+    file_types = list(dict.fromkeys(args.alignment_type))
+
+    with StageTimer.from_args(args) as timer, ParseCache.from_args(args) as cache:
+        with timer.stage("index"):
+            # Work out every file each stage reads, so shared files are only scanned once
+            alignment_files = sorted(os.path.join(args.alignment_folder, f) for f in os.listdir(args.alignment_folder))
+            stats_files = [(f, detect_alignment_type(f, file_types)) for f in alignment_files]
+            stats_files = [(f, file_type) for f, file_type in stats_files if file_type is not None]
+            decoy_msa_files = [f for f in alignment_files if os.path.isfile(f) and msa_family(os.path.basename(f)) is not None]
+            use_case_files = list_use_case_files(args.alignment_folder)
+            original_files = list_original_files(args.sampled_fasta, DB_LAYERS)
+            db_to_ids = load_metadata(args.metadata)
+            msa_paths = {db: os.path.join(args.sampled_fasta, db) for db in DB_LAYERS}
+            coverage_files = {db: select_family_paths(ids, msa_paths[db]) for db, ids in db_to_ids.items()}
+            family_fastas = collect_fasta_paths(args.sampled_fasta)
+            generated_files = sorted(f for f in os.listdir(args.generated_fasta) if f.endswith(".fasta.gz"))
+
+        with timer.stage("scan"):
+            store = build_store(
+                [args.original_fasta, args.decoy_fasta]
+                + [f for f, _ in stats_files] + decoy_msa_files + use_case_files
+                + [f for f, _ in original_files] + [f for paths in coverage_files.values() for f in paths]
+                + family_fastas + [os.path.join(args.generated_fasta, f) for f in generated_files],
+                args.threads, cache, *prefetch_options(args)
+            )
+            _SHARED["store"] = store
+
+        with timer.stage("sequence_stats"):
+            original_names, original_index = build_name_index(set(base_ids(lookup(store, args.original_fasta)[0])))
+            decoy_record_ids = lookup(store, args.decoy_fasta)[0]
+            decoy_names, decoy_index = build_name_index(set(base_ids(decoy_record_ids)))
+            print(f"Loaded {len(original_names)} unique original proteins and {len(decoy_names)} unique decoy proteins.")
+            stats = empty_results(file_types, original_index, decoy_index)
+            merge_partials(stats, (
+                (file_type, *count_names(base_ids(lookup(store, f)[0]), original_index, decoy_index))
+                for f, file_type in stats_files
+            ))
+            for file_type in file_types:
+                write_type_outputs(file_type, original_names, decoy_names, stats[file_type], args.outdir)
+
+        with timer.stage("sequence_coverage"):
+            # Sequence coverage, from the first alignment type's original counts
+            original_count = stats[file_types[0]][0]
+            found_proteins = {name for name, count in zip(original_names, original_count.tolist()) if count > 0}
+            family_ids = {f: set(base_ids(lookup(store, f)[0])) for paths in coverage_files.values() for f in paths}
+            compute_match_stats(
+                db_to_ids, msa_paths, found_proteins, os.path.join(args.outdir, "sequence_coverage.txt"), family_ids=family_ids
+            )
+
+        with timer.stage("recruited_decoys"):
+            decoy_ids = frozenset(decoy_record_ids)
+            decoy_results = []
+            all_details = []
+            for f in decoy_msa_files:
+                family_stats, details = tally_decoys(msa_family(os.path.basename(f)), lookup(store, f)[0], decoy_ids, True)
+                decoy_results.append(family_stats)
+                all_details.extend((family_stats["family"], position, record_id) for position, record_id in details)
+            write_results(
+                decoy_results, all_details,
+                os.path.join(args.outdir, "decoy_stats.csv"), os.path.join(args.outdir, "decoy_details.tsv")
+            )
+
+        with timer.stage("jaccard_similarity"):
+            score_floor = min(args.similarity_threshold, args.edge_floor)
+            originals = [
+                (strip_extensions(os.path.basename(f)), db_layer, set(base_ids(lookup(store, f)[0])))
+                for f, db_layer in original_files
+            ]
+            prepare_scoring(originals, args.similarity_threshold, score_floor)
+            write_similarity_results(
+                zip(use_case_files, parallel_map(_score_worker, use_case_files, args.threads)), originals,
+                os.path.join(args.outdir, "jaccard_similarities.csv"), score_floor,
+                edges_file=os.path.join(args.outdir, "jaccard_edges.npz")
+            )
+
+        with timer.stage("matched_originals"):
+            use_case_sets = {}
+            for f in generated_files:
+                seq_ids, total_len = lookup(store, os.path.join(args.generated_fasta, f))
+                use_case_sets[f] = (set(base_ids(seq_ids)), total_len / len(seq_ids) if seq_ids else 0)
+            member_to_cluster = load_cluster_file(args.cluster_file)
+            _SHARED.update(member_to_cluster=member_to_cluster, use_case_sets=use_case_sets)
+            write_investigation(
+                parallel_map(_analyze_worker, family_fastas, args.threads), load_interpro_csv(args.metadata),
+                os.path.join(args.outdir, "metadata.csv"), os.path.join(args.outdir, "all_clusters.txt"),
+                os.path.join(args.outdir, "all_matches.txt")
+            )
+        _SHARED.clear()
+
+if __name__ == "__main__":
+    main()
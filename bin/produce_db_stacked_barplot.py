@@ -1,24 +1,28 @@
 #!/usr/bin/env python3
 
-import pandas as pd
-import matplotlib.pyplot as plt
 import argparse
+from similarity_edges import read_similarity_results, counts_at_or_above
+from stage_timing import StageTimer, add_timing_args
 
-def main(input_file, output_file):
-    # Load the data
-    df = pd.read_csv(input_file, sep="\t")
+def main(input_file, output_file, timer):
+    # Load the data (TSV or .npz edge list), sorted by similarity score
+    with timer.stage("load"):
+        edges = read_similarity_results(input_file)
 
     # Define similarity thresholds
     thresholds = [0.5, 0.6, 0.7, 0.8, 0.9, 1.0]
     db_layers = ['hamap', 'ncbifam', 'panther', 'pfam']
 
-    # Count entries ≥ each threshold, grouped by db_layer
-    counts = {thr: df[df["similarity_score"] >= thr]["db_layer"].value_counts()
-              for thr in thresholds}
+    # Count entries ≥ each threshold per db_layer with one cumulative searchsorted pass
+    counts = {}
+    with timer.stage("compute"):
+        for db in db_layers:
+            scores = edges["score"][edges["db_layer"] == db]
+            counts[db] = counts_at_or_above(scores, thresholds)
 
-    # Create a DataFrame for plotting
-    plot_df = pd.DataFrame(counts).fillna(0).astype(int)
-    plot_df = plot_df.reindex(db_layers)  # Ensure consistent db_layer order
+    # Create a DataFrame for plotting; pandas and matplotlib load only once there is something to plot
+    import pandas as pd
+    plot_df = pd.DataFrame.from_dict(counts, orient="index", columns=thresholds).astype(int)
 
     # Plotting
     colors = {
@@ -28,22 +32,30 @@ def main(input_file, output_file):
         'pfam': '#d62728'
     }
 
-    plot_df.T.plot(kind='bar', stacked=True, color=[colors[db] for db in plot_df.index])
+    with timer.stage("write"):
+        # Non-interactive backend, set before pyplot loads
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
 
-    plt.xlabel('Jaccard similarity score threshold')
-    plt.ylabel('Number of produced families that match original families')
-    plt.title('Entries by similarity threshold and database')
-    plt.xticks(rotation=0)
-    plt.legend(title='DB')
-    plt.tight_layout()
+        plot_df.T.plot(kind='bar', stacked=True, color=[colors[db] for db in plot_df.index])
 
-    # Save to PNG
-    plt.savefig(output_file, dpi=300)
+        plt.xlabel('Jaccard similarity score threshold')
+        plt.ylabel('Number of produced families that match original families')
+        plt.title('Entries by similarity threshold and database')
+        plt.xticks(rotation=0)
+        plt.legend(title='DB')
+        plt.tight_layout()
+
+        # Save to PNG
+        plt.savefig(output_file, dpi=300)
     print(f"Plot saved to {output_file}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generate similarity score barplot by db_layer.")
-    parser.add_argument("--input_file", required=True, help="Path to the input TSV file.")
+    parser.add_argument("--input_file", required=True, help="Path to the input TSV file or .npz edge list.")
     parser.add_argument("--output_file", required=True, help="Path to save the output PNG file.")
+    add_timing_args(parser)
     args = parser.parse_args()
-    main(args.input_file, args.output_file)
+    with StageTimer.from_args(args) as timer:
+        main(args.input_file, args.output_file, timer)
@@ -3,6 +3,8 @@
 import argparse
 import re
 
+from stage_timing import StageTimer, add_timing_args
+
 def count_leading_dashes(line):
     """Count the number of '--' groups at the beginning of the line."""
     match = re.match(r'^(--)+', line)
@@ -22,45 +24,50 @@ def main():
     parser.add_argument("--infile", required=True, help="Input hierarchy file")
     parser.add_argument("--max_depth", type=int, required=True, help="Max depth of the hierarchy")
     parser.add_argument("--outfile", required=True, help="Filtered output file")
+    add_timing_args(parser)
     args = parser.parse_args()
 
-    # Read all non-empty lines from the input
-    with open(args.infile) as f:
-        lines = [line.rstrip('\n') for line in f if line.strip()]
+    with StageTimer.from_args(args) as timer:
+        with timer.stage("load"):
+            # Read all non-empty lines from the input
+            with open(args.infile) as f:
+                lines = [line.rstrip('\n') for line in f if line.strip()]
 
-    # Split into clades (block starts with a non-dashed line)
-    clades = []
-    current = []
-    for line in lines:
-        if not line.startswith('--'):
+            # Split into clades (block starts with a non-dashed line)
+            clades = []
+            current = []
+            for line in lines:
+                if not line.startswith('--'):
+                    if current:
+                        clades.append(current)
+                    current = [line]
+                else:
+                    current.append(line)
             if current:
                 clades.append(current)
-            current = [line]
-        else:
-            current.append(line)
-    if current:
-        clades.append(current)
 
-    seen_iprs = set()
-    written_clades = []
+        with timer.stage("compute"):
+            seen_iprs = set()
+            written_clades = []
 
-    for depth in range(args.max_depth, 0, -1):
-        for clade in clades:
-            clade_iprs = extract_iprs(clade)
+            for depth in range(args.max_depth, 0, -1):
+                for clade in clades:
+                    clade_iprs = extract_iprs(clade)
 
-            # Skip if any IPR has already been written
-            if clade_iprs & seen_iprs:
-                continue
+                    # Skip if any IPR has already been written
+                    if clade_iprs & seen_iprs:
+                        continue
 
-            # Write clade if it has at least one line with the current depth
-            if any(count_leading_dashes(line) >= depth for line in clade):
-                written_clades.append(clade)
-                seen_iprs.update(clade_iprs)
+                    # Write clade if it has at least one line with the current depth
+                    if any(count_leading_dashes(line) >= depth for line in clade):
+                        written_clades.append(clade)
+                        seen_iprs.update(clade_iprs)
 
-    # Write result to file
-    with open(args.outfile, 'w') as out:
-        for clade in written_clades:
-            out.write('\n'.join(clade) + '\n')
+        with timer.stage("write"):
+            # Write result to file
+            with open(args.outfile, 'w') as out:
+                for clade in written_clades:
+                    out.write('\n'.join(clade) + '\n')
 
 if __name__ == "__main__":
     main()
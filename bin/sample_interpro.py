@@ -1,12 +1,24 @@
 #!/usr/bin/env python3
 
 import argparse
-import pandas as pd
+import multiprocessing
 import random
 import re
 from collections import defaultdict
 from pathlib import Path
 
+from stage_timing import StageTimer, add_timing_args
+from tables import add_table_args, iter_table, read_table, write_table
+
+# Columns read for sampling; the rest are only read back for the picked rows
+SAMPLING_COLUMNS = ["interpro_id", "db", "protein_count"]
+# Protein counts fit in int32, halving that column of the candidate pool
+SAMPLING_DTYPES = {"protein_count": "int32"}
+LOAD_CHUNK_SIZE = 100000
+
+# Per-db candidate pools, populated in the parent and inherited by forked workers
+_SHARED = {}
+
 class Node:
     def __init__(self, ipr_id, label=None):
         self.ipr_id = ipr_id
@@ -77,6 +89,29 @@ def filter_by_minimum_membership(df, min_membership):
     return df[df["protein_count"] >= min_membership].copy()
 
 
+def load_candidates(path, min_membership, chunk_size=LOAD_CHUNK_SIZE, engine="c"):
+    """Read only the columns sampling needs, in chunks, dropping families under min_membership chunk by chunk.
+
+    The index keeps each row's position in the file, so the full rows are only read back for the picked families.
+    A chunk_size of 0 reads the whole file at once with the given CSV engine.
+    """
+    return read_table(
+        path, "candidate_families", SAMPLING_COLUMNS, engine=engine, chunksize=chunk_size or None,
+        chunk_filter=lambda chunk: filter_by_minimum_membership(chunk, min_membership), dtypes=SAMPLING_DTYPES
+    )
+
+
+def load_rows(path, positions, chunk_size=LOAD_CHUNK_SIZE, engine="c"):
+    """Read back every column of the rows at the given file positions, in the order given."""
+    import pandas as pd
+    if not chunk_size:
+        return read_table(path, "candidate_families", engine=engine, text=True).loc[positions]
+    wanted = set(positions)
+    reader = iter_table(path, "candidate_families", chunksize=chunk_size, text=True)
+    rows = pd.concat([chunk[chunk.index.isin(wanted)] for chunk in reader])
+    return rows.loc[positions]
+
+
 def log_selection(logfile, picked, removed):
     with open(logfile, "a") as f:
         f.write(f"PICKED: {picked}\n")
@@ -85,11 +120,33 @@ def log_selection(logfile, picked, removed):
         f.write("\n")
 
 
-def sample_entries(df, tree_nodes, num_per_db, logfile):
+def exclude_relatives(ipr, tree_nodes, excluded, logfile):
+    """Add ipr and its tree relatives to excluded, returning the IDs excluded for this pick."""
+    node = tree_nodes.get(ipr)
+    if not node:
+        return set()
+
+    descendants = node.get_descendants()
+    ancestors = node.get_ancestors()
+    siblings = node.get_siblings()
+
+    to_remove = descendants | ancestors | siblings | {ipr}
+    excluded |= to_remove
+
+    log_selection(logfile, ipr, {
+        "descendants": descendants,
+        "ancestors": ancestors,
+        "siblings": siblings,
+        "self": {ipr},
+    })
+    return to_remove
+
+
+def sample_entries(df, tree_nodes, num_per_db, logfile, rng=None):
     selected = set()
     excluded = set()
 
-    db_groups = df.groupby("db")
+    db_groups = df.groupby("db", observed=True)
     samples_per_db = {db: [] for db in db_groups.groups}
 
     # Work through rounds, one pick per db in each round
@@ -99,29 +156,178 @@ def sample_entries(df, tree_nodes, num_per_db, logfile):
             if available.empty:
                 continue
 
-            picked_row = available.sample(n=1).iloc[0]
-            ipr = picked_row["interpro_id"]
-            samples_per_db[db].append(picked_row)
+            picked = available.sample(n=1, random_state=rng)
+            ipr = picked["interpro_id"].iloc[0]
+            samples_per_db[db].append(picked.index[0])
             selected.add(ipr)
+            exclude_relatives(ipr, tree_nodes, excluded, logfile)
+
+    return [position for positions in samples_per_db.values() for position in positions]
+
 
-            node = tree_nodes.get(ipr)
-            if node:
-                descendants = node.get_descendants()
-                ancestors = node.get_ancestors()
-                siblings = node.get_siblings()
+def _shuffle_pool(task):
+    """Put one database's candidate rows in random order; runs in a forked worker."""
+    import numpy as np
+    db, seed = task
+    positions, ipr_ids = _SHARED["pools"][db]
+    order = np.random.default_rng(seed).permutation(len(positions))
+    return positions[order].tolist(), ipr_ids[order].tolist()
 
-                to_remove = descendants | ancestors | siblings | {ipr}
-                excluded |= to_remove
 
-                log_selection(logfile, ipr, {
-                    "descendants": descendants,
-                    "ancestors": ancestors,
-                    "siblings": siblings,
-                    "self": {ipr},
-                })
+def prepare_pools(df, threads, seed=None):
+    """Shuffle each database's candidate pool, one database per worker process.
+
+    Every database draws from its own child of the seed, so the pools do not depend on the number of workers.
+    """
+    import numpy as np
+    db_groups = df.groupby("db", observed=True)
+    _SHARED["pools"] = {db: (group.index.to_numpy(), group["interpro_id"].to_numpy()) for db, group in db_groups}
+    tasks = list(zip(_SHARED["pools"], np.random.SeedSequence(seed).spawn(len(_SHARED["pools"]))))
+    try:
+        if threads <= 1 or len(tasks) <= 1:
+            shuffled = list(map(_shuffle_pool, tasks))
+        else:
+            ctx = multiprocessing.get_context("fork")
+            with ctx.Pool(processes=min(threads, len(tasks))) as pool:
+                shuffled = pool.map(_shuffle_pool, tasks, chunksize=1)
+    finally:
+        _SHARED.clear()
+    return {db: pool for (db, _), pool in zip(tasks, shuffled)}
+
 
-    sampled_df = pd.concat([pd.DataFrame(rows) for rows in samples_per_db.values()])
-    return sampled_df
+def sample_pools(pools, tree_nodes, num_per_db, logfile):
+    """Round-robin over the shuffled pools, each db taking its next row whose family is not yet excluded.
+
+    Taking the first non-excluded row of a random order is a uniform pick among the available rows, as in
+    sample_entries, but each skipped row is looked at once instead of every pool being filtered per pick.
+    Rows are consumed as they are picked, so no row is picked twice.
+    """
+    excluded = set()
+    cursors = {db: 0 for db in pools}
+    samples_per_db = {db: [] for db in pools}
+
+    for round_i in range(num_per_db):
+        for db, (positions, ipr_ids) in pools.items():
+            cursor = cursors[db]
+            while cursor < len(ipr_ids) and ipr_ids[cursor] in excluded:
+                cursor += 1
+            cursors[db] = cursor + 1
+            if cursor >= len(ipr_ids):
+                continue
+
+            ipr = ipr_ids[cursor]
+            samples_per_db[db].append(positions[cursor])
+            exclude_relatives(ipr, tree_nodes, excluded, logfile)
+
+    return [position for positions in samples_per_db.values() for position in positions]
+
+
+class FenwickTree:
+    """Prefix sums over non-negative integer weights, for O(log n) weighted picks and removals."""
+
+    def __init__(self, weights):
+        self.weights = list(weights)
+        self.total = sum(self.weights)
+        self.tree = [0] + self.weights
+        # O(n) build: push each node's sum up to its parent
+        for i in range(1, len(self.tree)):
+            parent = i + (i & -i)
+            if parent < len(self.tree):
+                self.tree[parent] += self.tree[i]
+
+    def remove(self, index):
+        """Set the weight of item index to zero."""
+        weight = self.weights[index]
+        if not weight:
+            return
+        self.weights[index] = 0
+        self.total -= weight
+        i = index + 1
+        while i < len(self.tree):
+            self.tree[i] -= weight
+            i += i & -i
+
+    def find(self, target):
+        """Index of the item whose cumulative weight range holds target, for 0 <= target < total."""
+        position = 0
+        step = 1 << (len(self.tree).bit_length() - 1)
+        while step:
+            next_position = position + step
+            if next_position < len(self.tree) and self.tree[next_position] <= target:
+                position = next_position
+                target -= self.tree[position]
+            step >>= 1
+        return position
+
+    def pick(self, rng):
+        return self.find(int(rng.integers(self.total)))
+
+
+def size_strata(counts, num_strata):
+    """Assign each protein count to one of num_strata bins holding roughly equal numbers of families."""
+    import numpy as np
+    if num_strata <= 1 or len(counts) == 0:
+        return np.zeros(len(counts), dtype=int)
+    edges = np.quantile(counts, np.linspace(0, 1, num_strata + 1)[1:-1])
+    return np.searchsorted(edges, counts, side="right")
+
+
+def sample_weighted(df, tree_nodes, num_per_db, logfile, weighting="uniform", num_strata=1, sequence_budget=0, rng=None):
+    """Round-robin sampling with one Fenwick tree per db and size stratum.
+
+    weighting "size" picks families in proportion to their protein_count. With num_strata > 1, the families
+    are split into protein_count bins and each db's k-th pick comes from bin k % num_strata, moving on to the
+    next bin when one runs out. With sequence_budget > 0, families that would take the summed protein_count
+    of the sample over the budget are dropped. Excluded and picked rows are removed from their tree, so every
+    pick costs O(log n) plus the removals it triggers, and no row is picked twice.
+    """
+    import numpy as np
+    rng = rng if rng is not None else np.random.default_rng()
+    df = df.assign(stratum=size_strata(df["protein_count"].to_numpy(), num_strata))
+
+    # db -> stratum -> (file positions, interpro IDs, protein counts, tree); ipr -> every (db, stratum, index) holding it
+    pools = {}
+    ipr_rows = defaultdict(list)
+    for db, group in df.groupby("db", observed=True):
+        pools[db] = []
+        for stratum in range(max(num_strata, 1)):
+            rows = group[group["stratum"] == stratum]
+            counts = rows["protein_count"].astype(int).tolist()
+            ipr_ids = rows["interpro_id"].tolist()
+            weights = counts if weighting == "size" else [1] * len(counts)
+            pools[db].append((rows.index.tolist(), ipr_ids, counts, FenwickTree(weights)))
+            for index, ipr in enumerate(ipr_ids):
+                ipr_rows[ipr].append((db, stratum, index))
+
+    excluded = set()
+    samples_per_db = {db: [] for db in pools}
+    sequences = 0
+
+    for round_i in range(num_per_db):
+        for db, db_pools in pools.items():
+            # Try the round's stratum first, then the next ones
+            for offset in range(len(db_pools)):
+                positions, ipr_ids, counts, tree = db_pools[(len(samples_per_db[db]) + offset) % len(db_pools)]
+                index = None
+                while tree.total:
+                    index = tree.pick(rng)
+                    tree.remove(index)
+                    if not sequence_budget or sequences + counts[index] <= sequence_budget:
+                        break
+                    index = None
+                if index is not None:
+                    break
+            if index is None:
+                continue
+
+            ipr = ipr_ids[index]
+            samples_per_db[db].append(positions[index])
+            sequences += counts[index]
+            for removed_ipr in exclude_relatives(ipr, tree_nodes, excluded, logfile):
+                for row_db, stratum, row_index in ipr_rows.pop(removed_ipr, ()):
+                    pools[row_db][stratum][3].remove(row_index)
+
+    return [position for positions in samples_per_db.values() for position in positions]
 
 
 def main():
@@ -132,17 +338,43 @@ def main():
     parser.add_argument("--num_per_db", type=int, default=50)
     parser.add_argument("--logfile", required=True)
     parser.add_argument("--output", required=True)
+    parser.add_argument("--mode", choices=["serial", "parallel", "weighted"], default="serial", help="serial: filter each db's remaining families for every pick; parallel: shuffle the per-db pools in worker processes and only run the cross-db exclusion serially; weighted: pick from Fenwick trees with --weighting, --strata and --sequence_budget (default: serial)")
+    parser.add_argument("--weighting", choices=["uniform", "size"], default="uniform", help="--mode weighted: pick families uniformly or in proportion to protein_count (default: uniform)")
+    parser.add_argument("--strata", type=int, default=1, help="--mode weighted: number of protein_count bins the picks rotate through (default: 1)")
+    parser.add_argument("--sequence_budget", type=int, default=0, help="--mode weighted: maximum summed protein_count of the sample, 0 for no limit (default: 0)")
+    parser.add_argument("--threads", type=int, default=1, help="Worker processes for --mode parallel (default: 1)")
+    parser.add_argument("--seed", type=int, default=None, help="Optional random seed, for reproducible samples")
+    parser.add_argument("--chunk_size", type=int, default=LOAD_CHUNK_SIZE, help=f"Rows read per chunk of the InterPro TSV, 0 to read it at once with --csv_engine (default: {LOAD_CHUNK_SIZE})")
+    add_table_args(parser)
+    add_timing_args(parser)
     args = parser.parse_args()
 
-    df = pd.read_csv(args.interpro_file, sep="\t")
-    df = filter_by_minimum_membership(df, args.min_membership)
+    with StageTimer.from_args(args) as timer:
+        with timer.stage("load"):
+            df = load_candidates(args.interpro_file, args.min_membership, args.chunk_size, args.csv_engine)
+
+            tree_text = Path(args.tree_file).read_text()
+            _, nodes = build_tree_from_text(tree_text)
 
-    tree_text = Path(args.tree_file).read_text()
-    _, nodes = build_tree_from_text(tree_text)
+        with timer.stage("sample"):
+            Path(args.logfile).write_text("")  # Clear logfile
+            if args.mode == "parallel":
+                pools = prepare_pools(df, args.threads, args.seed)
+                positions = sample_pools(pools, nodes, args.num_per_db, args.logfile)
+            elif args.mode == "weighted":
+                import numpy as np
+                positions = sample_weighted(
+                    df, nodes, args.num_per_db, args.logfile, args.weighting, args.strata, args.sequence_budget,
+                    np.random.default_rng(args.seed)
+                )
+            else:
+                import numpy as np
+                positions = sample_entries(df, nodes, args.num_per_db, args.logfile, np.random.default_rng(args.seed))
+        print(f"Sampled {len(positions)} families with {df.loc[positions, 'protein_count'].sum()} sequences in total")
 
-    Path(args.logfile).write_text("")  # Clear logfile
-    sampled = sample_entries(df, nodes, args.num_per_db, args.logfile)
-    sampled.to_csv(args.output, index=False)
+        with timer.stage("write"):
+            sampled = load_rows(args.interpro_file, positions, args.chunk_size, args.csv_engine)
+            write_table(sampled, args.output, "sampled_metadata", args.parquet)
 
 
 if __name__ == "__main__":
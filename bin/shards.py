@@ -0,0 +1,45 @@
+"""Shard selection and ordering shared by the scatter-gather stages.
+
+A stage run as N tasks takes --shard i/N and processes the i-th contiguous
+block of its sorted work list. Its outputs carry shard_<i>_of_<N> in their
+names, so the gather step can put them back in single-run order.
+"""
+
+import argparse
+import re
+
+SHARD_PATTERN = re.compile(r"shard_(\d+)_of_(\d+)")
+
+
+def parse_shard(value):
+    """Parse a 1-based 'i/N' shard spec."""
+    try:
+        index, count = (int(x) for x in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Shard must look like i/N, got '{value}'")
+    if count < 1 or not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"Shard index must be within 1..N, got '{value}'")
+    return index, count
+
+
+def select_shard(items, shard_index, shard_count):
+    """Contiguous block of the sorted item list, so concatenating shards 1..N restores the full order."""
+    start = len(items) * (shard_index - 1) // shard_count
+    end = len(items) * shard_index // shard_count
+    return items[start:end]
+
+
+def shard_key(path):
+    match = SHARD_PATTERN.search(path)
+    if not match:
+        raise ValueError(f"Cannot find shard_<i>_of_<N> in file name: {path}")
+    return int(match.group(1)), int(match.group(2))
+
+
+def order_shards(paths):
+    """Return paths in shard order, checking that shards 1..N are each present exactly once."""
+    keys = [shard_key(path) for path in paths]
+    shard_count = keys[0][1]
+    if sorted(index for index, _ in keys) != list(range(1, shard_count + 1)) or any(count != shard_count for _, count in keys):
+        raise ValueError(f"Expected shards 1..{shard_count}, got {sorted(keys)}")
+    return [path for _, path in sorted(zip(keys, paths))]
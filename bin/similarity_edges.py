@@ -0,0 +1,120 @@
+"""Compact binary Jaccard edge list shared by the similarity stage and its consumers.
+
+The edge list keeps every use-case/original pair scoring at or above a low floor,
+so downstream stages can apply any threshold without re-running the Jaccard stage.
+Scores are stored unrounded, so a threshold keeps exactly the pairs the TSV output does.
+"""
+
+import numpy as np
+
+DB_LAYERS = ["hamap", "ncbifam", "panther", "pfam"]
+
+
+def write_edges(path, floor, use_case_names, original_names, edges, shard_index=1, shard_count=1):
+    """Write (use_case_idx, original_idx, db_layer, score) edges to an .npz file."""
+    db_index = {db: i for i, db in enumerate(DB_LAYERS)}
+    use_case_idx = np.fromiter((e[0] for e in edges), dtype=np.uint32, count=len(edges))
+    original_idx = np.fromiter((e[1] for e in edges), dtype=np.uint32, count=len(edges))
+    db_idx = np.fromiter((db_index[e[2]] for e in edges), dtype=np.uint8, count=len(edges))
+    scores = np.fromiter((e[3] for e in edges), dtype=np.float64, count=len(edges))
+    with open(path, "wb") as f:
+        np.savez_compressed(
+            f,
+            floor=np.float64(floor),
+            shard_index=np.uint32(shard_index),
+            shard_count=np.uint32(shard_count),
+            use_case_names=np.array(use_case_names, dtype=str),
+            original_names=np.array(original_names, dtype=str),
+            db_layers=np.array(DB_LAYERS, dtype=str),
+            use_case_idx=use_case_idx,
+            original_idx=original_idx,
+            db_idx=db_idx,
+            score=scores,
+        )
+
+
+def load_edges(path):
+    """Load an edge list written by write_edges, sorted by ascending score."""
+    with np.load(path, allow_pickle=False) as data:
+        order = np.argsort(data["score"], kind="stable")
+        return {
+            "floor": float(data["floor"]),
+            "use_case": data["use_case_names"][data["use_case_idx"][order]],
+            "original": data["original_names"][data["original_idx"][order]],
+            "db_layer": data["db_layers"][data["db_idx"][order]],
+            "score": data["score"][order],
+        }
+
+
+def load_tsv_edges(path):
+    """Load the TSV similarity results into the same sorted layout as load_edges."""
+    from tables import read_table
+    # Names are read as written, so a family called e.g. NA is not taken for a missing value
+    df = read_table(path, "similarity_results", ["use_case_basename", "original_basename", "similarity_score", "db_layer"], text=True)
+    score = df["similarity_score"].to_numpy(dtype=np.float64)
+    order = np.argsort(score, kind="stable")
+    return {
+        "floor": 0.0,
+        "use_case": df["use_case_basename"].to_numpy(dtype=str)[order],
+        "original": df["original_basename"].to_numpy(dtype=str)[order],
+        "db_layer": df["db_layer"].to_numpy(dtype=str)[order],
+        "score": score[order],
+    }
+
+
+def merge_edge_files(paths, output_path):
+    """Concatenate shard edge lists in shard order, offsetting the use-case indices."""
+    shards = []
+    for path in paths:
+        with np.load(path, allow_pickle=False) as data:
+            shards.append({key: data[key] for key in data.files})
+    shards.sort(key=lambda shard: int(shard["shard_index"]))
+
+    first = shards[0]
+    shard_count = int(first["shard_count"])
+    if [int(shard["shard_index"]) for shard in shards] != list(range(1, shard_count + 1)):
+        raise ValueError(f"Expected shards 1..{shard_count}, got {[int(shard['shard_index']) for shard in shards]}")
+    for shard in shards[1:]:
+        if shard["floor"] != first["floor"] or not np.array_equal(shard["original_names"], first["original_names"]):
+            raise ValueError("Shard edge lists were computed with different floors or original families")
+
+    offsets = np.cumsum([0] + [len(shard["use_case_names"]) for shard in shards[:-1]])
+    with open(output_path, "wb") as f:
+        np.savez_compressed(
+            f,
+            floor=first["floor"],
+            shard_index=np.uint32(1),
+            shard_count=np.uint32(1),
+            use_case_names=np.concatenate([shard["use_case_names"] for shard in shards]),
+            original_names=first["original_names"],
+            db_layers=first["db_layers"],
+            use_case_idx=np.concatenate([shard["use_case_idx"] + np.uint32(offset) for shard, offset in zip(shards, offsets)]),
+            original_idx=np.concatenate([shard["original_idx"] for shard in shards]),
+            db_idx=np.concatenate([shard["db_idx"] for shard in shards]),
+            score=np.concatenate([shard["score"] for shard in shards]),
+        )
+    return sum(len(shard["score"]) for shard in shards)
+
+
+def read_similarity_results(path):
+    """Load similarity results from either the .npz edge list or the TSV output."""
+    if str(path).endswith(".npz"):
+        return load_edges(path)
+    return load_tsv_edges(path)
+
+
+def first_at_or_above(edges, threshold=None):
+    """Index of the first edge scoring at or above threshold (edges are sorted by score).
+
+    A threshold of None keeps every edge in the file.
+    """
+    if threshold is None:
+        return 0
+    if threshold < edges["floor"]:
+        raise ValueError(f"Threshold {threshold} is below the edge list floor {edges['floor']}")
+    return int(np.searchsorted(edges["score"], threshold, side="left"))
+
+
+def counts_at_or_above(scores, thresholds):
+    """Cumulative counts of sorted scores at or above each threshold."""
+    return len(scores) - np.searchsorted(scores, thresholds, side="left")
@@ -0,0 +1,79 @@
+"""Per-stage timing and memory records for the bin/ scripts.
+
+Every script wraps its phases in StageTimer.stage() and writes the records to
+<script>.timings.json, so runs of the same process can be compared. --profile
+additionally dumps a cProfile/pstats file of the whole run.
+"""
+
+import json
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+
+def add_timing_args(parser):
+    parser.add_argument("--timings", default=None, help="Stage timings JSON file (default: <script>.timings.json)")
+    parser.add_argument("--profile", default=None, help="Optional cProfile/pstats dump of the whole run")
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    return resource.getrusage(who).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+class StageTimer:
+    """Record wall time, CPU time and peak RSS per named stage; use as a context manager around main()."""
+
+    def __init__(self, timings_path=None, profile_path=None):
+        self.script = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+        self.timings_path = timings_path or f"{self.script}.timings.json"
+        self.profile_path = profile_path
+        self.stages = []
+        self._profiler = None
+
+    @classmethod
+    def from_args(cls, args):
+        return cls(args.timings, args.profile)
+
+    def __enter__(self):
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+        if self.profile_path:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return self
+
+    @contextmanager
+    def stage(self, name):
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield
+        finally:
+            self.stages.append({
+                "stage": name,
+                "wall_seconds": round(time.perf_counter() - start_wall, 4),
+                "cpu_seconds": round(time.process_time() - start_cpu, 4),
+                "peak_rss_mb": round(peak_rss_mb(), 1),
+            })
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.profile_path)
+        record = {
+            "script": self.script,
+            "argv": sys.argv[1:],
+            "status": "ok" if exc_type is None else f"failed: {exc_type.__name__}",
+            "wall_seconds": round(time.perf_counter() - self._start_wall, 4),
+            "cpu_seconds": round(time.process_time() - self._start_cpu, 4),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "children_peak_rss_mb": round(peak_rss_mb(resource.RUSAGE_CHILDREN), 1),
+            "stages": self.stages,
+        }
+        with open(self.timings_path, "w") as f:
+            json.dump(record, f, indent=2)
+        return False
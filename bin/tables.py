@@ -0,0 +1,127 @@
+"""Schemas of the tabular intermediates, with one typed, column-projected loader.
+
+Each table declares its separator and the pandas dtype of every column, so a
+script names only the columns it uses and gets integer and categorical
+columns instead of object ones. write_table can also write a Parquet twin
+(<stem>.parquet) next to a table. read_table reads that twin instead of the
+text whenever it is at least as new, or reads a .parquet path given
+directly, which reloads far faster than parsing text. Parquet and the
+pyarrow CSV engine need pyarrow, which like pandas is only imported on
+first use.
+"""
+
+import os
+
+TABLES = {
+    # EXTRACT_CANDIDATE_INTERPRO_FAMILIES and FILTER_VALID_CANDIDATE_FAMILIES
+    "candidate_families": {
+        "sep": "\t",
+        "dtypes": {"interpro_id": str, "protein_count": "int64", "short_name": str, "db": "category", "dbkey": str, "name": str},
+    },
+    # EXTRACT_{HAMAP,NCBIFAM,PANTHER,PFAM}_METADATA
+    "member_metadata": {
+        "sep": "\t",
+        "dtypes": {"id": str, "num_proteins": "int64"},
+    },
+    # SAMPLE_INTERPRO
+    "sampled_metadata": {
+        "sep": ",",
+        "dtypes": {"interpro_id": str, "protein_count": "int64", "short_name": str, "db": "category", "dbkey": str, "name": str},
+    },
+    # CALCULATE_JACCARD_SIMILARITY and MERGE_JACCARD_SHARDS text output
+    "similarity_results": {
+        "sep": "\t",
+        "dtypes": {"use_case_basename": str, "original_basename": str, "similarity_score": "float64", "use_case_layer": "category", "db_layer": "category"},
+    },
+}
+
+
+def add_table_args(parser):
+    parser.add_argument("--csv_engine", choices=["c", "pyarrow"], default="c", help="pandas CSV parser for unchunked reads; pyarrow is multithreaded but needs pyarrow installed (default: c)")
+    parser.add_argument("--parquet", action="store_true", help="Also write each output table as a Parquet twin (<stem>.parquet), needs pyarrow")
+
+
+def parquet_twin(path):
+    return os.path.splitext(str(path))[0] + ".parquet"
+
+
+def _parquet_source(path):
+    """The Parquet file to read for path, if it is one or has an up-to-date twin."""
+    path = str(path)
+    if path.endswith(".parquet"):
+        return path
+    twin = parquet_twin(path)
+    if os.path.isfile(twin) and os.stat(twin).st_mtime_ns >= os.stat(path).st_mtime_ns:
+        return twin
+    return None
+
+
+def table_dtypes(table, columns=None, text=False, dtypes=None):
+    """dtype of each requested column; text reads every column as str, exactly as written."""
+    schema = TABLES[table]["dtypes"]
+    columns = list(schema) if columns is None else list(columns)
+    if text:
+        return {column: str for column in columns}
+    return {column: (dtypes or {}).get(column, schema[column]) for column in columns}
+
+
+def _as_text(df):
+    # Missing values become empty strings, as they were in the text table
+    return df.astype(object).where(df.notna(), "").astype(str)
+
+
+def iter_table(path, table, columns=None, chunksize=100000, text=False, dtypes=None):
+    """Yield the table in chunks whose index holds each row's position in the file.
+
+    A Parquet source is read in one go, as its columns load without parsing.
+    Categorical columns are set per chunk, so concatenated chunks fall back to object.
+    """
+    import pandas as pd
+    column_dtypes = table_dtypes(table, columns, text, dtypes)
+    parquet = _parquet_source(path)
+    if parquet is not None:
+        df = pd.read_parquet(parquet, columns=list(column_dtypes))
+        # Text columns are left alone, as astype(str) would turn missing values into "nan"
+        yield _as_text(df) if text else df.astype({column: dtype for column, dtype in column_dtypes.items() if dtype is not str})
+        return
+    yield from pd.read_csv(
+        path, sep=TABLES[table]["sep"], usecols=list(column_dtypes), dtype=column_dtypes,
+        keep_default_na=not text, chunksize=chunksize
+    )
+
+
+def read_table(path, table, columns=None, engine="c", chunksize=None, chunk_filter=None, text=False, dtypes=None):
+    """Read the requested columns of a table with their schema dtypes.
+
+    With chunksize, chunk_filter is applied to every chunk as it is read, so rows it
+    drops are never held all at once; the index keeps each row's position in the file.
+    """
+    import pandas as pd
+    column_dtypes = table_dtypes(table, columns, text, dtypes)
+    if chunksize is None and _parquet_source(path) is None:
+        df = pd.read_csv(
+            path, sep=TABLES[table]["sep"], usecols=list(column_dtypes), dtype=column_dtypes,
+            keep_default_na=not text, engine=engine
+        )
+        # usecols keeps the file's column order; return them in the order asked for
+        df = df[list(column_dtypes)]
+        return chunk_filter(df) if chunk_filter else df
+
+    chunks = [
+        chunk_filter(chunk) if chunk_filter else chunk
+        for chunk in iter_table(path, table, list(column_dtypes), chunksize or 100000, text, dtypes)
+    ]
+    if not chunks:
+        return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in column_dtypes.items()})
+    df = pd.concat(chunks)[list(column_dtypes)]
+    # Categories are set after the concat, as chunks with different categories would fall back to object
+    return df.astype({column: dtype for column, dtype in column_dtypes.items() if dtype == "category"})
+
+
+def write_table(df, path, table, parquet=False):
+    """Write a table as text, and as a typed Parquet twin when asked."""
+    df.to_csv(path, sep=TABLES[table]["sep"], index=False)
+    if parquet:
+        schema = TABLES[table]["dtypes"]
+        typed = df.astype({column: dtype for column, dtype in schema.items() if column in df.columns})
+        typed.to_parquet(parquet_twin(path), index=False)
@@ -7,22 +7,30 @@ workflow NFCORE_PROTEINFAMILIES_USE_CASE {
     workflow_mode // channel: samplesheet read in from --input
 
     main:
+    // Checkpoints live under the session ID, which a -resume'd run keeps, so retried tasks find them
+    def checkpoint_dir = params.checkpoint_dir ? "${params.checkpoint_dir}/${workflow.sessionId}" : ''
+    // The parse cache is shared by every run, so unlike checkpoints it is not kept per session
+    def parse_cache = params.parse_cache_dir ? "--cache_dir ${params.parse_cache_dir} --cache_max_mb ${params.parse_cache_max_mb}" : ''
+
     //
     // WORKFLOW: Run pre pipeline
     //
     if (workflow_mode == "pre") {
         PRE( params.interpo_hierarchy_file, params.id_mapping_file, \
             params.path_to_hamap, params.path_to_ncbifam, params.path_to_panther, params.path_to_pfam, \
-            params.path_to_swissprot, params.min_membership, params.num_per_db, params.num_decoys
+            params.path_to_swissprot, params.min_membership, params.num_per_db, \
+            params.sampling_mode, params.sampling_weighting, params.sampling_strata, params.sequence_budget, \
+            params.num_decoys, params.bgzip_fasta, params.family_chunk_size, checkpoint_dir
         )
     }
     //
     // WORKFLOW: Run post pipeline
     //
     else if (workflow_mode == "post") {
-        POST( params.path_to_alignments, params.path_to_db_fasta, params.path_to_decoys, \
+        POST( params.path_to_alignments, params.path_to_db_fasta, params.path_to_decoys, params.path_to_accession_index, \
             params.path_to_sampled_metadata, params.path_to_sampled_fasta_folder, params.jaccard_similarity_threshold, \
-            params.path_to_mmseqs_tsv, params.path_to_generated_fasta
+            params.jaccard_edge_floor, params.jaccard_shards, params.path_to_mmseqs_tsv, params.path_to_generated_fasta, \
+            params.post_engine, params.family_chunk_size, checkpoint_dir, parse_cache
         )
     }
 }
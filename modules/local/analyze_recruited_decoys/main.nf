@@ -1,5 +1,5 @@
 process ANALYZE_RECRUITED_DECOYS {
-    label 'process_single'
+    label 'process_medium'
 
     conda "${moduleDir}/environment.yml"
     container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
@@ -11,8 +11,10 @@ process ANALYZE_RECRUITED_DECOYS {
     path decoy_fasta
 
     output:
-    path "decoy_stats.csv", emit: stats
-    path "versions.yml"   , emit: versions
+    path "decoy_stats.csv"  , emit: stats
+    path "decoy_details.tsv", emit: details
+    path "*.timings.json"   , emit: timings
+    path "versions.yml"     , emit: versions
 
     when:
     task.ext.when == null || task.ext.when
@@ -22,7 +24,9 @@ process ANALYZE_RECRUITED_DECOYS {
     analyze_recruited_decoys.py \\
         --msa_folder ${aln_folder} \\
         --decoy_fasta ${decoy_fasta} \\
-        --output_csv decoy_stats.csv
+        --output_csv decoy_stats.csv \\
+        --decoy_details decoy_details.tsv \\
+        --threads ${task.cpus}
 
     cat <<-END_VERSIONS > versions.yml
     "${task.process}":
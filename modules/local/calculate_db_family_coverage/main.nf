@@ -3,16 +3,18 @@ process CALCULATE_DB_FAMILY_COVERAGE {
 
     conda "${moduleDir}/environment.yml"
     container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
-        'https://community-cr-prod.seqera.io/docker/registry/v2/blobs/sha256/31/313e1c18a344323886cf97a151ab66d81c1a146fb129558cb9382b69a72d5532/data' :
-        'community.wave.seqera.io/library/python:b1b4b1f458c605bb' }"
+        'https://community-cr-prod.seqera.io/docker/registry/v2/blobs/sha256/eb/eb3700531c7ec639f59f084ab64c05e881d654dcf829db163539f2f0b095e09d/data' :
+        'community.wave.seqera.io/library/biopython:1.84--3318633dad0031e7' }"
 
     input:
     path jaccard_scores
-    path fasta_folder
+    val similarity_threshold
 
     output:
-    path "family_coverage.csv", emit: coverage
-    path "versions.yml"       , emit: versions
+    path "family_coverage.csv"      , emit: coverage
+    path "family_coverage_curve.csv", emit: curve
+    path "*.timings.json"           , emit: timings
+    path "versions.yml"             , emit: versions
 
     when:
     task.ext.when == null || task.ext.when
@@ -21,12 +23,14 @@ process CALCULATE_DB_FAMILY_COVERAGE {
     """
     calculate_db_family_coverage.py \\
         --similarity_results ${jaccard_scores} \\
-        --original_families_dir ${fasta_folder} \\
-        --output_file family_coverage.csv
+        --similarity_threshold ${similarity_threshold} \\
+        --output_file family_coverage.csv \\
+        --curve_file family_coverage_curve.csv
 
     cat <<-END_VERSIONS > versions.yml
     "${task.process}":
         python: \$(python --version 2>&1 | sed 's/Python //g')
+        numpy: \$(python -c "import importlib.metadata; print(importlib.metadata.version('numpy'))")
     END_VERSIONS
     """
 }
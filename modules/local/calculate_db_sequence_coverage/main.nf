@@ -1,5 +1,5 @@
 process CALCULATE_DB_SEQUENCE_COVERAGE {
-    label 'process_single'
+    label 'process_medium'
 
     conda "${moduleDir}/environment.yml"
     container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
@@ -10,9 +10,11 @@ process CALCULATE_DB_SEQUENCE_COVERAGE {
     path metadata
     path original_counts
     path msa_root
+    val parse_cache
 
     output:
     path "sequence_coverage.txt", emit: coverage
+    path "*.timings.json"       , emit: timings
     path "versions.yml"         , emit: versions
 
     when:
@@ -24,7 +26,9 @@ process CALCULATE_DB_SEQUENCE_COVERAGE {
         --metadata ${metadata} \\
         --original_counts ${original_counts} \\
         --msa_root ${msa_root} \\
-        --output sequence_coverage.txt
+        --output sequence_coverage.txt \\
+        --threads ${task.cpus} \\
+        ${parse_cache}
 
     cat <<-END_VERSIONS > versions.yml
     "${task.process}":
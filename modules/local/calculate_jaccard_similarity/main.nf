@@ -1,5 +1,5 @@
 process CALCULATE_JACCARD_SIMILARITY {
-    label 'process_single'
+    label 'process_medium'
 
     conda "${moduleDir}/environment.yml"
     container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
@@ -7,24 +7,41 @@ process CALCULATE_JACCARD_SIMILARITY {
         'community.wave.seqera.io/library/biopython:1.84--3318633dad0031e7' }"
 
     input:
-    path aln_folder
-    path original_folder
+    tuple path(aln_folder), path(original_folder), val(shard)
     val similarity_threshold
+    val edge_floor
+    val num_shards
+    val checkpoint_dir
+    val parse_cache
 
     output:
-    path "jaccard_similarities.csv", emit: edgelist
-    path "versions.yml"            , emit: versions
+    path "jaccard_similarities*.csv", emit: edgelist
+    path "jaccard_edges*.npz"       , emit: edges
+    path "*.timings.json"           , emit: timings
+    path "versions.yml"             , emit: versions
 
     when:
     task.ext.when == null || task.ext.when
 
     script:
+    def args = task.ext.args ?: ''
+    // A single shard keeps the un-suffixed names and is not merged
+    def suffix = num_shards > 1 ? ".shard_${shard}_of_${num_shards}" : ''
+    def checkpoint = checkpoint_dir ? "--checkpoint ${checkpoint_dir}/calculate_jaccard_similarity${suffix}.checkpoint.jsonl --resume" : ''
     """
     calculate_jaccard_similarity.py \\
         --use_case_dir ${aln_folder} \\
         --original_base_dir ${original_folder} \\
-        --output_file jaccard_similarities.csv \\
-        --similarity_threshold ${similarity_threshold}
+        --output_file jaccard_similarities${suffix}.csv \\
+        --similarity_threshold ${similarity_threshold} \\
+        --edges_file jaccard_edges${suffix}.npz \\
+        --edge_floor ${edge_floor} \\
+        --shard ${shard}/${num_shards} \\
+        --workers ${task.cpus} \\
+        --timings calculate_jaccard_similarity${suffix}.timings.json \\
+        ${checkpoint} \\
+        ${parse_cache} \\
+        ${args}
 
     cat <<-END_VERSIONS > versions.yml
     "${task.process}":
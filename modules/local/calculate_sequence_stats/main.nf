@@ -1,5 +1,5 @@
 process CALCULATE_SEQUENCE_STATS {
-    label 'process_single'
+    label 'process_medium'
 
     conda "${moduleDir}/environment.yml"
     container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
@@ -10,25 +10,30 @@ process CALCULATE_SEQUENCE_STATS {
     path alignments
     path db_fasta
     path decoys
+    path accession_index
     val type
+    val parse_cache
 
     output:
     path "${type}_decoy_counts.txt"     , emit: decoy_count
     path "${type}_original_counts.txt"  , emit: original_count
     path "${type}_summary.txt"          , emit: summary
     path "${type}_unknown_sequences.txt", emit: unknown
+    path "*.timings.json"               , emit: timings
     path "versions.yml"                 , emit: versions
 
     when:
     task.ext.when == null || task.ext.when
 
     script:
+    def names = accession_index ? "--accession_index ${accession_index}" : "--original_fasta ${db_fasta} --decoy_fasta ${decoys}"
     """
     calculate_sequence_stats.py \\
-        --original_fasta ${db_fasta} \\
-        --decoy_fasta ${decoys} \\
+        ${names} \\
         --alignment_folder ${alignments} \\
-        --alignment_type ${type}
+        --alignment_type ${type} \\
+        --threads ${task.cpus} \\
+        ${parse_cache}
 
     cat <<-END_VERSIONS > versions.yml
     "${task.process}":
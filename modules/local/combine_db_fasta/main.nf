@@ -8,11 +8,14 @@ process COMBINE_DB_FASTA {
 
     input:
     path fasta_folder
+    val bgzip
 
     output:
-    path "log.txt"          , emit: log
-    path "combined_db.fasta", emit: fasta
-    path "versions.yml"     , emit: versions
+    path "log.txt"                                , emit: log
+    path "combined_db.fasta${bgzip ? '.gz' : ''}" , emit: fasta
+    path "combined_db.fasta.gz.{fai,gzi}"         , emit: index, optional: true
+    path "*.timings.json"                         , emit: timings
+    path "versions.yml"                           , emit: versions
 
     when:
     task.ext.when == null || task.ext.when
@@ -21,7 +24,7 @@ process COMBINE_DB_FASTA {
     """
     combine_db_fasta.py \\
         --input_folder ${fasta_folder} \\
-        --output_file combined_db.fasta
+        --output_file combined_db.fasta${bgzip ? '.gz' : ''}
 
     cat <<-END_VERSIONS > versions.yml
     "${task.process}":
@@ -9,11 +9,16 @@ process COMBINE_DECOY_FASTA {
     input:
     path db_fasta
     path decoy
+    path fasta_folder
+    val bgzip
 
     output:
-    path "combined_decoy_log.txt", emit: log
-    path "combined_decoy.fasta"  , emit: fasta
-    path "versions.yml"          , emit: versions
+    path "combined_decoy_log.txt"                    , emit: log
+    path "combined_decoy.fasta${bgzip ? '.gz' : ''}" , emit: fasta
+    path "combined_decoy.fasta.gz.{fai,gzi}"         , emit: index, optional: true
+    path "accession_index"                           , emit: accession_index
+    path "*.timings.json"                            , emit: timings
+    path "versions.yml"                              , emit: versions
 
     when:
     task.ext.when == null || task.ext.when
@@ -23,13 +28,16 @@ process COMBINE_DECOY_FASTA {
     combine_decoy_fasta.py \\
         --families_fasta ${db_fasta} \\
         --decoys_fasta ${decoy} \\
-        --combined_fasta combined_decoy.fasta \\
-        --log_file combined_decoy_log.txt
+        --combined_fasta combined_decoy.fasta${bgzip ? '.gz' : ''} \\
+        --log_file combined_decoy_log.txt \\
+        --accession_index accession_index \\
+        --families_folder ${fasta_folder}
 
     cat <<-END_VERSIONS > versions.yml
     "${task.process}":
         python: \$(python --version 2>&1 | sed 's/Python //g')
         biopython: \$(python -c "import importlib.metadata; print(importlib.metadata.version('biopython'))")
+        numpy: \$(python -c "import importlib.metadata; print(importlib.metadata.version('numpy'))")
     END_VERSIONS
     """
 }
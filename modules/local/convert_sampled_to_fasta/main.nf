@@ -7,21 +7,28 @@ process CONVERT_SAMPLED_TO_FASTA {
         'community.wave.seqera.io/library/biopython:1.84--3318633dad0031e7' }"
 
     input:
-    path sampled_metadata
+    tuple path(sampled_metadata), val(shard), val(num_shards)
     path hamap
     path ncbifam
     path panther
     path pfam
+    val bgzip
+    val checkpoint_dir
 
     output:
-    path "sampled_fasta"               , emit: fasta_folder
-    path "updated_sampled_metadata.csv", emit: metadata
-    path "versions.yml"                , emit: versions
+    path "sampled_fasta*"               , emit: fasta_folder
+    path "updated_sampled_metadata*.csv", emit: metadata
+    path "*.timings.json"               , emit: timings
+    path "versions.yml"                 , emit: versions
 
     when:
     task.ext.when == null || task.ext.when
 
     script:
+    def bgzip_arg = bgzip ? '--bgzip' : ''
+    // A single chunk keeps the un-suffixed names and is not gathered
+    def suffix = num_shards > 1 ? ".shard_${shard}_of_${num_shards}" : ''
+    def checkpoint = checkpoint_dir ? "--checkpoint ${checkpoint_dir}/convert_sampled_to_fasta${suffix}.checkpoint.jsonl --resume" : ''
     """
     convert_sampled_to_fasta.py \\
         --metadata_file ${sampled_metadata} \\
@@ -29,13 +36,18 @@ process CONVERT_SAMPLED_TO_FASTA {
         --ncbifam ${ncbifam} \\
         --panther ${panther} \\
         --pfam ${pfam} \\
-        --output_folder sampled_fasta \\
-        --updated_metadata_file updated_sampled_metadata.csv
+        --output_folder sampled_fasta${suffix} \\
+        --updated_metadata_file updated_sampled_metadata${suffix}.csv \\
+        --shard ${shard}/${num_shards} \\
+        ${bgzip_arg} \\
+        --timings convert_sampled_to_fasta${suffix}.timings.json \\
+        ${checkpoint}
 
     cat <<-END_VERSIONS > versions.yml
     "${task.process}":
         python: \$(python --version 2>&1 | sed 's/Python //g')
         biopython: \$(python -c "import importlib.metadata; print(importlib.metadata.version('biopython'))")
+        numpy: \$(python -c "import importlib.metadata; print(importlib.metadata.version('numpy'))")
     END_VERSIONS
     """
 }
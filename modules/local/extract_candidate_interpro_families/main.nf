@@ -12,6 +12,7 @@ process EXTRACT_CANDIDATE_INTERPRO_FAMILIES {
 
     output:
     path "intepro_families.tsv", emit: metadata
+    path "*.timings.json"      , emit: timings
     path "versions.yml"        , emit: versions
 
     when:
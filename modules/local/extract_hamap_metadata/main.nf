@@ -11,6 +11,7 @@ process EXTRACT_HAMAP_METADATA {
 
     output:
     path "hamap_metadata.tsv", emit: metadata
+    path "*.timings.json"    , emit: timings
     path "versions.yml"      , emit: versions
 
     when:
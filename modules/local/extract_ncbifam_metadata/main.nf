@@ -11,6 +11,7 @@ process EXTRACT_NCBIFAM_METADATA {
 
     output:
     path "ncbifam_metadata.tsv", emit: metadata
+    path "*.timings.json"    , emit: timings
     path "versions.yml"      , emit: versions
 
     when:
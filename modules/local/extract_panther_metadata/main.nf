@@ -11,6 +11,7 @@ process EXTRACT_PANTHER_METADATA {
 
     output:
     path "panther_metadata.tsv", emit: metadata
+    path "*.timings.json"      , emit: timings
     path "versions.yml"        , emit: versions
 
     when:
@@ -11,6 +11,7 @@ process EXTRACT_PFAM_METADATA {
 
     output:
     path "pfam_metadata.tsv", emit: metadata
+    path "*.timings.json"   , emit: timings
     path "versions.yml"     , emit: versions
 
     when:
@@ -15,6 +15,7 @@ process FILTER_VALID_CANDIDATE_FAMILIES {
 
     output:
     path "filtered_metadata.tsv", emit: metadata
+    path "*.timings.json"       , emit: timings
     path "versions.yml"         , emit: versions
 
     when:
@@ -0,0 +1,40 @@
+process GATHER_MATCHED_ORIGINALS {
+    label 'process_single'
+
+    conda "${moduleDir}/environment.yml"
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://community-cr-prod.seqera.io/docker/registry/v2/blobs/sha256/eb/eb3700531c7ec639f59f084ab64c05e881d654dcf829db163539f2f0b095e09d/data' :
+        'community.wave.seqera.io/library/biopython:1.84--3318633dad0031e7' }"
+
+    input:
+    path metadata_chunks
+    path cluster_chunks
+    path match_chunks
+
+    output:
+    path "metadata.csv"    , emit: metadat
+    path "all_clusters.txt", emit: clusters
+    path "all_matches.txt" , emit: matches
+    path "*.timings.json"  , emit: timings
+    path "versions.yml"    , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    """
+    gather_family_chunks.py \\
+        --csv_files ${metadata_chunks} \\
+        --output_csv metadata.csv \\
+        --log_files ${cluster_chunks} \\
+        --output_log all_clusters.txt \\
+        --log_files ${match_chunks} \\
+        --output_log all_matches.txt \\
+        --timings gather_matched_originals.timings.json
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version 2>&1 | sed 's/Python //g')
+    END_VERSIONS
+    """
+}
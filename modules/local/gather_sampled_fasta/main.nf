@@ -0,0 +1,37 @@
+process GATHER_SAMPLED_FASTA {
+    label 'process_single'
+
+    conda "${moduleDir}/environment.yml"
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://community-cr-prod.seqera.io/docker/registry/v2/blobs/sha256/eb/eb3700531c7ec639f59f084ab64c05e881d654dcf829db163539f2f0b095e09d/data' :
+        'community.wave.seqera.io/library/biopython:1.84--3318633dad0031e7' }"
+
+    input:
+    path fasta_chunks
+    path metadata_chunks
+
+    output:
+    path "sampled_fasta"               , emit: fasta_folder
+    path "updated_sampled_metadata.csv", emit: metadata
+    path "*.timings.json"              , emit: timings
+    path "versions.yml"                , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    """
+    gather_family_chunks.py \\
+        --fasta_folders ${fasta_chunks} \\
+        --output_folder sampled_fasta \\
+        --csv_files ${metadata_chunks} \\
+        --output_csv updated_sampled_metadata.csv \\
+        --timings gather_sampled_fasta.timings.json
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version 2>&1 | sed 's/Python //g')
+        numpy: \$(python -c "import importlib.metadata; print(importlib.metadata.version('numpy'))")
+    END_VERSIONS
+    """
+}
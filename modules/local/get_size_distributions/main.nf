@@ -9,9 +9,11 @@ process GET_SIZE_DISTRIBUTIONS {
     input:
     path metadata_file
     path similarity_file
+    val similarity_threshold
 
     output:
     path "size_distributions.txt", emit: log
+    path "*.timings.json"        , emit: timings
     path "versions.yml"          , emit: versions
 
     when:
@@ -22,7 +24,10 @@ process GET_SIZE_DISTRIBUTIONS {
     get_size_distributions.py \\
         --metadata_file ${metadata_file} \\
         --similarity_file ${similarity_file} \\
-        --output_file size_distributions.txt
+        --similarity_threshold ${similarity_threshold} \\
+        --output_file size_distributions.txt \\
+        --mode streaming \\
+        --skip_splits
 
     cat <<-END_VERSIONS > versions.yml
     "${task.process}":
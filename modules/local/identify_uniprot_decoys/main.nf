@@ -10,9 +10,12 @@ process IDENTIFY_UNIPROT_DECOYS {
     tuple val(meta) , path(hits)
     tuple val(meta2), path(sp_fasta)
     val num_decoys
+    val bgzip
 
     output:
-    path "decoys.fasta", emit: decoys
+    path "decoys.fasta${bgzip ? '.gz' : ''}", emit: decoys
+    path "decoys.fasta.gz.{fai,gzi}", emit: index, optional: true
+    path "*.timings.json", emit: timings
     path "versions.yml", emit: versions
 
     when:
@@ -23,7 +26,7 @@ process IDENTIFY_UNIPROT_DECOYS {
     identify_uniprot_decoys.py \\
         --hits_file ${hits} \\
         --fasta_file ${sp_fasta} \\
-        --output_file decoys.fasta \\
+        --output_file decoys.fasta${bgzip ? '.gz' : ''} \\
         --num_decoys ${num_decoys}
 
     cat <<-END_VERSIONS > versions.yml
@@ -1,5 +1,5 @@
 process INVESTIGATE_MATCHED_ORIGINALS {
-    label 'process_single'
+    label 'process_medium'
 
     conda "${moduleDir}/environment.yml"
     container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
@@ -7,30 +7,40 @@ process INVESTIGATE_MATCHED_ORIGINALS {
         'community.wave.seqera.io/library/biopython:1.84--3318633dad0031e7' }"
 
     input:
-    path sampled_fasta
+    tuple path(sampled_fasta), path(metadata), val(shard), val(num_shards)
     path clustering
-    path metadata
     path generated_fasta
+    val checkpoint_dir
+    val parse_cache
 
     output:
-    path "metadata.csv"    , emit: metadat
-    path "all_clusters.txt", emit: clusters
-    path "all_matches.txt" , emit: matches
-    path "versions.yml"    , emit: versions
+    path "metadata*.csv"    , emit: metadat
+    path "all_clusters*.txt", emit: clusters
+    path "all_matches*.txt" , emit: matches
+    path "*.timings.json"   , emit: timings
+    path "versions.yml"     , emit: versions
 
     when:
     task.ext.when == null || task.ext.when
 
     script:
+    // A single chunk keeps the un-suffixed names and is not gathered
+    def suffix = num_shards > 1 ? ".shard_${shard}_of_${num_shards}" : ''
+    def checkpoint = checkpoint_dir ? "--checkpoint ${checkpoint_dir}/investigate_matched_originals${suffix}.checkpoint.jsonl --resume" : ''
     """
     investigate_matched_originals.py \\
         --db_folder ${sampled_fasta} \\
         --cluster_file ${clustering} \\
         --metadata ${metadata} \\
         --generated_fasta ${generated_fasta} \\
-        --output metadata.csv \\
-        --cluster_log all_clusters.txt \\
-        --match_log all_matches.txt
+        --output metadata${suffix}.csv \\
+        --cluster_log all_clusters${suffix}.txt \\
+        --match_log all_matches${suffix}.txt \\
+        --shard ${shard}/${num_shards} \\
+        --threads ${task.cpus} \\
+        --timings investigate_matched_originals${suffix}.timings.json \\
+        ${checkpoint} \\
+        ${parse_cache}
 
     cat <<-END_VERSIONS > versions.yml
     "${task.process}":
@@ -0,0 +1,36 @@
+process MERGE_JACCARD_SHARDS {
+    label 'process_single'
+
+    conda "${moduleDir}/environment.yml"
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://community-cr-prod.seqera.io/docker/registry/v2/blobs/sha256/eb/eb3700531c7ec639f59f084ab64c05e881d654dcf829db163539f2f0b095e09d/data' :
+        'community.wave.seqera.io/library/biopython:1.84--3318633dad0031e7' }"
+
+    input:
+    path tsv_shards
+    path edge_shards
+
+    output:
+    path "jaccard_similarities.csv", emit: edgelist
+    path "jaccard_edges.npz"       , emit: edges
+    path "*.timings.json"          , emit: timings
+    path "versions.yml"            , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    """
+    merge_jaccard_shards.py \\
+        --tsv_files ${tsv_shards} \\
+        --edge_files ${edge_shards} \\
+        --output_file jaccard_similarities.csv \\
+        --edges_file jaccard_edges.npz
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version 2>&1 | sed 's/Python //g')
+        numpy: \$(python -c "import importlib.metadata; print(importlib.metadata.version('numpy'))")
+    END_VERSIONS
+    """
+}
@@ -0,0 +1,63 @@
+process POST_ENGINE {
+    label 'process_medium'
+
+    conda "${moduleDir}/environment.yml"
+    container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
+        'https://community-cr-prod.seqera.io/docker/registry/v2/blobs/sha256/eb/eb3700531c7ec639f59f084ab64c05e881d654dcf829db163539f2f0b095e09d/data' :
+        'community.wave.seqera.io/library/biopython:1.84--3318633dad0031e7' }"
+
+    input:
+    path alignments
+    path db_fasta
+    path decoys
+    path metadata
+    path sampled_fasta
+    path clustering
+    path generated_fasta
+    val similarity_threshold
+    val edge_floor
+    val parse_cache
+
+    output:
+    path "fas.gz_decoy_counts.txt"     , emit: decoy_count
+    path "fas.gz_original_counts.txt"  , emit: original_count
+    path "fas.gz_summary.txt"          , emit: summary
+    path "fas.gz_unknown_sequences.txt", emit: unknown
+    path "sequence_coverage.txt"       , emit: coverage
+    path "decoy_stats.csv"             , emit: decoy_stats
+    path "decoy_details.tsv"           , emit: decoy_details
+    path "jaccard_similarities.csv"    , emit: edgelist
+    path "jaccard_edges.npz"           , emit: edges
+    path "metadata.csv"                , emit: metadat
+    path "all_clusters.txt"            , emit: clusters
+    path "all_matches.txt"             , emit: matches
+    path "*.timings.json"              , emit: timings
+    path "versions.yml"                , emit: versions
+
+    when:
+    task.ext.when == null || task.ext.when
+
+    script:
+    """
+    post_engine.py \\
+        --alignment_folder ${alignments} \\
+        --alignment_type fas.gz \\
+        --original_fasta ${db_fasta} \\
+        --decoy_fasta ${decoys} \\
+        --metadata ${metadata} \\
+        --sampled_fasta ${sampled_fasta} \\
+        --cluster_file ${clustering} \\
+        --generated_fasta ${generated_fasta} \\
+        --similarity_threshold ${similarity_threshold} \\
+        --edge_floor ${edge_floor} \\
+        --threads ${task.cpus} \\
+        ${parse_cache}
+
+    cat <<-END_VERSIONS > versions.yml
+    "${task.process}":
+        python: \$(python --version 2>&1 | sed 's/Python //g')
+        biopython: \$(python -c "import importlib.metadata; print(importlib.metadata.version('biopython'))")
+        numpy: \$(python -c "import importlib.metadata; print(importlib.metadata.version('numpy'))")
+    END_VERSIONS
+    """
+}
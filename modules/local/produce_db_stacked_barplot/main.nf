@@ -11,6 +11,7 @@ process PRODUCE_DB_STACKED_BARPLOT {
 
     output:
     path "stacked_barplot.png", emit: barplot
+    path "*.timings.json"     , emit: timings
     path "versions.yml"       , emit: versions
 
     when:
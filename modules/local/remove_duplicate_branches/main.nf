@@ -11,6 +11,7 @@ process REMOVE_DUPLICATE_BRANCHES {
 
     output:
     path "parsed_hierarchy.txt", emit: hierarchy
+    path "*.timings.json"      , emit: timings
     path "versions.yml"        , emit: versions
 
     when:
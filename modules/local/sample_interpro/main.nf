@@ -1,5 +1,5 @@
 process SAMPLE_INTERPRO {
-    label 'process_single'
+    label 'process_medium'
 
     conda "${moduleDir}/environment.yml"
     container "${ workflow.containerEngine == 'singularity' && !task.ext.singularity_pull_docker_container ?
@@ -11,10 +11,15 @@ process SAMPLE_INTERPRO {
     path hierarchy
     val min_membership
     val num_per_db
+    val sampling_mode
+    val sampling_weighting
+    val sampling_strata
+    val sequence_budget
 
     output:
     path "log.txt"             , emit: log
     path "sampled_metadata.csv", emit: metadata
+    path "*.timings.json"      , emit: timings
     path "versions.yml"        , emit: versions
 
     when:
@@ -27,13 +32,19 @@ process SAMPLE_INTERPRO {
         --tree_file ${hierarchy} \\
         --min_membership ${min_membership} \\
         --num_per_db ${num_per_db} \\
+        --mode ${sampling_mode} \\
+        --weighting ${sampling_weighting} \\
+        --strata ${sampling_strata} \\
+        --sequence_budget ${sequence_budget} \\
+        --threads ${task.cpus} \\
         --logfile log.txt \\
-        --output sampled_metadata.csv         
+        --output sampled_metadata.csv
 
     cat <<-END_VERSIONS > versions.yml
     "${task.process}":
         python: \$(python --version 2>&1 | sed 's/Python //g')
         pandas: \$(python -c "import importlib.metadata; print(importlib.metadata.version('pandas'))")
+        numpy: \$(python -c "import importlib.metadata; print(importlib.metadata.version('numpy'))")
     END_VERSIONS
     """
 }
@@ -2,45 +2,88 @@ include { CALCULATE_SEQUENCE_STATS       } from '../modules/local/calculate_sequ
 include { CALCULATE_DB_SEQUENCE_COVERAGE } from '../modules/local/calculate_db_sequence_coverage/main'
 include { ANALYZE_RECRUITED_DECOYS       } from '../modules/local/analyze_recruited_decoys/main'
 include { CALCULATE_JACCARD_SIMILARITY   } from '../modules/local/calculate_jaccard_similarity/main'
+include { MERGE_JACCARD_SHARDS           } from '../modules/local/merge_jaccard_shards/main'
 include { PRODUCE_DB_STACKED_BARPLOT     } from '../modules/local/produce_db_stacked_barplot/main'
 include { CALCULATE_DB_FAMILY_COVERAGE   } from '../modules/local/calculate_db_family_coverage/main'
 include { GET_SIZE_DISTRIBUTIONS         } from '../modules/local/get_size_distributions/main'
 include { INVESTIGATE_MATCHED_ORIGINALS  } from '../modules/local/investigate_matched_originals/main'
+include { GATHER_MATCHED_ORIGINALS       } from '../modules/local/gather_matched_originals/main'
+include { POST_ENGINE                    } from '../modules/local/post_engine/main'
 
 workflow POST {
     take:
     alignments
     db_fasta
     decoys
+    accession_index
     sampled_metadata
     sampled_fasta_folder
     jaccard_similarity_threshold
+    jaccard_edge_floor
+    jaccard_shards
     mmseqs_tsv
     generated_fasta
+    post_engine
+    family_chunk_size
+    checkpoint_dir
+    parse_cache
 
     main:
     ch_aln      = Channel.fromPath(alignments, checkIfExists: true)
     ch_db_fasta = Channel.fromPath(db_fasta  , checkIfExists: true)
     ch_decoys   = Channel.fromPath(decoys    , checkIfExists: true)
+    // Optional accession index from COMBINE_DECOY_FASTA, read instead of the original and decoy FASTAs
+    ch_accession_index = accession_index != 'null' ? Channel.fromPath(accession_index, type: 'dir', checkIfExists: true).collect() : []
 
-    CALCULATE_SEQUENCE_STATS( ch_aln, ch_db_fasta, ch_decoys, 'fas.gz' )
+    ch_metadata        = Channel.fromPath(sampled_metadata    , checkIfExists: true)
+    ch_fasta_folder    = Channel.fromPath(sampled_fasta_folder, checkIfExists: true)
+    ch_mmseqs_tsv      = Channel.fromPath(mmseqs_tsv          , checkIfExists: true)
+    ch_generated_fasta = Channel.fromPath(generated_fasta     , checkIfExists: true)
 
-    ch_metadata     = Channel.fromPath(sampled_metadata, checkIfExists: true)
-    ch_fasta_folder = Channel.fromPath(sampled_fasta_folder, checkIfExists: true)
-    CALCULATE_DB_SEQUENCE_COVERAGE( ch_metadata, CALCULATE_SEQUENCE_STATS.out.original_count, ch_fasta_folder )
+    if (post_engine) {
+        // Read every input once and write all per-stage outputs from one task
+        POST_ENGINE( ch_aln, ch_db_fasta, ch_decoys, ch_metadata, ch_fasta_folder, ch_mmseqs_tsv, ch_generated_fasta, \
+            jaccard_similarity_threshold, jaccard_edge_floor, parse_cache )
+        ch_jaccard_edges = POST_ENGINE.out.edges
+    }
+    else {
+        CALCULATE_SEQUENCE_STATS( ch_aln, ch_db_fasta, ch_decoys, ch_accession_index, 'fas.gz', parse_cache )
 
-    ANALYZE_RECRUITED_DECOYS( ch_aln, ch_decoys )
+        CALCULATE_DB_SEQUENCE_COVERAGE( ch_metadata, CALCULATE_SEQUENCE_STATS.out.original_count, ch_fasta_folder, parse_cache )
 
-    CALCULATE_JACCARD_SIMILARITY( ch_aln, ch_fasta_folder, jaccard_similarity_threshold )
+        ANALYZE_RECRUITED_DECOYS( ch_aln, ch_decoys )
 
-    PRODUCE_DB_STACKED_BARPLOT( CALCULATE_JACCARD_SIMILARITY.out.edgelist )
+        // Scatter the use-case families over jaccard_shards tasks, then gather them back in shard order
+        ch_jaccard_input = ch_aln
+            .combine(ch_fasta_folder)
+            .combine(Channel.of(1..jaccard_shards))
+        CALCULATE_JACCARD_SIMILARITY( ch_jaccard_input, jaccard_similarity_threshold, jaccard_edge_floor, jaccard_shards, checkpoint_dir, parse_cache )
+        if (jaccard_shards > 1) {
+            MERGE_JACCARD_SHARDS( CALCULATE_JACCARD_SIMILARITY.out.edgelist.collect(), CALCULATE_JACCARD_SIMILARITY.out.edges.collect() )
+            ch_jaccard_edges = MERGE_JACCARD_SHARDS.out.edges
+        }
+        else {
+            ch_jaccard_edges = CALCULATE_JACCARD_SIMILARITY.out.edges
+        }
 
-    CALCULATE_DB_FAMILY_COVERAGE( CALCULATE_JACCARD_SIMILARITY.out.edgelist, ch_fasta_folder )
+        // Same scatter-gather over chunks of family_chunk_size families, counted as the family FASTAs the script splits
+        ch_investigate_input = ch_fasta_folder
+            .combine(ch_metadata)
+            .flatMap { folder, metadata ->
+                def families = files("${folder}/**.{fasta,fasta.gz}").size()
+                def num_shards = family_chunk_size > 0 ? Math.max(1, (families + family_chunk_size - 1).intdiv(family_chunk_size)) : 1
+                (1..num_shards).collect { shard -> [folder, metadata, shard, num_shards] }
+            }
+        INVESTIGATE_MATCHED_ORIGINALS( ch_investigate_input, ch_mmseqs_tsv.first(), ch_generated_fasta.first(), checkpoint_dir, parse_cache )
+        // A single chunk already wrote the final outputs
+        GATHER_MATCHED_ORIGINALS( INVESTIGATE_MATCHED_ORIGINALS.out.metadat.collect().filter { it.size() > 1 }, \
+            INVESTIGATE_MATCHED_ORIGINALS.out.clusters.collect(), INVESTIGATE_MATCHED_ORIGINALS.out.matches.collect() )
+    }
 
-    GET_SIZE_DISTRIBUTIONS( ch_metadata, CALCULATE_JACCARD_SIMILARITY.out.edgelist )
+    PRODUCE_DB_STACKED_BARPLOT( ch_jaccard_edges )
 
-    ch_mmseqs_tsv      = Channel.fromPath(mmseqs_tsv     , checkIfExists: true)
-    ch_generated_fasta = Channel.fromPath(generated_fasta, checkIfExists: true)
-    INVESTIGATE_MATCHED_ORIGINALS( ch_fasta_folder, ch_mmseqs_tsv, ch_metadata, ch_generated_fasta )
+    CALCULATE_DB_FAMILY_COVERAGE( ch_jaccard_edges, jaccard_similarity_threshold )
+
+    GET_SIZE_DISTRIBUTIONS( ch_metadata, ch_jaccard_edges, jaccard_similarity_threshold )
 
 }
@@ -8,6 +8,7 @@ include { EXTRACT_PFAM_METADATA               } from '../modules/local/extract_p
 include { FILTER_VALID_CANDIDATE_FAMILIES     } from '../modules/local/filter_valid_candidate_families/main'
 include { SAMPLE_INTERPRO                     } from '../modules/local/sample_interpro/main'
 include { CONVERT_SAMPLED_TO_FASTA            } from '../modules/local/convert_sampled_to_fasta/main'
+include { GATHER_SAMPLED_FASTA                } from '../modules/local/gather_sampled_fasta/main'
 include { COMBINE_DB_FASTA                    } from '../modules/local/combine_db_fasta/main'
 include { DIAMOND_MAKEDB                      } from '../modules/nf-core/diamond/makedb/main'
 include { DIAMOND_BLASTP                      } from '../modules/nf-core/diamond/blastp/main'
@@ -25,7 +26,14 @@ workflow PRE {
     path_to_swissprot
     min_membership
     num_per_db
+    sampling_mode
+    sampling_weighting
+    sampling_strata
+    sequence_budget
     num_decoys
+    bgzip_fasta
+    family_chunk_size
+    checkpoint_dir
 
     main:
     ch_hierarchy = Channel.fromPath(interpo_hierarchy_file, checkIfExists: true)
@@ -53,14 +61,29 @@ workflow PRE {
     )
 
     SAMPLE_INTERPRO( FILTER_VALID_CANDIDATE_FAMILIES.out.metadata, REMOVE_DUPLICATE_BRANCHES.out.hierarchy, \
-        min_membership, num_per_db
+        min_membership, num_per_db, sampling_mode, sampling_weighting, sampling_strata, sequence_budget
     )
 
-    CONVERT_SAMPLED_TO_FASTA( SAMPLE_INTERPRO.out.metadata, \
-        ch_hamap, ch_ncbifam, ch_panther, ch_pfam
+    // Scatter the sampled families over chunks of family_chunk_size rows, then gather them back in chunk order
+    ch_convert_input = SAMPLE_INTERPRO.out.metadata
+        .flatMap { metadata ->
+            def families = metadata.countLines() - 1
+            def num_shards = family_chunk_size > 0 ? Math.max(1, (families + family_chunk_size - 1).intdiv(family_chunk_size)) : 1
+            (1..num_shards).collect { shard -> [metadata, shard, num_shards] }
+        }
+    CONVERT_SAMPLED_TO_FASTA( ch_convert_input, \
+        ch_hamap.first(), ch_ncbifam.first(), ch_panther.first(), ch_pfam.first(), bgzip_fasta, checkpoint_dir
     )
+    // A single chunk is already the whole sampled FASTA folder and goes on without a gather
+    ch_fasta_chunks = CONVERT_SAMPLED_TO_FASTA.out.fasta_folder.collect()
+    GATHER_SAMPLED_FASTA( ch_fasta_chunks.filter { it.size() > 1 }, CONVERT_SAMPLED_TO_FASTA.out.metadata.collect() )
+    ch_sampled_fasta = ch_fasta_chunks
+        .filter { it.size() == 1 }
+        .map { it[0] }
+        .mix(GATHER_SAMPLED_FASTA.out.fasta_folder)
+        .first()
 
-    COMBINE_DB_FASTA( CONVERT_SAMPLED_TO_FASTA.out.fasta_folder )
+    COMBINE_DB_FASTA( ch_sampled_fasta, bgzip_fasta )
     
     ch_fasta = COMBINE_DB_FASTA.out.fasta
         .map { file ->
@@ -71,7 +94,7 @@ workflow PRE {
     ch_sp = Channel.of([ [id:'sp_diamond_db'], [ file(path_to_swissprot, checkIfExists: true) ] ])
     DIAMOND_BLASTP( ch_sp, DIAMOND_MAKEDB.out.db, 6, 'qseqid sseqid pident length mismatch gapopen qstart qend sstart send evalue bitscore' )
 
-    IDENTIFY_UNIPROT_DECOYS( DIAMOND_BLASTP.out.txt, ch_sp, num_decoys )
+    IDENTIFY_UNIPROT_DECOYS( DIAMOND_BLASTP.out.txt, ch_sp, num_decoys, bgzip_fasta )
 
-    COMBINE_DECOY_FASTA( COMBINE_DB_FASTA.out.fasta, IDENTIFY_UNIPROT_DECOYS.out.decoys )
+    COMBINE_DECOY_FASTA( COMBINE_DB_FASTA.out.fasta, IDENTIFY_UNIPROT_DECOYS.out.decoys, ch_sampled_fasta, bgzip_fasta )
 }